@@ -0,0 +1,108 @@
+import time
+
+import gurobipy as gp
+import numpy as np
+from gurobipy import GRB
+from numpy.typing import NDArray
+
+# Solver dei modelli MILP. I modelli sono sempre costruiti con l'API matriciale
+# di gurobipy (costruire un modello non richiede una licenza), poi:
+# - "gurobi": model.optimize()
+# - "highs": la matrice del modello (getA, bound, versi, VType) viene risolta
+#   con HiGHS tramite scipy.optimize.milp, senza licenza Gurobi
+#
+# optimize() restituisce un risultato con gli stessi attributi letti dal codice
+# (ObjVal, ObjBound, Runtime, MIPGap, NodeCount, IterCount) e value(var).
+# TimeLimit, MIPGap e Start vengono letti dai parametri del modello gurobipy;
+# HiGHS non ha BestObjStop né warm start: se non trova una soluzione entro il
+# TimeLimit fissa le variabili intere allo Start del modello e risolve l'LP rimasto.
+# Senza bound duale ObjBound resta -inf (sense * inf per la massimizzazione):
+# chi lo riporta usa al suo posto il lower bound del modello (get_lower_bound).
+
+BACKENDS = ("gurobi", "highs")
+
+
+def optimize(model: gp.Model, backend: str = "gurobi"):
+    if backend == "gurobi":
+        model.optimize()
+        return GurobiResult(model)
+    if backend == "highs":
+        return HighsResult(model)
+    raise ValueError(f"unknown backend {backend!r}, expected one of {BACKENDS}")
+
+
+class GurobiResult:
+    def __init__(self, model: gp.Model) -> None:
+        self.model = model
+
+    def __getattr__(self, name: str):
+        # ObjVal, ObjBound, Runtime, ... sono attributi del modello
+        return getattr(self.model, name)
+
+    def value(self, var) -> NDArray[np.float64]:
+        return np.asarray(var.X)
+
+
+class HighsResult:
+    def __init__(self, model: gp.Model) -> None:
+        # scipy è necessario solo con questo backend
+        from scipy.optimize import Bounds, LinearConstraint, milp
+        t0 = time.perf_counter()
+        model.update()
+        variables = model.getVars()
+        constraints = model.getConstrs()
+        sense = model.ModelSense
+
+        c = sense * np.array(model.getAttr("Obj", variables))
+        lb = _infinite(np.array(model.getAttr("LB", variables)))
+        ub = _infinite(np.array(model.getAttr("UB", variables)))
+        integrality = (np.array(model.getAttr("VType", variables)) != GRB.CONTINUOUS).astype(np.int64)
+        # vincoli come lo <= A x <= hi
+        rhs = np.array(model.getAttr("RHS", constraints))
+        senses = np.array(model.getAttr("Sense", constraints))
+        lo = np.where(senses == GRB.LESS_EQUAL, -np.inf, rhs)
+        hi = np.where(senses == GRB.GREATER_EQUAL, np.inf, rhs)
+        linear = [LinearConstraint(model.getA(), lo, hi)] if constraints else []
+
+        options = {"disp": False, "mip_rel_gap": model.Params.MIPGap}
+        if model.Params.TimeLimit < GRB.INFINITY:
+            options["time_limit"] = model.Params.TimeLimit
+        result = milp(c, constraints=linear, integrality=integrality,
+                      bounds=Bounds(lb, ub), options=options)
+
+        self.x = result.x
+        self.NodeCount = getattr(result, "mip_node_count", 0) or 0
+        self.IterCount = 0
+        if self.x is None:
+            # nessuna soluzione entro il TimeLimit: parte dallo Start delle variabili intere
+            start = np.array(model.getAttr("Start", variables))
+            fixed = integrality == 1
+            if (start[fixed] >= GRB.UNDEFINED).any():
+                raise RuntimeError(f"HiGHS found no solution: {result.message}")
+            lb[fixed] = ub[fixed] = np.rint(start[fixed])
+            completed = milp(c, constraints=linear, bounds=Bounds(lb, ub), options={"disp": False})
+            if completed.x is None:
+                raise RuntimeError(f"HiGHS found no solution: {result.message}")
+            self.x = completed.x
+        self.ObjVal = sense * (c @ self.x) + model.ObjCon
+        bound = getattr(result, "mip_dual_bound", None)
+        if bound is None or not np.isfinite(bound):
+            # problema continuo o risolto senza branch and bound
+            bound = result.fun if result.success else -np.inf
+        self.ObjBound = sense * bound + model.ObjCon
+        self.MIPGap = abs(self.ObjVal - self.ObjBound) / max(abs(self.ObjVal), 1e-10)
+        self.status = result.message
+        self.Runtime = time.perf_counter() - t0
+
+    def value(self, var) -> NDArray[np.float64]:
+        # colonna di ogni variabile = gurobipy.Var.index
+        if isinstance(var, gp.Var):
+            return np.asarray(self.x[var.index])
+        index = np.array([v.index for v in var.reshape(-1).tolist()], dtype=np.int64)
+        return self.x[index].reshape(var.shape)
+
+
+def _infinite(bounds: NDArray[np.float64]) -> NDArray[np.float64]:
+    # GRB.INFINITY (1e100) -> inf
+    return np.where(bounds >= GRB.INFINITY, np.inf,
+                    np.where(bounds <= -GRB.INFINITY, -np.inf, bounds))
@@ -0,0 +1,126 @@
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+
+from gurobipy import Env, GurobiError
+
+from .catalog import InstanceCatalog, load_instance
+from .heuristic import ModelTemplates
+from .model import ASPBC
+from .parser import parse_instance_name
+
+HEADER = ['File name',
+          'Fleet size',
+          'Number of jobs',
+          'Average job duration',
+          'Average energy job costs',
+          'Lower bound',
+          'Upper bound',
+          'GAP (%)',
+          'Runtime']
+
+# Env di Gurobi, catalogo e modelli BGAP del processo worker, creati una sola volta
+# da _init_worker: le istanze della stessa forma riusano lo stesso modello BGAP
+_env = None
+_templates = None
+_catalog = None
+_time_limit = None
+_backend = "gurobi"
+
+
+def _init_worker(threads: int, time_limit: float, catalog_path: str | None = None,
+                 backend: str = "gurobi") -> None:
+    global _env, _catalog, _time_limit, _backend, _templates
+    _time_limit = time_limit
+    _backend = backend
+    _env = Env(params={"OutputFlag": 0,  # disattiva output gurobi
+                       "Threads": threads,
+                       "TimeLimit": time_limit})
+    _templates = ModelTemplates()
+    if catalog_path:
+        _catalog = InstanceCatalog(catalog_path)
+
+
+def solve_instance(path: str, euristic: bool = False) -> tuple[list[str], dict]:
+    model = load_instance(ASPBC, path, _catalog)
+    if euristic:
+        # the time limit bounds the whole matheuristic, not each stage
+        model.solve_matheuristic(_env, time_budget=_time_limit, backend=_backend,
+                                  templates=_templates)
+    else:
+        model.solve(_env, backend=_backend)
+    row = [os.path.basename(path),
+            f"{model.M}",
+            f"{model.e.shape[0]}",
+            f"{int(model.d.mean())}",
+            f"{int(model.e.mean())}",
+            f"{int(model.lb)}",
+            f"{int(model.ub)}",
+            f"{model.gap * 100:.2f}",
+            f"{model.time:.2f}"]
+    return (row, model.profile.to_dict())
+
+
+def select_instances(folder: str, **fields: list[int]) -> list[str]:
+    # select_instances(FOLDER, V=[10], J=[100, 150]) keeps the instances whose
+    # file name matches every given field
+    files = []
+    for file in sorted(os.listdir(folder)):
+        name = parse_instance_name(file)
+        if all(not values or name.get(key) in values for key, values in fields.items()):
+            files.append(os.path.join(folder, file))
+    return files
+
+
+def completed_instances(csv_path: str) -> set[str]:
+    if not os.path.exists(csv_path):
+        return set()
+    with open(csv_path, newline='') as file:
+        return {row[0] for row in csv.reader(file) if row and row[0] != HEADER[0]}
+
+
+def run_batch(files: list[str],
+              csv_path: str,
+              euristic: bool = False,
+              workers: int = 0,
+              threads: int = 1,
+              time_limit: float = 600,
+              catalog_path: str | None = None,
+              profile_path: str | None = None,
+              backend: str = "gurobi"
+              ) -> int:
+    # each worker owns one Env limited to `threads` threads, so the pool
+    # uses at most workers * threads cores
+    workers = workers if workers > 0 else max(1, (os.cpu_count() or 1) // threads)
+    done = completed_instances(csv_path)
+    todo = [f for f in files if os.path.basename(f) not in done]
+    new_file = not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0
+
+    solved = 0
+    # profile_path: una riga JSON {file, stages, counters} per istanza
+    with open(csv_path, 'a', newline='') as file, \
+            open(profile_path, 'a') if profile_path else nullcontext() as profiles, \
+            ProcessPoolExecutor(workers, initializer=_init_worker,
+                                initargs=(threads, time_limit, catalog_path, backend)) as pool:
+        to_write = csv.writer(file)
+        if new_file:
+            to_write.writerow(HEADER)
+        futures = {pool.submit(solve_instance, f, euristic): f for f in todo}
+        for future in as_completed(futures):
+            try:
+                row, profile = future.result()
+            except (GurobiError, RuntimeError, ValueError, OSError) as error:
+                # not written: the instance is retried on the next run
+                print(f"{os.path.basename(futures[future])}: {error}", file=sys.stderr)
+                continue
+            # append as soon as an instance finishes, so a crash loses nothing
+            to_write.writerow(row)
+            file.flush()
+            if profiles:
+                profiles.write(json.dumps({"file": row[0], **profile}) + "\n")
+                profiles.flush()
+            solved += 1
+    return solved
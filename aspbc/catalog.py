@@ -0,0 +1,108 @@
+import json
+import os
+
+import numpy as np
+from numpy.typing import NDArray
+
+from .parser import parse_file
+
+# Catalogo binario delle istanze: un unico file con un header JSON seguito da
+# colonne NumPy allineate, lette con np.memmap senza ri-parsare il testo.
+#
+# fleet_size, battery_capacity, charge_duration = campi dell'header (N, )
+# offsets = inizio dei jobs dell'istanza i in durations/energies (N+1, )
+# durations, energies = jobs di tutte le istanze concatenati
+
+MAGIC = b"ASPBCCAT"
+ALIGNMENT = 64
+
+
+class InstanceCatalog:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not an instance catalog")
+            size = int(np.frombuffer(f.read(8), dtype="<u8")[0])
+            header = json.loads(f.read(size))
+        self.names = header["names"]
+        self._index = {name: i for i, name in enumerate(self.names)}
+        self.columns = {name: np.memmap(path, dtype=column["dtype"], mode="r",
+                                        offset=column["offset"], shape=tuple(column["shape"]))
+                        for name, column in header["columns"].items()}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return os.path.basename(name) in self._index
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def index(self, name: str) -> int:
+        return self._index[os.path.basename(name)]
+
+    def arrays(self, key) -> tuple[int, NDArray[np.int64], int, int, NDArray[np.float64]]:
+        # stessi valori di parse_file: (M, d, b, t, e)
+        i = key if isinstance(key, (int, np.integer)) else self.index(key)
+        start, end = self.columns["offsets"][i], self.columns["offsets"][i + 1]
+        return (int(self.columns["fleet_size"][i]),
+                self.columns["durations"][start:end],
+                int(self.columns["battery_capacity"][i]),
+                int(self.columns["charge_duration"][i]),
+                self.columns["energies"][start:end])
+
+
+def build_catalog(folder: str, path: str) -> InstanceCatalog:
+    files = sorted(f for f in os.listdir(folder) if f.endswith(".txt"))
+    instances = [parse_file(os.path.join(folder, f)) for f in files]
+    jobs = [instance[1].shape[0] for instance in instances]
+    columns = {
+        "fleet_size": np.array([i[0] for i in instances], dtype=np.int64),
+        "battery_capacity": np.array([i[2] for i in instances], dtype=np.int64),
+        "charge_duration": np.array([i[3] for i in instances], dtype=np.int64),
+        "offsets": np.concatenate([[0], np.cumsum(jobs)]).astype(np.int64),
+        "durations": np.concatenate([i[1] for i in instances]).astype(np.int64),
+        "energies": np.concatenate([i[4] for i in instances]).astype(np.float64),
+    }
+
+    # the header size depends on the offsets it contains: grow until stable
+    data_start = 0
+    while True:
+        offset, layout = data_start, {}
+        for name, column in columns.items():
+            layout[name] = {"dtype": column.dtype.str, "shape": column.shape, "offset": offset}
+            offset += -(-column.nbytes // ALIGNMENT) * ALIGNMENT
+        header = json.dumps({"names": files, "columns": layout}).encode()
+        needed = -(-(len(MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+        if needed <= data_start:
+            break
+        data_start = needed
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.array([len(header)], dtype="<u8").tobytes())
+        f.write(header)
+        for name, column in columns.items():
+            f.seek(layout[name]["offset"])
+            f.write(column.tobytes())
+        f.truncate(offset)
+    return InstanceCatalog(path)
+
+
+def load_instance(cls, path: str, catalog: InstanceCatalog | None = None):
+    # dal catalogo se contiene l'istanza, altrimenti dal file di testo
+    if catalog is not None and path in catalog:
+        return cls.create_from_catalog(catalog, path)
+    return cls.create_from_file(path)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    # python -m aspbc.catalog "dataset/ASP-BC Instances" dataset/instances.cat
+    folder, path = sys.argv[1:3]
+    t0 = time.time()
+    catalog = build_catalog(folder, path)
+    print(f"{len(catalog)} instances written to {path} in {time.time() - t0:.2f} s")
@@ -0,0 +1,146 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from gurobipy import Env
+from numpy.typing import NDArray
+
+from .heuristic import LocalSearch, Schedule
+from .heuristic.packing import first_fit_decreasing
+from .profiling import StageProfiler
+from .utility import _time_left
+
+# Decomposizione per istanze con migliaia di jobs:
+# - i jobs sono divisi in K cluster bilanciati: ordinati per d/media(d) + e/media(e)
+#   e distribuiti a serpentina, ogni cluster è un'istanza ridotta con tutta la flotta
+# - ogni cluster è risolto con la matheuristica a tre stadi (anche in parallelo)
+# - le ricariche di tutti i cluster diventano bin: quelli che stanno insieme in
+#   una batteria sono uniti (FFD sul consumo dei bin) e i bin sono assegnati agli
+#   AGV con LPT, come nella soluzione greedy FFD + LPT ma con bin già ottimizzati
+# - una local search globale rifinisce la soluzione unita
+#
+# ogni cluster ha dimensione costante (cluster_size), quindi il tempo cresce
+# circa linearmente con J
+
+# quota del time_budget data ai cluster (la local search globale usa il resto)
+CLUSTER_SHARE = 0.75
+
+# Env di Gurobi del processo worker, creato una sola volta da _init_worker
+_env = None
+
+
+def _init_worker(threads: int) -> None:
+    global _env
+    _env = Env(params={"OutputFlag": 0, "Threads": threads})
+
+
+def cluster_jobs(job_durations: NDArray[np.int64], energy_job_costs: NDArray[np.float64],
+                 clusters: int) -> list[NDArray[np.int64]]:
+    # indici dei jobs di ogni cluster, con somme di d ed e simili
+    size = job_durations / max(job_durations.mean(), 1e-9) + \
+        energy_job_costs / max(energy_job_costs.mean(), 1e-9)
+    order = np.argsort(-size, kind="stable")
+    position = np.arange(order.shape[0]) % (2 * clusters)
+    # serpentina: 0, 1, ..., K-1, K-1, ..., 1, 0, 0, 1, ...
+    label = np.where(position < clusters, position, 2 * clusters - 1 - position)
+    return [np.sort(order[label == k]) for k in range(clusters)]
+
+
+def _solve_cluster(cls, instance: tuple, options: dict) -> tuple:
+    # options = argomenti di solve_matheuristic; env del worker se non passato
+    model = cls(*instance)
+    options = dict(options)
+    if options.get("env") is None:
+        options["env"] = _env
+    model.solve_matheuristic(**options)
+    schedule = model.schedule.compacted()
+    return (schedule.agv, schedule.charge, model.profile)
+
+
+def merge_schedules(schedules: list[tuple], jobs: list[NDArray[np.int64]], J: int, M: int,
+                    job_durations: NDArray[np.int64], energy_job_costs: NDArray[np.float64],
+                    battery_capacity: float, charge_duration: float) -> Schedule:
+    # schedules[k] = (agv, charge) compattati del cluster k, jobs[k] = indici globali
+    # ricarica (cluster, AGV, ricarica) di ogni job
+    label = np.empty(J, dtype=np.int64)
+    offset = 0
+    for (agv_k, charge_k), jobs_k in zip(schedules, jobs):
+        R_k = charge_k.max() + 1
+        label[jobs_k] = offset + agv_k * R_k + charge_k
+        offset += M * R_k
+    _, bins = np.unique(label, return_inverse=True)
+    # le ultime ricariche di ogni AGV dei cluster sono spesso mezze vuote:
+    # FFD sul loro consumo unisce quelle che stanno in una batteria
+    energy = np.bincount(bins, weights=energy_job_costs)
+    bins = first_fit_decreasing(energy, battery_capacity)[bins]
+    # LPT: ogni ricarica (durata dei jobs + t) all'AGV più scarico
+    D = np.bincount(bins, weights=job_durations) + charge_duration
+    agv = np.empty(D.shape[0], dtype=np.int64)
+    charge = np.empty(D.shape[0], dtype=np.int64)
+    load = np.zeros(M, dtype=np.float64)
+    used = np.zeros(M, dtype=np.int64)
+    for r in np.argsort(-D, kind="stable"):
+        m = load.argmin()
+        agv[r], charge[r] = m, used[m]
+        load[m] += D[r]
+        used[m] += 1
+    q = np.arange(max(used.max(), 1))[:, None] < used[None, :]
+    q[0, :] = 1
+    return Schedule(agv[bins], charge[bins], q)
+
+
+def solve_decomposition(model, env=None, cluster_size: int = 100, workers: int = 1,
+                        time_budget: float | None = None, seed=None, backend: str = "gurobi",
+                        local_search_iterations: int | None = None):
+    # model = ASPBC; workers > 1 risolve i cluster in processi con un proprio Env
+    # (ignora env), workers = 0 usa tutti i core
+    t0 = time.perf_counter()
+    deadline = None if time_budget is None else t0 + time_budget
+    profile = StageProfiler()
+    J = model.e.shape[0]
+    clusters = max(1, round(J / cluster_size))
+
+    with profile.stage("cluster"):
+        jobs = cluster_jobs(model.d, model.e, clusters)
+    workers = workers if workers > 0 else min(clusters, os.cpu_count() or 1)
+    # i cluster sono risolti a gruppi di `workers`: ogni gruppo ha la sua quota di tempo
+    rounds = -(-clusters // workers)
+    cluster_budget = None if deadline is None else \
+        _time_left(deadline, CLUSTER_SHARE) / rounds
+    # un seed per cluster e uno per la local search globale
+    seeds = np.random.SeedSequence(seed).spawn(clusters + 1)
+    args = [(type(model), (model.M, model.d[jobs_k], model.b, model.t, model.e[jobs_k]),
+             {"env": env if workers == 1 else None, "time_budget": cluster_budget,
+              "seed": seeds[k], "backend": backend})
+            for k, jobs_k in enumerate(jobs)]
+
+    with profile.stage("clusters"):
+        if workers == 1:
+            results = [_solve_cluster(*a) for a in args]
+        else:
+            with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                     initargs=(max(1, (os.cpu_count() or 1) // workers),)) as pool:
+                results = list(pool.map(_solve_cluster, *zip(*args)))
+    for _, _, cluster_profile in results:
+        profile.merge(cluster_profile, "clusters")
+
+    with profile.stage("merge"):
+        schedule = merge_schedules([r[:2] for r in results], jobs, J, model.M,
+                                   model.d, model.e, model.b, model.t)
+        local_search = LocalSearch(schedule, 0.0, model.d, model.e, model.t, model.b,
+                                   seeds[-1])
+        local_search.cmax = local_search.tracker.cmax
+    model.lb = model.get_lower_bound()
+
+    with profile.stage("ls"):
+        local_search.solve(time_limit=_time_left(deadline),
+                           max_iterations=local_search_iterations, lower_bound=model.lb)
+    profile.merge(local_search.profile, "ls")
+
+    model.schedule = local_search.schedule
+    model.ub = local_search.cmax
+    model.gap = (model.ub - model.lb) / model.lb
+    model.time = time.perf_counter() - t0
+    model.profile = profile
+    return model
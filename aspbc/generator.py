@@ -0,0 +1,95 @@
+import os
+
+import numpy as np
+from numpy.typing import NDArray
+
+# Generatore di istanze sintetiche nel formato del dataset (N_MACHINES, D:[...], w:[...]).
+#
+# Distribuzioni stimate sulle istanze distribuite:
+# - durata d = parte intera di N(T, T) troncata a d >= 0 (media ~1.24 T)
+# - costo e = N(W, W) arrotondato a 0.1 e troncato a 0.1 <= e < B (media ~1.3 W)
+# - d ed e sono indipendenti
+# Ogni istanza dipende solo da (S, N) del nome Ins_V*_J*_T*_R*_B*_W*_S*_N*:
+# la stessa chiamata rigenera gli stessi file. Come nel dataset, dentro un
+# gruppo S cresce con N (..._S240_N0, ..._S241_N1, ...).
+
+
+def instance_name(V: int, J: int, T: int, W: int, seed: int, n: int = 0,
+                  R: int = 60, B: int = 10) -> str:
+    return f"Ins_V{V}_J{J}_T{T}_R{R}_B{B}_W{W}_S{seed}_N{n}.txt"
+
+
+def _truncated_normal(rng: np.random.Generator, mean: float, size: int,
+                      keep) -> NDArray[np.float64]:
+    # N(mean, mean) ricampionata finché keep(valori) è vero per tutti
+    values = rng.normal(mean, mean, size)
+    rejected = ~keep(values)
+    while rejected.any():
+        values[rejected] = rng.normal(mean, mean, rejected.sum())
+        rejected = ~keep(values)
+    return values
+
+
+def generate_instance(V: int, J: int, T: int, W: int, seed: int, n: int = 0,
+                      R: int = 60, B: int = 10
+                      ) -> tuple[int, NDArray[np.int64], float, float, NDArray[np.float64]]:
+    # stessa tupla di parse_file: (M, d, b, t, e)
+    rng = np.random.default_rng([seed, n])
+    d = np.floor(_truncated_normal(rng, T, J, lambda x: x >= 0)).astype(np.int64)
+    e = np.round(_truncated_normal(rng, W, J, lambda x: (np.round(x, 1) >= 0.1) & (np.round(x, 1) < B)), 1)
+    return (V, d, B, R, e)
+
+
+def write_instance(path: str, instance: tuple) -> None:
+    # stesso formato dei file del dataset: righe CRLF, ogni valore ripetuto su V colonne
+    M, d, b, t, e = instance
+    lines = [f"N_MACHINES:{M}\tN_JOBS:{d.shape[0]}\tCHARGING_TIME:{t}\tINITIAL_CHARGE:{b}", "D:["]
+    lines += ["\t".join([str(value)] * M) for value in d]
+    lines += ["]", "w:["]
+    lines += ["\t".join([f"{value:.1f}"] * M) for value in e]
+    lines += ["]"]
+    with open(path, "w", newline='') as f:
+        f.write("\r\n".join(lines) + "\r\n")
+
+
+def stream_instances(V: int, J: int, T: int, W: int, seed: int, count: int = 10,
+                     R: int = 60, B: int = 10):
+    # (nome, (M, d, b, t, e)) per N = 0..count-1 con S = seed + N, senza scrivere file
+    for n in range(count):
+        yield (instance_name(V, J, T, W, seed + n, n, R, B),
+               generate_instance(V, J, T, W, seed + n, n, R, B))
+
+
+def generate_dataset(folder: str, V: list[int], J: list[int], T: list[int], W: list[int],
+                     seed: int = 0, count: int = 10, R: int = 60, B: int = 10) -> list[str]:
+    # scrive count istanze per ogni combinazione (V, J, T, W), ognuna con un
+    # seed diverso derivato da seed, e restituisce i percorsi: i gruppi usano
+    # S = seed, seed + 1, ... senza sovrapporsi
+    os.makedirs(folder, exist_ok=True)
+    files = []
+    group = seed
+    for v in V:
+        for j in J:
+            for t in T:
+                for w in W:
+                    for name, instance in stream_instances(v, j, t, w, group, count, R, B):
+                        files.append(os.path.join(folder, name))
+                        write_instance(files[-1], instance)
+                    group += count
+    return files
+
+
+if __name__ == "__main__":
+    import argparse
+    # python -m aspbc.generator dataset/synthetic --V 50 --J 1000 5000 --T 10 20 30 --W 1 2 4
+    parser = argparse.ArgumentParser(description="Generate synthetic ASP-BC instances")
+    parser.add_argument("folder")
+    parser.add_argument("--V", type=int, nargs="+", default=[50])
+    parser.add_argument("--J", type=int, nargs="+", default=[1000])
+    parser.add_argument("--T", type=int, nargs="+", default=[10, 20, 30])
+    parser.add_argument("--W", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--count", type=int, default=10)
+    args = parser.parse_args()
+    files = generate_dataset(args.folder, args.V, args.J, args.T, args.W, args.seed, args.count)
+    print(f"{len(files)} instances written to {args.folder}")
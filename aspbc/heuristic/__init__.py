@@ -1,6 +1,15 @@
-from .bpp import BinPackingProblem
 from .bgap_c import BGAPConstrained
 from .bgap_r import BGAPChargeOperations
-from .local_search import LocalSearch
 from .bgap_r_variable_charge import BGAPChargeOperations_VC
+from .bpp import BinPackingProblem
+from .iterated import IteratedLocalSearch
+from .local_search import LocalSearch
 from .local_search_variable_charge import LocalSearch_VC
+from .multistart import multi_start
+from .online import OnlinePlanner
+from .schedule import Schedule
+from .templates import ModelTemplates
+
+__all__ = ["BGAPChargeOperations", "BGAPChargeOperations_VC", "BGAPConstrained",
+           "BinPackingProblem", "IteratedLocalSearch", "LocalSearch", "LocalSearch_VC",
+           "ModelTemplates", "OnlinePlanner", "Schedule", "multi_start"]
@@ -0,0 +1,130 @@
+from math import floor
+
+import gurobipy as gp
+import numpy as np
+from gurobipy import GRB
+from numpy.typing import NDArray
+
+from aspbc.backend import optimize
+
+from .packing import EPS
+
+# Modello arc-flow per il Bin Packing Problem (Valério de Carvalho, 1999):
+# i nodi sono i livelli di carica consumata 0..W, un arco (k, k + w) usa un
+# job di peso w e ogni cammino che parte da 0 è un bin. Le variabili sono
+# una per arco invece di R*J, e il modello non ha simmetrie fra i bin.
+#
+# I costi sono decimali con passo 0.1: pesi e capacità vengono scalati di
+# `scale` e resi interi.
+
+
+def integer_weights(job_costs: NDArray[np.float64], battery_capacity: float,
+                    scale: int = 10) -> tuple[NDArray[np.int64], int]:
+    weights = np.rint(job_costs * scale).astype(np.int64)
+    if not np.allclose(weights, job_costs * scale, atol=1e-6):
+        raise ValueError(f"arc-flow needs job costs that are multiples of 1/{scale}")
+    return (weights, floor(battery_capacity * scale + EPS))
+
+
+def build_graph(weights: NDArray[np.int64], capacity: int) -> list[tuple[int, int, int]]:
+    # archi (k, k + w, tipo) aggiunti per tipo di peso decrescente, solo dai nodi
+    # raggiungibili con i tipi precedenti e al più `domanda` volte di fila
+    types, demand = np.unique(weights, return_counts=True)
+    types, demand = types[::-1], demand[::-1]
+    reachable = np.zeros(capacity + 1, dtype=bool)
+    reachable[0] = True
+    arcs = []
+    for i, (w, n) in enumerate(zip(types, demand)):
+        # copies[k] = jobs di tipo i usati per arrivare a k con archi di tipo i
+        copies = np.where(reachable, 0, -1)
+        for k in range(capacity - w + 1):
+            if copies[k] >= 0 and copies[k] < n:
+                arcs.append((k, k + w, i))
+                if copies[k + w] < 0 or copies[k + w] > copies[k] + 1:
+                    copies[k + w] = copies[k] + 1
+        reachable |= copies >= 0
+    return arcs
+
+
+def arc_flow_packing(job_costs: NDArray[np.float64],
+                     battery_capacity: float,
+                     env=None,
+                     time_limit: float | None = None,
+                     best_obj_stop: float | None = None,
+                     start: NDArray[np.int64] | None = None,
+                     scale: int = 10,
+                     backend: str = "gurobi"
+                     ) -> tuple[NDArray[np.int64], int, float]:
+    # restituisce (bin di ogni job, numero di bin, lower bound dimostrato)
+    # start = bin di ogni job di un packing ammissibile (ad esempio FFD)
+    weights, capacity = integer_weights(job_costs, battery_capacity, scale)
+    types, demand = np.unique(weights, return_counts=True)
+    types, demand = types[::-1], demand[::-1]
+    arcs = build_graph(weights, capacity)
+
+    m = gp.Model("BPP_arcflow", env=env)
+    f = m.addMVar(len(arcs), vtype=GRB.INTEGER, lb=0)
+    tail = np.array([a[0] for a in arcs])
+    head = np.array([a[1] for a in arcs])
+    kind = np.array([a[2] for a in arcs])
+
+    # numero di bin = flusso uscente dal nodo 0
+    m.setObjective(f[np.flatnonzero(tail == 0)].sum(), GRB.MINIMIZE)
+    # ogni tipo di job è coperto almeno quanto la domanda
+    for i in range(types.shape[0]):
+        m.addConstr(f[np.flatnonzero(kind == i)].sum() >= demand[i])
+    # un cammino può terminare in ogni nodo: entrante >= uscente
+    for k in range(1, capacity + 1):
+        into, out = np.flatnonzero(head == k), np.flatnonzero(tail == k)
+        if out.shape[0] > 0:
+            m.addConstr(f[into].sum() >= f[out].sum())
+    if start is not None:
+        f.Start = _flow_of(start, arcs, weights, types)
+    if time_limit is not None:
+        m.Params.TimeLimit = time_limit
+    if best_obj_stop is not None:
+        m.Params.BestObjStop = best_obj_stop
+    result = optimize(m, backend)
+
+    flow = np.rint(result.value(f)).astype(np.int64)
+    return (_decompose(flow, arcs, weights, types), round(result.ObjVal), result.ObjBound)
+
+
+def _flow_of(bins: NDArray[np.int64], arcs: list, weights: NDArray[np.int64],
+             types: NDArray[np.int64]) -> NDArray[np.float64]:
+    # ogni bin, con i jobs in ordine di peso decrescente, è un cammino del grafo
+    arc_of = {(k, i): a for a, (k, _, i) in enumerate(arcs)}
+    type_of = {w: i for i, w in enumerate(types)}
+    flow = np.zeros(len(arcs))
+    for r in range(bins.max() + 1):
+        k = 0
+        for w in np.sort(weights[bins == r])[::-1]:
+            flow[arc_of[(k, type_of[w])]] += 1
+            k += w
+    return flow
+
+
+def _decompose(flow: NDArray[np.int64], arcs: list, weights: NDArray[np.int64],
+               types: NDArray[np.int64]) -> NDArray[np.int64]:
+    # ogni cammino da 0 è un bin: i jobs di ogni tipo vengono assegnati in ordine
+    # di indice, gli archi in più (copertura > domanda) restano vuoti
+    out = {}
+    for a, (k, _, _) in enumerate(arcs):
+        if flow[a] > 0:
+            out.setdefault(k, []).append(a)
+    jobs = {i: list(np.flatnonzero(weights == w)[::-1]) for i, w in enumerate(types)}
+    bins = np.full(weights.shape[0], -1, dtype=np.int64)
+    r = 0
+    while out.get(0):
+        k, used = 0, False
+        while out.get(k):
+            a = out[k][0]
+            flow[a] -= 1
+            if flow[a] == 0:
+                out[k].pop(0)
+            _, k, i = arcs[a]
+            if jobs[i]:
+                bins[jobs[i].pop()] = r
+                used = True
+        r += used
+    return bins
@@ -2,6 +2,9 @@ import gurobipy as gp
 from gurobipy import GRB
 import numpy as np
 from aspbc.utility import _array_from_var
+from aspbc.backend import optimize
+from aspbc.profiling import StageProfiler
+from .templates import ModelTemplates, _change_coeffs
 from numpy.typing import NDArray
 
 
@@ -17,7 +20,7 @@ class BGAPConstrained:
         self.d = job_durations
         self.b = battery_capacity
 
-    def solve(self, env=None) -> 'BGAPConstrained':
+    def build(self, env=None) -> tuple[gp.Model, gp.MVar]:
         J = self.e.shape[0]
         m = gp.Model("BGAP_C", env)
 
@@ -29,16 +32,66 @@ class BGAPConstrained:
         m.setObjective(cmax, GRB.MINIMIZE)
 
         # CONSTRAINTS!!!
-        m.addConstr(cmax >= self.d @ x)
+        makespan = m.addConstr(cmax >= self.d @ x)
 
         # uguale a m.addConstr(x.sum(axis=0) == 1)
         m.addConstr(x @ np.ones(self.M) == 1)
-        m.addConstr(self.e @ x <= self.b)
+        capacity = m.addConstr(self.e @ x <= self.b)
+        m.update()
 
-        m.optimize()
+        # per update(): vincoli che dipendono da d, e, b e i loro coefficienti
+        m._x = x
+        m._vars = x.tolist()
+        m._makespan, m._capacity = makespan.tolist(), capacity
+        # verso in cui gurobipy ha scritto cmax >= d @ x (cmax - d x >= 0 o d x - cmax <= 0)
+        m._sign = m.getCoeff(m._makespan[0], cmax)
+        m._coeffs = self._coeffs(m._sign)
+        return (m, x)
 
-        self.x = _array_from_var(x)
-        self.z = m.ObjVal
-        self.time = m.Runtime
+    def _coeffs(self, sign: float) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+        # coefficienti di x nei vincoli sign * (cmax - d @ x) >= 0 ed e @ x <= b
+        shape = (self.e.shape[0], self.M)
+        return (np.broadcast_to(-sign * self.d[:, None], shape).astype(np.float64),
+                np.broadcast_to(self.e[:, None], shape).astype(np.float64))
+
+    def update(self, m: gp.Model) -> tuple[gp.Model, gp.MVar]:
+        # scrive d, e, b in un modello di build() con le stesse dimensioni (J, M)
+        makespan, capacity = self._coeffs(m._sign)
+        _change_coeffs(m, m._makespan, m._vars, m._coeffs[0], makespan)
+        _change_coeffs(m, m._capacity.tolist(), m._vars, m._coeffs[1], capacity)
+        m._capacity.RHS = np.full(self.M, self.b)
+        m._coeffs = (makespan, capacity)
+        m.update()
+        return (m, m._x)
+
+    def solve(self, env=None, time_limit: float | None = None,
+              start: NDArray[np.bool_] | None = None,
+              best_obj_stop: float | None = None, backend: str = "gurobi",
+              templates: ModelTemplates | None = None) -> 'BGAPConstrained':
+        # start = assegnamento ammissibile (J, M), ad esempio i bin del BPP
+        # best_obj_stop = lower bound del makespan: raggiunto è inutile continuare
+        # templates = modelli già costruiti per la stessa forma (J, M), aggiornati
+        # con i dati dell'istanza invece di costruire un nuovo modello
+        self.profile = StageProfiler()
+        with self.profile.stage("build"):
+            if templates is None:
+                m, x = self.build(env)
+            else:
+                m, x = templates.model(("BGAP_C", self.e.shape[0], self.M), env,
+                                       lambda: self.build(env), self.update)
+            if start is not None:
+                x.Start = start.astype(np.float64)
+        if time_limit is not None:
+            m.Params.TimeLimit = time_limit
+        if best_obj_stop is not None:
+            m.Params.BestObjStop = best_obj_stop
+
+        with self.profile.stage("optimize"):
+            result = optimize(m, backend)
+
+        with self.profile.stage("extract"):
+            self.x = _array_from_var(x, result)
+        self.z = result.ObjVal
+        self.time = result.Runtime
 
         return self
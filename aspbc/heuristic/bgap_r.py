@@ -4,6 +4,9 @@ import numpy as np
 from .bpp import BinPackingProblem
 from numpy.typing import NDArray
 from aspbc.utility import _array_from_var
+from aspbc.backend import optimize
+from aspbc.profiling import StageProfiler
+from .templates import ModelTemplates, _change_coeffs
 
 class BGAPChargeOperations:
     def __init__(self,
@@ -19,7 +22,7 @@ class BGAPChargeOperations:
         self.gamma = gamma
         self.chi = chi
         self.t = charge_duration
-        self.R = charging_operations_number if charging_operations_number != 0 else job_durations.shape[0]
+        self.R = charging_operations_number if charging_operations_number != 0 else gamma.shape[0]
 
     @classmethod
     def from_bpp(cls,
@@ -34,30 +37,90 @@ class BGAPChargeOperations:
                      chi, charge_duration, bpp.R)
         return bgap_r
 
-    def solve(self, env=None) -> 'BGAPChargeOperations':
-        m = gp.Model("BGAP_R", env)
-
+    def _durations(self) -> NDArray[np.float64]:
         R_bar = np.where(self.gamma == 1)[0]
         # per ogni ricarica, il tempo di esecuzione dei jobs
-        D = (self.chi @ self.d)[R_bar] + self.t
+        return (self.chi @ self.d)[R_bar] + self.t
+
+    def build(self, env=None, warm_start: bool = False) -> tuple[gp.Model, gp.MVar]:
+        m = gp.Model("BGAP_R", env)
+
+        D = self._durations()
 
         # VARIABLES!!!!
-        theta = m.addMVar((R_bar.shape[0], self.M), vtype=GRB.BINARY)
+        theta = m.addMVar((D.shape[0], self.M), vtype=GRB.BINARY)
         cmax = m.addVar()
 
         # OBJECTIVE!!!
         m.setObjective(cmax, GRB.MINIMIZE)
 
         # CONSTRAINTS!!!
-        m.addConstr(cmax >= (D @ theta) - self.t)
+        makespan = m.addConstr(cmax >= (D @ theta) - self.t)
         # uguale a m.addConstr(theta.sum(axis=1) == 1)
         m.addConstr(theta @ np.ones(self.M) == 1)
 
-        m.optimize()
+        if warm_start:
+            theta.Start = self._lpt_start(D)
+        m.update()
+
+        # per update(): il vincolo del makespan dipende da D e t
+        m._theta = theta
+        m._vars = theta.tolist()
+        m._makespan = makespan
+        # verso in cui gurobipy ha scritto cmax >= D @ theta - t
+        m._sign = m.getCoeff(makespan.tolist()[0], cmax)
+        m._coeffs = np.broadcast_to(-m._sign * D[:, None], theta.shape).astype(np.float64)
+        return (m, theta)
+
+    def _lpt_start(self, D: NDArray[np.float64]) -> NDArray[np.float64]:
+        # LPT: ogni ricarica all'AGV meno carico
+        start = np.zeros((D.shape[0], self.M))
+        load = np.zeros(self.M)
+        for r in np.argsort(-D, kind="stable"):
+            m_min = load.argmin()
+            start[r, m_min] = 1
+            load[m_min] += D[r]
+        return start
+
+    def update(self, m: gp.Model, warm_start: bool = False) -> tuple[gp.Model, gp.MVar]:
+        # scrive D e t in un modello di build() con le stesse dimensioni (R_bar, M)
+        D = self._durations()
+        coeffs = np.broadcast_to(-m._sign * D[:, None], m._theta.shape).astype(np.float64)
+        _change_coeffs(m, m._makespan.tolist(), m._vars, m._coeffs, coeffs)
+        m._makespan.RHS = np.full(self.M, -m._sign * self.t)
+        m._coeffs = coeffs
+        if warm_start:
+            m._theta.Start = self._lpt_start(D)
+        m.update()
+        return (m, m._theta)
+
+    def solve(self, env=None, time_limit: float | None = None,
+              best_obj_stop: float | None = None, backend: str = "gurobi",
+              templates: ModelTemplates | None = None) -> 'BGAPChargeOperations':
+        # best_obj_stop = lower bound del makespan: raggiunto è inutile continuare
+        # templates = modelli già costruiti per la stessa forma (R_bar, M)
+        self.profile = StageProfiler()
+        with self.profile.stage("build"):
+            # with a time limit the LPT start guarantees an incumbent
+            warm_start = time_limit is not None
+            if templates is None:
+                m, theta = self.build(env, warm_start)
+            else:
+                m, theta = templates.model(("BGAP_R", int((self.gamma == 1).sum()), self.M), env,
+                                           lambda: self.build(env, warm_start),
+                                           lambda model: self.update(model, warm_start))
+        if time_limit is not None:
+            m.Params.TimeLimit = time_limit
+        if best_obj_stop is not None:
+            m.Params.BestObjStop = best_obj_stop
+
+        with self.profile.stage("optimize"):
+            result = optimize(m, backend)
 
-        self.theta = np.zeros((self.R, self.M), dtype=bool)
-        self.theta[R_bar] = _array_from_var(theta)
-        self.z = m.ObjVal
-        self.time = m.Runtime
+        with self.profile.stage("extract"):
+            self.theta = np.zeros((self.R, self.M), dtype=bool)
+            self.theta[self.gamma == 1] = _array_from_var(theta, result)
+        self.z = result.ObjVal
+        self.time = result.Runtime
 
         return self
@@ -4,6 +4,9 @@ import numpy as np
 from .bpp import BinPackingProblem
 from numpy.typing import NDArray
 from aspbc.utility import _array_from_var
+from aspbc.backend import optimize
+from aspbc.profiling import StageProfiler
+from .templates import ModelTemplates, _change_coeffs
 
 class BGAPChargeOperations_VC:
     def __init__(self,
@@ -21,7 +24,7 @@ class BGAPChargeOperations_VC:
         self.gamma = gamma
         self.chi = chi
         self.tau = time_per_charge_unit
-        self.R = charging_operations_number if charging_operations_number != 0 else job_durations.shape[0]
+        self.R = charging_operations_number if charging_operations_number != 0 else gamma.shape[0]
 
     @classmethod
     def from_bpp(cls,
@@ -35,31 +38,126 @@ class BGAPChargeOperations_VC:
         bgap_r = cls(fleet_size, job_durations, bpp.e, gamma, chi, time_per_charge_unit, bpp.R)
         return bgap_r
 
-    def solve(self, env=None) -> 'BGAPChargeOperations_VC':
-        m = gp.Model("BGAP_R", env)
+    def _charges(self) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+        R_bar = np.where(self.gamma == 1)[0]
+        # per ogni ricarica, il tempo di esecuzione dei jobs e l'energia consumata
+        return (self.chi @ self.d)[R_bar], (self.chi @ self.e)[R_bar]
 
-        q = m.addMVar((self.R, self.M))
+    def build(self, env=None, warm_start: bool = False) -> tuple[gp.Model, gp.MVar, gp.MVar]:
+        # Ogni AGV ricarica l'energia di tutte le sue ricariche tranne l'ultima:
+        # c_m = sum_r theta[r, m] * (D_r + tau * E_r) - tau * sum_r lambda[r, m] * E_r
+        # con lambda[r, m] = la ricarica r è l'ultima dell'AGV m. Il modello è
+        # lineare (MILP) e all'ottimo l'ultima ricarica è quella con più energia.
+        m = gp.Model("BGAP_R_VC", env)
+
+        D, E = self._charges()
 
         # VARIABLES!!!!
-        theta = m.addMVar((self.R, self.M), vtype=GRB.BINARY)
+        theta = m.addMVar((D.shape[0], self.M), vtype=GRB.BINARY)
+        last = m.addMVar((D.shape[0], self.M), vtype=GRB.BINARY)
         cmax = m.addVar()
 
         # OBJECTIVE!!!
         m.setObjective(cmax, GRB.MINIMIZE)
-        # CONSTRAINTS!!!
-        m.addConstr(q[:-1] >= theta[1:])
-        m.addConstr(q[-1] == 0)
 
-        job_part = self.chi @ self.d
-        energy_part = self.tau * ((self.e @ self.chi)[:,None] * q * theta).sum()
-        m.addConstr(cmax >= job_part + energy_part)
+        # CONSTRAINTS!!!
+        makespan = m.addConstr(cmax >= (D + self.tau * E) @ theta - self.tau * (E @ last))
         # uguale a m.addConstr(theta.sum(axis=1) == 1)
         m.addConstr(theta @ np.ones(self.M) == 1)
+        # una sola ultima ricarica per AGV, fra quelle assegnate
+        m.addConstr(last <= theta)
+        m.addConstr(np.ones(D.shape[0]) @ last <= 1)
+        self._set_data(theta, last, D, E, warm_start)
+        m.update()
+
+        # per update(): il vincolo del makespan dipende da D, E e tau
+        m._theta, m._last = theta, last
+        m._vars = (theta.tolist(), last.tolist())
+        m._makespan = makespan.tolist()
+        # verso in cui gurobipy ha scritto il vincolo del makespan
+        m._sign = m.getCoeff(m._makespan[0], cmax)
+        m._coeffs = self._coeffs(D, E, m._sign)
+        return (m, theta, last)
+
+    def _coeffs(self, D: NDArray[np.float64], E: NDArray[np.float64], sign: float
+                ) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+        # coefficienti di theta e lambda in sign * (cmax - (D + tau E) @ theta + tau E @ lambda) >= 0
+        shape = (D.shape[0], self.M)
+        return (np.broadcast_to(-sign * (D + self.tau * E)[:, None], shape).astype(np.float64),
+                np.broadcast_to(sign * self.tau * E[:, None], shape).astype(np.float64))
+
+    def _set_data(self, theta: gp.MVar, last: gp.MVar, D: NDArray[np.float64],
+                  E: NDArray[np.float64], warm_start: bool) -> None:
+        # gli AGV sono identici: numerati per la prima ricarica (in ordine di
+        # durata decrescente) che eseguono, la k-esima ricarica va su un AGV <= k
+        order = np.argsort(-(D + self.tau * E), kind="stable")
+        rank = np.empty(D.shape[0], dtype=np.int64)
+        rank[order] = np.arange(D.shape[0])
+        theta.UB = (np.arange(self.M)[None, :] <= rank[:, None]).astype(np.float64)
+
+        if warm_start:
+            # LPT: ogni ricarica all'AGV meno carico, per ultima quella con più energia
+            start = np.zeros((D.shape[0], self.M))
+            load = np.zeros(self.M)
+            for r in order:
+                m_min = load.argmin()
+                start[r, m_min] = 1
+                load[m_min] += D[r] + self.tau * E[r]
+            last_start = np.zeros(start.shape)
+            for m_used in np.flatnonzero(start.any(axis=0)):
+                rs = np.flatnonzero(start[:, m_used])
+                last_start[rs[E[rs].argmax()], m_used] = 1
+            theta.Start = start
+            last.Start = last_start
+
+    def update(self, m: gp.Model, warm_start: bool = False) -> tuple[gp.Model, gp.MVar, gp.MVar]:
+        # scrive D, E e tau in un modello di build() con le stesse dimensioni (R_bar, M)
+        D, E = self._charges()
+        coeffs = self._coeffs(D, E, m._sign)
+        for variables, old, new in zip(m._vars, m._coeffs, coeffs):
+            _change_coeffs(m, m._makespan, variables, old, new)
+        m._coeffs = coeffs
+        self._set_data(m._theta, m._last, D, E, warm_start)
+        m.update()
+        return (m, m._theta, m._last)
+
+    def solve(self, env=None, time_limit: float | None = None,
+              best_obj_stop: float | None = None, backend: str = "gurobi",
+              templates: ModelTemplates | None = None) -> 'BGAPChargeOperations_VC':
+        # best_obj_stop = lower bound del makespan: raggiunto è inutile continuare
+        # templates = modelli già costruiti per la stessa forma (R_bar, M)
+        self.profile = StageProfiler()
+        with self.profile.stage("build"):
+            # with a time limit the LPT start guarantees an incumbent
+            warm_start = time_limit is not None
+            if templates is None:
+                m, theta, last = self.build(env, warm_start)
+            else:
+                m, theta, last = templates.model(
+                    ("BGAP_R_VC", int((self.gamma == 1).sum()), self.M), env,
+                    lambda: self.build(env, warm_start),
+                    lambda model: self.update(model, warm_start))
+        if time_limit is not None:
+            m.Params.TimeLimit = time_limit
+        if best_obj_stop is not None:
+            m.Params.BestObjStop = best_obj_stop
 
-        m.optimize()
+        with self.profile.stage("optimize"):
+            result = optimize(m, backend)
 
-        self.theta = _array_from_var(theta)
-        self.z = m.ObjVal
-        self.time = m.Runtime
+        with self.profile.stage("extract"):
+            R_bar = np.where(self.gamma == 1)[0]
+            theta_bar = _array_from_var(theta, result)
+            last_bar = _array_from_var(last, result).any(axis=1)
+            # ricariche in ordine di esecuzione: l'ultima di ogni AGV dopo le altre,
+            # così Schedule.from_charge(compact=True) la mette in fondo
+            order = np.concatenate([R_bar[~last_bar], R_bar[last_bar],
+                                    np.where(self.gamma != 1)[0]])
+            self.chi = self.chi[order]
+            self.gamma = self.gamma[order]
+            self.theta = np.zeros((self.R, self.M), dtype=bool)
+            self.theta[:R_bar.shape[0]] = np.concatenate([theta_bar[~last_bar], theta_bar[last_bar]])
+        self.z = result.ObjVal
+        self.time = result.Runtime
 
         return self
@@ -1,8 +1,14 @@
+import time
+from math import ceil
 import gurobipy as gp
 from gurobipy import GRB
 import numpy as np
 from numpy.typing import NDArray
 from aspbc.utility import _array_from_var
+from aspbc.backend import optimize
+from aspbc.profiling import StageProfiler
+from .packing import EPS, first_fit_decreasing, best_fit_decreasing, lower_bound_l2
+from .arcflow import arc_flow_packing
 
 
 class BinPackingProblem:
@@ -11,11 +17,12 @@ class BinPackingProblem:
                  battery_capacity: float,
                  number_of_charges: int = 0
                  ) -> None:
-        self.R = number_of_charges if number_of_charges != 0 else job_costs.shape[0]
+        # the first-fit decreasing packing bounds the number of bins needed
+        self.R = number_of_charges if number_of_charges != 0 else first_fit_decreasing(job_costs, battery_capacity).max() + 1
         self.e = job_costs
         self.b = battery_capacity
 
-    def solve(self, env=None) -> 'BinPackingProblem':
+    def build(self, env=None, bins: NDArray[np.int64] = None) -> tuple[gp.Model, gp.MVar, gp.MVar]:
         J = self.e.shape[0]
         m = gp.Model("BPP", env=env)
 
@@ -36,11 +43,74 @@ class BinPackingProblem:
         m.addConstr((chi @ self.e) <= (self.b * gamma))
         m.addConstrs(gamma[r] <= gamma[r-1] for r in range(1, self.R))
 
-        m.optimize()
+        # start from the heuristic packing
+        if bins is not None and bins.max() < self.R:
+            self._set_packing(bins)
+            gamma.Start = self.gamma
+            chi.Start = self.chi
+        m.update()
+        return (m, gamma, chi)
 
-        self.gamma = _array_from_var(gamma)
-        self.chi = _array_from_var(chi)
-        self.zeta = m.ObjVal
-        self.time = m.Runtime
+    def solve(self, env=None, use_bounds: bool = True, time_limit: float | None = None,
+              method: str = "assignment", backend: str = "gurobi") -> 'BinPackingProblem':
+        # method = "assignment" (gamma/chi, R*J binarie) o "arcflow" (un flusso
+        # sui livelli di carica 0..b, per costi multipli di 0.1)
+        t0 = time.time()
+        self.profile = StageProfiler()
+        # pure NumPy stage: FFD/BFD packings and Martello-Toth lower bound
+        with self.profile.stage("heuristic"):
+            bins = first_fit_decreasing(self.e, self.b)
+            best_fit = best_fit_decreasing(self.e, self.b)
+            if best_fit.max() < bins.max():
+                bins = best_fit
+            self.lower_bound = lower_bound_l2(self.e, self.b)
+        # the heuristic packing is optimal: no need to call Gurobi
+        if use_bounds and bins.max() + 1 <= self.lower_bound:
+            self._set_packing(bins)
+            self.zeta = self.lower_bound
+            self.time = time.time() - t0
+            return self
+        heuristic_time = time.time() - t0
+
+        if method == "arcflow":
+            with self.profile.stage("optimize"):
+                packing, zeta, bound = arc_flow_packing(self.e, self.b, env, time_limit,
+                                                        self.lower_bound, bins, backend=backend)
+            self._set_packing(packing)
+            self.zeta = zeta
+            self._raise_bound(bound)
+            self.time = time.time() - t0
+            return self
+
+        with self.profile.stage("build"):
+            m, gamma, chi = self.build(env, bins)
+        if time_limit is not None:
+            # the heuristic packing is a feasible start, so there is always an incumbent
+            m.Params.TimeLimit = time_limit
+        # a packing with L2 bins is optimal: stop as soon as one is found
+        m.Params.BestObjStop = self.lower_bound
+
+        with self.profile.stage("optimize"):
+            result = optimize(m, backend)
+
+        with self.profile.stage("extract"):
+            self.gamma = _array_from_var(gamma, result)
+            self.chi = _array_from_var(chi, result)
+        self.zeta = result.ObjVal
+        # with a time limit zeta may not be optimal: keep the proven bound
+        self._raise_bound(result.ObjBound)
+        self.time = heuristic_time + result.Runtime
 
         return self
+
+    def _raise_bound(self, bound: float) -> None:
+        # HiGHS può fermarsi al TimeLimit senza un bound (-inf)
+        if np.isfinite(bound):
+            self.lower_bound = max(self.lower_bound, ceil(bound - EPS))
+
+    def _set_packing(self, bins: NDArray[np.int64]) -> None:
+        J = self.e.shape[0]
+        self.gamma = np.zeros(self.R, dtype=bool)
+        self.gamma[:bins.max() + 1] = 1
+        self.chi = np.zeros((self.R, J), dtype=bool)
+        self.chi[bins, np.arange(J)] = 1
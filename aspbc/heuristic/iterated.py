@@ -0,0 +1,124 @@
+import time
+
+import numpy as np
+
+from aspbc.profiling import StageProfiler
+
+# Iterated local search con memoria tabu sopra LocalSearch/LocalSearch_VC:
+# - discesa con la migliore mossa ammessa (swap, remove, add) finché c'è un risparmio
+# - un job spostato dall'AGV m non può tornarci per `tenure` mosse: le mosse
+#   tabu sono escluse dalla valutazione (forbidden della local search), a meno
+#   che diano una nuova soluzione migliore (aspirazione)
+# - nei minimi locali un kick sposta `kick_size` jobs degli AGV critici
+# - se dopo la discesa la soluzione è peggiore della migliore si riparte da questa
+
+
+class IteratedLocalSearch:
+    def __init__(self,
+                 local_search,
+                 tenure: int = 10,
+                 kick_size: int = 3,
+                 seed=None
+                 ) -> None:
+        self.local_search = local_search
+        self.tenure = tenure
+        self.kick_size = kick_size
+        self.rng = local_search.rng if seed is None else np.random.default_rng(seed)
+        # tabu[j, m] = ultima mossa in cui il job j non può tornare sull'AGV m
+        self.tabu = np.full((local_search.schedule.J, local_search.schedule.M), -1,
+                            dtype=np.int64)
+        self.moves = 0
+        self.cmax = np.inf
+        self.profile = StageProfiler()
+
+    @property
+    def schedule(self):
+        return self.local_search.schedule
+
+    def solve(self,
+              time_limit: float | None = None,
+              max_kicks: int | None = None,
+              lower_bound: float | None = None,
+              callback=None
+              ) -> 'IteratedLocalSearch':
+        # callback(cmax, kick) ad ogni nuova soluzione migliore
+        t0 = time.time()
+        deadline = None if time_limit is None else t0 + time_limit
+        ls = self.local_search
+        ls.cmax = self.cmax = ls.tracker.cmax
+        best = ls.schedule.copy()
+        with self.profile.stage("search"):
+            kicks = 0
+            while True:
+                self._descent(deadline)
+                if ls.cmax < self.cmax:
+                    self.cmax, best = ls.cmax, ls.schedule.copy()
+                    self.profile.count("improvements")
+                    if callback is not None:
+                        callback(self.cmax, kicks)
+                elif ls.cmax > self.cmax:
+                    self._restore(best)
+                if self._done(deadline, kicks, max_kicks, lower_bound):
+                    break
+                kicks += 1
+                self.profile.count("kicks")
+                self._kick()
+        self.time = time.time() - t0
+        return self
+
+    def stop(self) -> None:
+        self.local_search.stop()
+
+    def _done(self, deadline: float, kicks: int, max_kicks: int, lower_bound: float) -> bool:
+        if self.local_search._stop.is_set():
+            self.local_search._stop.clear()
+            return True
+        return (deadline is not None and time.time() >= deadline) or \
+            (max_kicks is not None and kicks >= max_kicks) or \
+            (lower_bound is not None and self.cmax <= lower_bound)
+
+    def _apply(self, update: tuple) -> None:
+        m1, _, j1, m2, _, j2 = update
+        self.local_search.update_best(update)
+        self.moves += 1
+        self.tabu[j1, m1] = self.moves + self.tenure
+        if j1 != j2:
+            self.tabu[j2, m2] = self.moves + self.tenure
+
+    def _descent(self, deadline: float) -> None:
+        ls = self.local_search
+        while deadline is None or time.time() < deadline:
+            ls.forbidden = self.tabu >= self.moves
+            # aspirazione: una mossa tabu è ammessa se migliora la migliore soluzione
+            ls.aspiration = ls.cmax - self.cmax
+            s_star, update = ls.best_move()
+            if s_star <= 0.0:
+                # nessuna mossa ammessa migliora la soluzione corrente
+                break
+            self._apply(update)
+            self.profile.count("iterations")
+        ls.forbidden = None
+
+    def _kick(self) -> None:
+        ls = self.local_search
+        schedule, tracker = ls.schedule, ls.tracker
+        for _ in range(self.kick_size):
+            m1 = self.rng.choice(tracker.critical_machines())
+            jobs = schedule.agv_jobs(m1)
+            if jobs.shape[0] == 0:
+                break
+            j = self.rng.choice(jobs)
+            agvs = [m for m in range(schedule.M)
+                    if m != m1 and self.tabu[j, m] < self.moves]
+            if not agvs:
+                continue
+            m2 = self.rng.choice(agvs)
+            charges = schedule.charges_of(m2)
+            fits = charges[tracker.charge_left[charges, m2] >= ls.e[j]]
+            r2 = self.rng.choice(fits) if fits.shape[0] > 0 else tracker.last_charge(m2) + 1
+            self._apply((m1, schedule.charge[j], j, m2, r2, j))
+        ls.cmax = tracker.cmax
+
+    def _restore(self, best) -> None:
+        self.local_search.restore(best.copy())
+        self.profile.count("restores")
@@ -0,0 +1,187 @@
+import numpy as np
+from numpy.typing import NDArray
+
+from .packing import EPS
+from .schedule import Schedule
+
+# Stato incrementale della local search: invece di ricalcolare ad ogni
+# iterazione il carico degli AGV (d @ x) e la carica residua (b - e @ y),
+# aggiorna solo le celle toccate dalla mossa applicata.
+#
+# E = energia consumata dalla ricarica r sull'AGV m (R, M)
+# n = numero di jobs eseguiti dopo la ricarica r sull'AGV m (R, M)
+# cm = durata del lavoro di ogni AGV (M, )
+
+
+class LoadTracker:
+    def __init__(self,
+                 schedule: Schedule,
+                 job_durations: NDArray[np.int64],
+                 energy_job_costs: NDArray[np.float64],
+                 battery_capacity: float,
+                 charge_duration: float
+                 ) -> None:
+        self.schedule = schedule
+        self.d = job_durations
+        self.e = energy_job_costs
+        self.b = battery_capacity
+        self.t = charge_duration
+
+        R, M = schedule.q.shape
+        assigned = np.flatnonzero(schedule.agv >= 0)
+        agv = schedule.agv[assigned]
+        charge = schedule.charge[assigned]
+        self.E = np.zeros((R, M), dtype=np.float64)
+        np.add.at(self.E, (charge, agv), self.e[assigned])
+        self.n = np.zeros((R, M), dtype=np.int64)
+        np.add.at(self.n, (charge, agv), 1)
+        self.durations = np.bincount(agv, weights=self.d[assigned],
+                                     minlength=M).astype(np.float64)
+        self.charges = schedule.q.sum(axis=0)
+        self.cm = self._initial_cm()
+
+    def _initial_cm(self) -> NDArray[np.float64]:
+        return self.durations + self.t * self.charges - self.t
+
+    @property
+    def charge_left(self) -> NDArray[np.float64]:
+        # E è aggiornata per differenze e accumula errori di arrotondamento:
+        # con la tolleranza EPS una mossa che riempie esattamente la batteria
+        # resta ammissibile come nel ricalcolo completo
+        return self.b - self.E + EPS
+
+    @property
+    def cmax(self) -> float:
+        return self.cm.max()
+
+    def critical_machines(self) -> NDArray[np.int64]:
+        return np.where(self.cm == self.cm.max())[0]
+
+    def last_charge(self, m: np.int64) -> int:
+        # ultima ricarica che esegue almeno un job (-1 se l'AGV è vuoto)
+        used = np.flatnonzero(self.n[:, m])
+        return used[-1] if used.shape[0] > 0 else -1
+
+    def move_type(self, update: tuple) -> str:
+        # swap = scambio di due jobs, remove = job in una ricarica esistente,
+        # add = job in una nuova ricarica
+        _, _, j1, m2, r2, j2 = update
+        if j1 != j2:
+            return "swap"
+        q = self.schedule.q
+        return "remove" if r2 < q.shape[0] and q[r2, m2] else "add"
+
+    def grow(self, R: int) -> 'LoadTracker':
+        extra = R - self.E.shape[0]
+        if extra > 0:
+            self.schedule.grow(R)
+            self.E = np.concatenate([self.E, np.zeros((extra, self.E.shape[1]))])
+            self.n = np.concatenate(
+                [self.n, np.zeros((extra, self.n.shape[1]), dtype=np.int64)])
+        return self
+
+    def apply(self, update: tuple) -> 'LoadTracker':
+        m1, r1, j1, m2, r2, j2 = update
+        # una nuova ricarica può superare quelle allocate
+        self.grow(max(r1, r2) + 1)
+        q = self.schedule.q
+        touched = ((r1, m1), (r2, m2))
+
+        # can use the same code to update either for add, remove and swap
+        self.schedule.move(j1, m2, r2)
+        if j1 != j2:
+            self.schedule.move(j2, m1, r1)
+            delta_d = self.d[j2] - self.d[j1]
+            delta_e = self.e[j2] - self.e[j1]
+            delta_n = 0
+        else:
+            delta_d = -self.d[j1]
+            delta_e = -self.e[j1]
+            delta_n = -1
+        self.durations[m1] += delta_d
+        self.durations[m2] -= delta_d
+        self.E[r1, m1] += delta_e
+        self.E[r2, m2] -= delta_e
+        self.n[r1, m1] += delta_n
+        self.n[r2, m2] -= delta_n
+
+        for r, m in touched:
+            used = self.n[r, m] > 0
+            self.charges[m] += int(used) - int(q[r, m])
+            q[r, m] = used
+
+        for m in (m1, m2):
+            self.cm[m] = self._cm(m)
+        return self
+
+    def insert(self, j: int, m: int, r: int) -> 'LoadTracker':
+        # assegna il job j (non assegnato) alla ricarica r dell'AGV m
+        self.grow(r + 1)
+        q = self.schedule.q
+        self.schedule.move(j, m, r)
+        self.durations[m] += self.d[j]
+        self.E[r, m] += self.e[j]
+        self.n[r, m] += 1
+        self.charges[m] += 1 - int(q[r, m])
+        q[r, m] = True
+        self.cm[m] = self._cm(m)
+        return self
+
+    def remove(self, j: int) -> 'LoadTracker':
+        # toglie il job j dalla soluzione (resta non assegnato)
+        m, r = self.schedule.agv[j], self.schedule.charge[j]
+        q = self.schedule.q
+        self.schedule.unassign(j)
+        self.durations[m] -= self.d[j]
+        self.E[r, m] -= self.e[j]
+        self.n[r, m] -= 1
+        used = self.n[r, m] > 0
+        self.charges[m] += int(used) - int(q[r, m])
+        q[r, m] = used
+        self.cm[m] = self._cm(m)
+        return self
+
+    def _cm(self, m: np.int64) -> float:
+        return self.durations[m] + self.t * self.charges[m] - self.t
+
+
+class LoadTracker_VC(LoadTracker):
+    def __init__(self,
+                 schedule: Schedule,
+                 job_durations: NDArray[np.int64],
+                 energy_job_costs: NDArray[np.float64],
+                 battery_capacity: float,
+                 time_per_charge_unit: float
+                 ) -> None:
+        self.tau = time_per_charge_unit
+        super().__init__(schedule, job_durations, energy_job_costs,
+                         battery_capacity, 0.0)
+
+    def _initial_cm(self) -> NDArray[np.float64]:
+        self.charge_time = np.array([self._charge_time(m) for m in range(self.E.shape[1])],
+                                    dtype=np.float64)
+        return self.durations + self.charge_time
+
+    def _charge_time(self, m: np.int64) -> float:
+        # ogni ricarica usata viene ripristinata tranne l'ultima: le ricariche
+        # vuote in mezzo non contano, come nella soluzione compattata
+        last = self.last_charge(m)
+        return self.tau * (self.E[:, m].sum() - (self.E[last, m] if last >= 0 else 0.0))
+
+    def slot_energies(self) -> tuple[NDArray[np.int64], NDArray[np.float64], NDArray[np.float64], NDArray[np.float64]]:
+        # per ogni AGV: ultima ricarica usata (-1 se vuoto), energia dell'ultima
+        # e della penultima ricarica usata, energia totale
+        M = self.E.shape[1]
+        used = self.n > 0
+        count = used.sum(axis=0)
+        order = np.cumsum(used, axis=0)
+        last = np.where(count > 0, (order == count).argmax(axis=0), -1)
+        cols = np.arange(M)
+        E_last = np.where(count > 0, self.E[np.maximum(last, 0), cols], 0.0)
+        prev = ((order == count - 1) & used).argmax(axis=0)
+        E_prev = np.where(count > 1, self.E[prev, cols], 0.0)
+        return (last, E_last, E_prev, self.E.sum(axis=0))
+
+    def _cm(self, m: np.int64) -> float:
+        self.charge_time[m] = self._charge_time(m)
+        return self.durations[m] + self.charge_time[m]
@@ -1,7 +1,12 @@
 import time
+import threading
 import numpy as np
 from .bgap_c import BGAPConstrained
 from .bgap_r import BGAPChargeOperations
+from .load_tracker import LoadTracker
+from .schedule import Schedule
+from .packing import max_charges_per_agv
+from aspbc.profiling import StageProfiler
 from numpy.typing import NDArray
 # x = transfer job j performed by m
 # q = charge jobe r performed by m
@@ -13,79 +18,137 @@ from numpy.typing import NDArray
 # x = chi.T @ theta (J, M)
 # y = np.stack([np.outer(chi[r], theta[r]) for r in range(R)], axis = 0) (R, J, M)
 
+def _admissible(saving: NDArray[np.float64], tabu: NDArray[np.bool_],
+                aspiration: float) -> NDArray[np.float64]:
+    # azzera il risparmio delle mosse tabu, tranne quelle oltre l'aspirazione
+    saving[tabu & (saving <= aspiration)] = 0
+    return saving
+
+
 class LocalSearch:
     def __init__(self,
-                 x: NDArray[np.bool_],
-                 y: NDArray[np.bool_],
-                 q: NDArray[np.bool_],
+                 schedule: Schedule,
                  cmax: float,
                  job_durations: NDArray[np.int64],
                  energy_job_costs: NDArray[np.float64],
                  charge_duration: float,
-                 battery_capacity: float
+                 battery_capacity: float,
+                 seed=None
                  ) -> None:
-        self.x = x  # (J, M)
-        self.y = y  # (R, J, M)
-        self.q = q  # (R, M)
+        self.schedule = schedule
         self.cmax = cmax
         self.d = job_durations
         self.t = charge_duration
         self.e = energy_job_costs
         self.b = battery_capacity
+        self.tracker = LoadTracker(schedule, job_durations, energy_job_costs,
+                                   battery_capacity, charge_duration)
+        self.profile = StageProfiler()
+        self._stop = threading.Event()
+        # forbidden[j, m] = il job j non può andare sull'AGV m (memoria tabu), a meno
+        # che il risparmio superi aspiration; None = nessuna mossa vietata
+        self.forbidden = None
+        self.aspiration = np.inf
+        # ordine di visita degli AGV critici (riproducibile con seed)
+        self.rng = np.random.default_rng(seed)
 
     @classmethod
     def from_constrained(cls,
                          bgap: BGAPConstrained,
                          charge_duration: float,
-                         charging_operations_number=0
+                         charging_operations_number=0,
+                         seed=None
                          ) -> 'LocalSearch':
-        J = bgap.x.shape[0]
-        R = charging_operations_number if charging_operations_number != 0 else J
-        x = bgap.x
-        y = np.zeros((R, J, bgap.M), dtype=bool)
-        y[0, :, :] = x
-        q = np.zeros((J, bgap.M), dtype=bool)
-        q[0, :] = 1
+        R = charging_operations_number if charging_operations_number != 0 else \
+            max_charges_per_agv(bgap.e, bgap.b, bgap.d, bgap.M, charge_duration)
+        schedule = Schedule.from_assignment(bgap.x, R)
         cmax = bgap.z
 
-        ls = cls(x, y, q, cmax, bgap.d, bgap.e, charge_duration, bgap.b)
+        ls = cls(schedule, cmax, bgap.d, bgap.e, charge_duration, bgap.b, seed)
         return ls
 
     @classmethod
     def from_charge(cls,
                     bgap: BGAPChargeOperations,
                     energy_job_costs: NDArray[np.float64],
-                    battery_capacity: float
+                    battery_capacity: float,
+                    seed=None
                     ) -> 'LocalSearch':
         # chi = transfer operation j assigned to charge operation r
         # theta = charge operation r assigned to m
-        x = bgap.chi.T @ bgap.theta
-        y = np.stack([np.outer(bgap.chi[r], bgap.theta[r])
-                     for r in range(bgap.theta.shape[0])], axis=0)
-        ls = cls(x, y, bgap.theta, bgap.z, bgap.d,
-                 energy_job_costs, bgap.t, battery_capacity)
+        schedule = Schedule.from_charge(bgap.chi, bgap.theta)
+        ls = cls(schedule, bgap.z, bgap.d,
+                 energy_job_costs, bgap.t, battery_capacity, seed)
         return ls
 
-    def solve(self):
+    @property
+    def x(self) -> NDArray[np.bool_]:
+        return self.schedule.to_arrays()[0]
+
+    @property
+    def y(self) -> NDArray[np.bool_]:
+        return self.schedule.to_arrays()[1]
+
+    @property
+    def q(self) -> NDArray[np.bool_]:
+        return self.schedule.q
+
+    def solve(self, time_limit: float | None = None, max_iterations: int | None = None,
+              callback=None, lower_bound: float | None = None):
+        # time_limit (s) e max_iterations fermano la ricerca con la migliore
+        # soluzione trovata, callback(cmax, iterazione) dopo ogni mossa accettata
+        # lower_bound: la ricerca si ferma quando cmax lo raggiunge (ottimo)
+        # self.status = "local_optimum", "time_limit", "max_iterations",
+        # "stopped" o "lower_bound"
         t0 = time.time()
-        while True:
-            s_star = (0.0, ())  # saving time
-            s_star = self.save_swap(*s_star)
-            s_star = self.save_remove(*s_star)
-            s_star = self.saving_add(*s_star)
-            if s_star[0] > 0.0:
-                update = s_star[1]
-                self.update_best(update)
-            else:
-                break
+        iterations = 0
+        self.status = "local_optimum"
+        with self.profile.stage("search"):
+            while True:
+                if lower_bound is not None and self.cmax <= lower_bound:
+                    self.status = "lower_bound"
+                    break
+                if self._stop.is_set():
+                    self.status = "stopped"
+                    break
+                if time_limit is not None and time.time() - t0 >= time_limit:
+                    self.status = "time_limit"
+                    break
+                if max_iterations is not None and iterations >= max_iterations:
+                    self.status = "max_iterations"
+                    break
+                iterations += 1
+                self.profile.count("iterations")
+                s_star, update = self.best_move()
+                if s_star > 0.0:
+                    self.update_best(update)
+                    if callback is not None:
+                        callback(self.cmax, iterations)
+                else:
+                    break
+        self._stop.clear()
         self.time = time.time() - t0
         return self
 
+    def best_move(self) -> tuple[float, tuple]:
+        # mossa con il risparmio maggiore fra swap, remove e add
+        s_star = (0.0, ())  # saving time
+        s_star = self.save_swap(*s_star)
+        s_star = self.save_remove(*s_star)
+        s_star = self.saving_add(*s_star)
+        return s_star
+
+    def stop(self) -> None:
+        # può essere chiamato da un altro thread: la ricerca termina alla fine
+        # dell'iterazione corrente
+        self._stop.set()
+
+    def _is_tabu(self, j: int, m2: int, saving: float) -> bool:
+        return self.forbidden is not None and self.forbidden[j, m2] and saving <= self.aspiration
+
     def _compute_cm(self) -> NDArray[np.float64]:
         # quanto tempo impiega ogni AGV a svolgere il suo lavoro
-        first = self.d @ self.x
-        second = (self.t * self.q).sum(axis=0, dtype=np.float64) - self.t
-        return first + second
+        return self.tracker.cm
 
     def _get_best_two(self, cm: NDArray[np.float64], m1: np.int64) -> tuple[np.int64, np.int64]:
         # precompute best cm-s
@@ -100,14 +163,16 @@ class LocalSearch:
         return (top1, top2)
 
     def saving_add(self, s_star: float, update: tuple) -> tuple[float, tuple]:
-        fleet_size = self.x.shape[1]
+        fleet_size = self.schedule.M
         c_m = self._compute_cm()  # duration for all AGVs
         critical_machines = np.where(c_m == c_m.max())[0]
 
         for m1 in critical_machines:
             top1, top2 = self._get_best_two(c_m, m1)
+            jobs = self.schedule.agv_jobs(m1)
+            self.profile.count("candidates.add", jobs.shape[0] * (fleet_size - 1))
             # iterate jobs of most loaded AGV
-            for j in np.where(self.x[:, m1] == 1)[0]:
+            for j in jobs:
                 m1_without_j = c_m[m1] - self.d[j]
                 # find another AGV
                 for m2 in range(fleet_size):
@@ -123,63 +188,76 @@ class LocalSearch:
                     s_a = max(0, self.cmax -
                               max(m1_without_j, m2_with_j, cm_max))
                     # If you save time
-                    if s_a > s_star:
+                    if s_a > s_star and not self._is_tabu(j, m2, s_a):
                         s_star = s_a
                         # Find the respective charge job in m1
-                        r1 = np.argmax(self.y[:, j, m1] == 1)
+                        r1 = self.schedule.charge[j]
                         # Find a new charge job in m2
-                        r2 = (np.where(self.y[:, :, m2] == 1)[0]).max() + 1
+                        r2 = self.tracker.last_charge(m2) + 1
                         update = (m1, r1, j, m2, r2, j)
         return (s_star, update)
 
     def save_swap(self, s_star: float, update: tuple) -> tuple[float, tuple]:
-        M = self.x.shape[1]
+        M = self.schedule.M
         cm = self._compute_cm()
         critical_machines = np.where(cm == cm.max())[0]
-        np.random.shuffle(critical_machines)
+        self.rng.shuffle(critical_machines)
         # Compute the remaining charge (capacity - sum(e[j] * y[r, j, m]))
-        charge_left = self.b - (self.e @ self.y)
+        charge_left = self.tracker.charge_left
+        # jobs in the same order as the loops over (m, r, j)
+        jobs = self.schedule.ordered_jobs()
+        agv = self.schedule.agv[jobs]
+        charge = self.schedule.charge[jobs]
 
         for m1 in critical_machines:
             top1, top2 = self._get_best_two(cm, m1)
-            # iterate charge jobs of m1
-            for r1 in np.where(self.q[:, m1] == 1)[0]:
-                # iterate jobs on m1 and r1
-                for j1 in np.where(self.y[r1, :, m1] == 1)[0]:
-                    # find another agv
-                    for m2 in range(M):
-                        if m2 == m1:
-                            continue
-                        # iterate charge jobs of m2
-                        for r2 in np.where(self.q[:, m2] == 1)[0]:
-                            # iterate jobs of m2 and r2
-                            for j2 in np.where(self.y[r2, :, m2])[0]:
-                                # if both can accept charge
-                                if charge_left[r1, m1] >= self.e[j2]-self.e[j1] and charge_left[r2, m2] >= self.e[j1]-self.e[j2]:
-                                    m1_new = cm[m1] - self.d[j1] + self.d[j2]
-                                    m2_new = cm[m2] + self.d[j1] - self.d[j2]
-                                    if M <= 2 or critical_machines.shape[0] > 1:
-                                        cm_max = 0
-                                    else:
-                                        cm_max = cm[top2] if m2 == top1 else cm[top1]
-                                    s_s = max(0, self.cmax -
-                                              max(m1_new, m2_new, cm_max))
-                                    if s_s > s_star:
-                                        s_star = s_s
-                                        update = (m1, r1, j1, m2, r2, j2)
+            on_m1 = agv == m1
+            j1, r1 = jobs[on_m1], charge[on_m1]
+            j2, r2, m2 = jobs[~on_m1], charge[~on_m1], agv[~on_m1]
+            # every (j1, j2) pair at once: rows are jobs of m1, columns jobs of the other AGVs
+            delta_e = self.e[j2][None, :] - self.e[j1][:, None]
+            # if both can accept charge
+            feasible = (charge_left[r1, m1][:, None] >= delta_e) & \
+                (charge_left[r2, m2][None, :] >= -delta_e)
+            m1_new = (cm[m1] - self.d[j1])[:, None] + self.d[j2][None, :]
+            m2_new = (cm[m2][None, :] + self.d[j1][:, None]) - \
+                self.d[j2][None, :]
+            if M <= 2 or critical_machines.shape[0] > 1:
+                cm_max = np.zeros(m2.shape[0])
+            else:
+                cm_max = np.where(m2 == top1, cm[top2], cm[top1])
+            s_s = np.maximum(0, self.cmax -
+                             np.maximum(np.maximum(m1_new, m2_new), cm_max[None, :]))
+            s_s[~feasible] = 0
+            if self.forbidden is not None:
+                # j1 va su m2 e j2 va su m1
+                _admissible(s_s, self.forbidden[j1][:, m2] | self.forbidden[j2, m1][None, :],
+                            self.aspiration)
+            self.profile.count("candidates.swap", s_s.size)
+            if s_s.size == 0:
+                continue
+            # first maximum in row-major order, the same tie-breaking of the loops
+            best = np.unravel_index(s_s.argmax(), s_s.shape)
+            if s_s[best] > s_star:
+                s_star = s_s[best]
+                a, b = best
+                update = (m1, r1[a], j1[a], m2[b], r2[b], j2[b])
         return (s_star, update)
 
     def save_remove(self, s_star: float, update: tuple) -> tuple[float, tuple]:
-        M = self.x.shape[1]
-        charge_left = self.b - (self.e @ self.y)
+        M = self.schedule.M
+        charge_left = self.tracker.charge_left
         cm = self._compute_cm()
         critical_machines = np.where(cm == cm.max())[0]
-        np.random.shuffle(critical_machines)
+        self.rng.shuffle(critical_machines)
 
         for m1 in critical_machines:
             top1, top2 = self._get_best_two(cm, m1)
+            jobs = self.schedule.agv_jobs(m1)
+            other_charges = self.tracker.charges.sum() - self.tracker.charges[m1]
+            self.profile.count("candidates.remove", jobs.shape[0] * other_charges)
             # iterate jobs of m1
-            for j in np.where(self.x[:, m1] == 1)[0]:
+            for j in jobs:
                 m1_new = cm[m1] - self.d[j]
                 # find new agv
                 for m2 in range(M):
@@ -187,7 +265,7 @@ class LocalSearch:
                         continue
                     m2_new = cm[m2] + self.d[j]
                     # iterate charge jobs of m2
-                    for r2 in np.where(self.q[:, m2] == 1)[0]:
+                    for r2 in self.schedule.charges_of(m2):
                         # check if you can add this job
                         if charge_left[r2, m2] >= self.e[j]:
                             if M <= 2 or critical_machines.shape[0] > 1:
@@ -195,27 +273,23 @@ class LocalSearch:
                             else:
                                 cm_max = cm[top2] if m2 == top1 else cm[top1]
                             s_r = max(0, self.cmax-max(m1_new, m2_new, cm_max))
-                            if s_r > s_star:
+                            if s_r > s_star and not self._is_tabu(j, m2, s_r):
                                 s_star = s_r
                                 # find the charge job
-                                r1 = self.y[:, j, m1].argmax()
+                                r1 = self.schedule.charge[j]
                                 update = (m1, r1, j, m2, r2, j)
         return (s_star, update)
 
     def update_best(self, update: tuple) -> 'LocalSearch':
-        m1, r1, j1, m2, r2, j2 = update
-
         # can use the same code to update either for add, remove and swap
-        self.x[j2, m1] = 1
-        self.x[j1, m1] = 0
-        self.x[j2, m2] = 0
-        self.x[j1, m2] = 1
-        self.y[r1, j2, m1] = 1
-        self.y[r1, j1, m1] = 0
-        self.y[r2, j2, m2] = 0
-        self.y[r2, j1, m2] = 1
-        self.q[r1, m1] = self.y[r1, :, m1].max()
-        self.q[r2, m2] = self.y[r2, :, m2].max()
-
-        self.cmax = self._compute_cm().max()
+        self.profile.count("accepted." + self.tracker.move_type(update))
+        self.tracker.apply(update)
+        self.cmax = self.tracker.cmax
+        return self
+
+    def restore(self, schedule: Schedule) -> 'LocalSearch':
+        # riparte da una soluzione salvata: profiler, stop() e rng restano gli stessi
+        self.schedule = schedule
+        self.tracker = LoadTracker(schedule, self.d, self.e, self.b, self.t)
+        self.cmax = self.tracker.cmax
         return self
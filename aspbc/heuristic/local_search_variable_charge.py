@@ -1,7 +1,13 @@
 import time
+import threading
 import numpy as np
 from .bgap_c import BGAPConstrained
 from .bgap_r_variable_charge import BGAPChargeOperations_VC
+from .load_tracker import LoadTracker_VC
+from .schedule import Schedule
+from .packing import max_charges_per_agv
+from .local_search import _admissible
+from aspbc.profiling import StageProfiler
 from numpy.typing import NDArray
 # x = transfer job j performed by m
 # q = charge jobe r performed by m
@@ -15,99 +21,130 @@ from numpy.typing import NDArray
 
 class LocalSearch_VC:
     def __init__(self,
-                 x: NDArray[np.bool_],
-                 y: NDArray[np.bool_],
-                 q: NDArray[np.bool_],
+                 schedule: Schedule,
                  cmax: float,
                  job_durations: NDArray[np.int64],
                  energy_job_costs: NDArray[np.float64],
                  time_per_charge_unit: float,
-                 battery_capacity: float
+                 battery_capacity: float,
+                 seed=None
                  ) -> None:
-        self.x = x  # (J, M)
-        self.y = y  # (R, J, M)
-        self.q = q  # (R, M)
+        self.schedule = schedule
         self.cmax = cmax
         self.d = job_durations
         self.tau = time_per_charge_unit
         self.e = energy_job_costs
         self.b = battery_capacity
+        self.tracker = LoadTracker_VC(schedule, job_durations, energy_job_costs,
+                                      battery_capacity, time_per_charge_unit)
+        self.profile = StageProfiler()
+        self._stop = threading.Event()
+        # memoria tabu come in LocalSearch: forbidden[j, m] e aspiration
+        self.forbidden = None
+        self.aspiration = np.inf
+        self.rng = np.random.default_rng(seed)
 
     @classmethod
     def from_constrained(cls,
                          bgap: BGAPConstrained,
                          time_per_charge_unit: float,
-                         charging_operations_number=0
+                         charging_operations_number=0,
+                         seed=None
                          ) -> 'LocalSearch_VC':
-        J = bgap.x.shape[0]
-        R = charging_operations_number if charging_operations_number != 0 else J
-        x = bgap.x
-        y = np.zeros((R, J, bgap.M), dtype=bool)
-        y[0, :, :] = x
-        q = np.zeros((J, bgap.M), dtype=bool)
-        q[0, :] = 1
+        R = charging_operations_number if charging_operations_number != 0 else \
+            max_charges_per_agv(bgap.e, bgap.b)
+        schedule = Schedule.from_assignment(bgap.x, R)
         cmax = bgap.z
 
-        ls = cls(x, y, q, cmax, bgap.d, bgap.e, time_per_charge_unit, bgap.b)
+        ls = cls(schedule, cmax, bgap.d, bgap.e, time_per_charge_unit, bgap.b, seed)
         return ls
 
     @classmethod
     def from_charge(cls,
                     bgap: BGAPChargeOperations_VC,
                     energy_job_costs: NDArray[np.float64],
-                    battery_capacity: float
+                    battery_capacity: float,
+                    seed=None
                     ) -> 'LocalSearch_VC':
         # chi = transfer operation j assigned to charge operation r
         # theta = charge operation r assigned to m
-        x = bgap.chi.T @ bgap.theta
-        q = np.zeros(bgap.theta.shape, dtype=bool)
-        y = np.stack([np.outer(bgap.chi[r], bgap.theta[r])
-                     for r in range(bgap.theta.shape[0])], axis=0)
-        for m in range(bgap.M):
-            rs = np.where(bgap.theta[:, m])[0]
-            for i, r in enumerate(rs):
-                q[i, m] = 1
-                if i != r:
-                    y[i] += y[r]
-                    y[r] = 0
-
-        ls = cls(x, y, q, bgap.z, bgap.d, energy_job_costs,
-                 bgap.tau, battery_capacity)
+        # le ricariche di ogni AGV vengono rinumerate come 0, 1, ..., k-1
+        schedule = Schedule.from_charge(bgap.chi, bgap.theta, compact=True)
+        ls = cls(schedule, bgap.z, bgap.d, energy_job_costs,
+                 bgap.tau, battery_capacity, seed)
         return ls
 
-    def solve(self):
+    @property
+    def x(self) -> NDArray[np.bool_]:
+        return self.schedule.to_arrays()[0]
+
+    @property
+    def y(self) -> NDArray[np.bool_]:
+        return self.schedule.to_arrays()[1]
+
+    @property
+    def q(self) -> NDArray[np.bool_]:
+        return self.schedule.q
+
+    def solve(self, time_limit: float | None = None, max_iterations: int | None = None,
+              callback=None, lower_bound: float | None = None):
+        # time_limit (s) e max_iterations fermano la ricerca con la migliore
+        # soluzione trovata, callback(cmax, iterazione) dopo ogni mossa accettata
+        # lower_bound: la ricerca si ferma quando cmax lo raggiunge (ottimo)
+        # self.status = "local_optimum", "time_limit", "max_iterations",
+        # "stopped" o "lower_bound"
         t0 = time.time()
-        while True:
-            s_star, update = self.iterations()
-            if s_star > 0.0:
-                self.update_best(update)
-            else:
-                break
+        iterations = 0
+        self.status = "local_optimum"
+        with self.profile.stage("search"):
+            while True:
+                if lower_bound is not None and self.cmax <= lower_bound:
+                    self.status = "lower_bound"
+                    break
+                if self._stop.is_set():
+                    self.status = "stopped"
+                    break
+                if time_limit is not None and time.time() - t0 >= time_limit:
+                    self.status = "time_limit"
+                    break
+                if max_iterations is not None and iterations >= max_iterations:
+                    self.status = "max_iterations"
+                    break
+                iterations += 1
+                self.profile.count("iterations")
+                s_star, update = self.best_move()
+                if s_star > 0.0:
+                    self.update_best(update)
+                    if callback is not None:
+                        callback(self.cmax, iterations)
+                else:
+                    break
+        self._stop.clear()
         self.time = time.time() - t0
         return self
 
-    def iterations(self) -> tuple[float, tuple]:
+    def best_move(self) -> tuple[float, tuple]:
+        # mossa con il risparmio maggiore fra swap, remove e add: ogni mossa è
+        # valutata in O(1) con l'energia per ricarica di ogni AGV (slot_energies)
         s_star = (0.0, ())  # saving time
-        c_m = self._compute_cm()  # duration for all AGVs
-        critical_machines = np.where(c_m == c_m.max())[0]
-
-        for m in critical_machines:
-            for r in np.where(self.q[:, m])[0]:
-                # iterate jobs of most loaded AGV
-                for j in np.where(self.y[r, :, m])[0]:
-                    # Find the respective charge job in m1
-                    idxs = (m, r, j)
-                    s_star = self.save_swap(*idxs, c_m, *s_star)
-                    s_star = self.save_remove(*idxs, c_m, *s_star)
-                    s_star = self.saving_add(*idxs, c_m, *s_star)
+        cm = self._compute_cm()
+        critical_machines = np.where(cm == cm.max())[0]
+        self.rng.shuffle(critical_machines)
+        slots = self.tracker.slot_energies()
+        for m1 in critical_machines:
+            s_star = self.save_swap(m1, cm, slots, *s_star)
+            s_star = self.save_remove(m1, cm, slots, *s_star)
+            s_star = self.saving_add(m1, cm, slots, *s_star)
         return s_star
 
+    def stop(self) -> None:
+        # può essere chiamato da un altro thread: la ricerca termina alla fine
+        # dell'iterazione corrente
+        self._stop.set()
+
     def _compute_cm(self) -> NDArray[np.float64]:
         # quanto tempo impiega ogni AGV a svolgere il suo lavoro
-        first = self.d @ self.x
-        second = self.tau * \
-            (np.sum((self.e @ self.y)[:-1] * self.q[1:], axis=0))
-        return first + second
+        return self.tracker.cm
 
     def _get_best_two(self, cm: NDArray[np.float64], m1: np.int64) -> tuple[np.int64, np.int64]:
         # precompute best cm-s
@@ -121,109 +158,135 @@ class LocalSearch_VC:
         cm[top1] = top1_val
         return (top1, top2)
 
-    def saving_add(self, m1: np.int64, r1: np.int64, j: np.int64, c_m: NDArray[np.float64], s_star: float, update: tuple) -> tuple[float, tuple]:
-        M = self.x.shape[1]
-        critical_machines = np.sum(c_m == c_m.max()) > 1
-        top1, top2 = self._get_best_two(c_m, m1)
-        cond = r1 < self.q[:, m1].sum() - 1
-        m1_without_j = c_m[m1] - self.d[j] - cond * self.tau * self.e[j]
-        # find another AGV
-        for m2 in range(M):
-            if m2 == m1:
-                continue
-            # Find a new charge job in m2
-            r2 = self.q[:, m2].sum(initial=1)
-            # Consider the cost of doing the job and a new charge
-            m2_with_j = c_m[m2] + self.d[j] + \
-                self.tau * (self.e @ self.y[r2-1, :, m2])
-            if M <= 2 or critical_machines:
-                cm_max = 0  # cm più alto che non è ne m1 ne m2
-            else:
-                cm_max = c_m[top1] if m2 != top1 else c_m[top2]
-                # Compute saving
-            s_a = max(0, self.cmax - max(m1_without_j, m2_with_j, cm_max))
-            # If you save time
-            if s_a > s_star:
-                s_star = s_a
-                update = (m1, r1, j, m2, r2, j)
+    def _others_max(self, cm: NDArray[np.float64], m1: np.int64, m2: NDArray[np.int64]) -> NDArray[np.float64]:
+        # cm più alto che non è ne m1 ne m2, per ogni m2
+        if self.schedule.M <= 2 or np.sum(cm == cm.max()) > 1:
+            return np.zeros(m2.shape[0])
+        top1, top2 = self._get_best_two(cm, m1)
+        return np.where(m2 == top1, cm[top2], cm[top1])
+
+    # Tempo di ricarica = tau * (energia totale - energia dell'ultima ricarica usata)
+    def _charge_without(self, m1: np.int64, r1: NDArray[np.int64], e: NDArray[np.float64],
+                        slots: tuple) -> NDArray[np.float64]:
+        # tempo di ricarica di m1 dopo aver tolto un job di costo e dalla ricarica r1
+        last, _, E_prev, _ = slots
+        charge_time = self.tracker.charge_time[m1]
+        # se r1 resta vuota l'ultima ricarica usata diventa la penultima
+        alone = self.tracker.n[r1, m1] == 1
+        return np.where(r1 != last[m1], charge_time - self.tau * e,
+                        np.where(alone, charge_time - self.tau * E_prev[m1], charge_time))
+
+    def _charge_with(self, m2: NDArray[np.int64], r2: NDArray[np.int64], e: NDArray[np.float64],
+                     slots: tuple) -> NDArray[np.float64]:
+        # tempo di ricarica di m2 dopo aver aggiunto un job di costo e alla ricarica r2
+        last, _, _, E_tot = slots
+        charge_time = self.tracker.charge_time[m2]
+        # dopo l'ultima ricarica usata: tutta l'energia precedente va ripristinata
+        return np.where(r2 > last[m2], self.tau * E_tot[m2],
+                        np.where(r2 == last[m2], charge_time, charge_time + self.tau * e))
+
+    def saving_add(self, m1: np.int64, cm: NDArray[np.float64], slots: tuple,
+                   s_star: float, update: tuple) -> tuple[float, tuple]:
+        # job di m1 in una nuova ricarica dopo l'ultima usata da m2
+        last, _, _, E_tot = slots
+        durations = self.tracker.durations
+        jobs = self.schedule.agv_jobs(m1)
+        r1 = self.schedule.charge[jobs]
+        m2 = np.delete(np.arange(self.schedule.M), m1)
+        self.profile.count("candidates.add", jobs.shape[0] * m2.shape[0])
+        if jobs.shape[0] == 0 or m2.shape[0] == 0:
+            return (s_star, update)
+        m1_new = durations[m1] - self.d[jobs] + self._charge_without(m1, r1, self.e[jobs], slots)
+        m2_new = (durations[m2] + self.tau * E_tot[m2])[None, :] + self.d[jobs][:, None]
+        s_a = np.maximum(0, self.cmax - np.maximum(np.maximum(m1_new[:, None], m2_new),
+                                                   self._others_max(cm, m1, m2)[None, :]))
+        if self.forbidden is not None:
+            _admissible(s_a, self.forbidden[jobs][:, m2], self.aspiration)
+        best = np.unravel_index(s_a.argmax(), s_a.shape)
+        if s_a[best] > s_star:
+            s_star = s_a[best]
+            a, b = best
+            update = (m1, r1[a], jobs[a], m2[b], last[m2[b]] + 1, jobs[a])
         return (s_star, update)
 
-    def save_swap(self, m1: np.int64, r1: np.int64, j1: np.int64, c_m: NDArray[np.float64], s_star: float, update: tuple) -> tuple[float, tuple]:
-        M = self.x.shape[1]
-        top1, top2 = self._get_best_two(c_m, m1)
-        critical_machines = np.sum(c_m == c_m.max()) > 1
-        # find another agv
-        for m2 in range(M):
-            if m2 == m1:
-                continue
-            # iterate charge jobs of m2
-            for r2 in np.where(self.q[:, m2] == 1)[0]:
-                # iterate jobs of m2 and r2
-                for j2 in np.where(self.y[r2, :, m2])[0]:
-                    # if both can accept charge
-                    charge_left_r1 = self.b - (self.e @ self.y[r1, :, m1])
-                    charge_left_r2 = self.b - (self.e @ self.y[r2, :, m2])
-                    if charge_left_r1 >= - self.e[j1] + self.e[j2] and charge_left_r2 >= self.e[j1] - self.e[j2]:
-                        cond = r1 < self.q[:, m1].sum() - 1
-                        cond2 = r2 < self.q[:, m2].sum() - 1
-                        m1_new = c_m[m1] - self.d[j1] + self.d[j2] + \
-                            self.tau * (- self.e[j1] + self.e[j2]) * cond
-                        m2_new = c_m[m2] + self.d[j1] - self.d[j2] - \
-                            self.tau * (self.e[j1] - self.e[j2]) * cond2
-                        if M <= 2 or critical_machines:
-                            cm_max = 0
-                        else:
-                            cm_max = c_m[top2] if m2 == top1 else c_m[top1]
-                        s_s = max(0, self.cmax - max(m1_new, m2_new, cm_max))
-                        if s_s > s_star:
-                            s_star = s_s
-                            update = (m1, r1, j1, m2, r2, j2)
+    def save_swap(self, m1: np.int64, cm: NDArray[np.float64], slots: tuple,
+                  s_star: float, update: tuple) -> tuple[float, tuple]:
+        last = slots[0]
+        durations = self.tracker.durations
+        charge_time = self.tracker.charge_time
+        charge_left = self.tracker.charge_left
+        # jobs in the same order as the loops over (m, r, j)
+        jobs = self.schedule.ordered_jobs()
+        agv = self.schedule.agv[jobs]
+        charge = self.schedule.charge[jobs]
+        on_m1 = agv == m1
+        j1, r1 = jobs[on_m1], charge[on_m1]
+        j2, r2, m2 = jobs[~on_m1], charge[~on_m1], agv[~on_m1]
+        # rows are jobs of m1, columns jobs of the other AGVs
+        delta_e = self.e[j2][None, :] - self.e[j1][:, None]
+        feasible = (charge_left[r1, m1][:, None] >= delta_e) & \
+            (charge_left[r2, m2][None, :] >= -delta_e)
+        # la ricarica cambia solo se il job non è nell'ultima ricarica usata
+        m1_new = (durations[m1] + charge_time[m1] - self.d[j1])[:, None] + self.d[j2][None, :] + \
+            self.tau * delta_e * (r1 != last[m1])[:, None]
+        m2_new = (durations[m2] + charge_time[m2] - self.d[j2])[None, :] + self.d[j1][:, None] - \
+            self.tau * delta_e * (r2 != last[m2])[None, :]
+        s_s = np.maximum(0, self.cmax - np.maximum(np.maximum(m1_new, m2_new),
+                                                   self._others_max(cm, m1, m2)[None, :]))
+        s_s[~feasible] = 0
+        if self.forbidden is not None:
+            # j1 va su m2 e j2 va su m1
+            _admissible(s_s, self.forbidden[j1][:, m2] | self.forbidden[j2, m1][None, :],
+                        self.aspiration)
+        self.profile.count("candidates.swap", s_s.size)
+        if s_s.size == 0:
+            return (s_star, update)
+        best = np.unravel_index(s_s.argmax(), s_s.shape)
+        if s_s[best] > s_star:
+            s_star = s_s[best]
+            a, b = best
+            update = (m1, r1[a], j1[a], m2[b], r2[b], j2[b])
         return (s_star, update)
 
-    def save_remove(self, m1: np.int64, r1: np.int64, j: np.int64, c_m: NDArray[np.float64], s_star: float, update: tuple) -> tuple[float, tuple]:
-        M = self.x.shape[1]
-        top1, top2 = self._get_best_two(c_m, m1)
-        critical_machines = np.sum(c_m == c_m.max()) > 1
-        # iterate jobs of m1
-        cond = r1 < self.q[:, m1].sum() - 1
-        m1_new = c_m[m1] - self.d[j] - cond * self.tau * self.e[j]
-        # find new agv
-        for m2 in range(M):
-            if m2 == m1:
-                continue
-            # iterate charge jobs of m2
-            for r2 in np.where(self.q[:, m2] == 1)[0]:
-                # check if you can add this job
-                charge_left = self.b - (self.e @ self.y[r2, :, m2])
-                if charge_left >= self.e[j]:
-                    cond = r2 < self.q[:, m2].sum() - 1
-                    m2_new = c_m[m2] + self.d[j] + \
-                        cond * self.tau * self.e[j]
-                    if M <= 2 or critical_machines:
-                        cm_max = 0
-                    else:
-                        cm_max = c_m[top2] if m2 == top1 else c_m[top1]
-                    s_r = max(0, self.cmax-max(m1_new, m2_new, cm_max))
-                    if s_r > s_star:
-                        s_star = s_r
-                        # find the charge job
-                        update = (m1, r1, j, m2, r2, j)
+    def save_remove(self, m1: np.int64, cm: NDArray[np.float64], slots: tuple,
+                    s_star: float, update: tuple) -> tuple[float, tuple]:
+        # job di m1 in una ricarica esistente di un altro AGV
+        durations = self.tracker.durations
+        jobs = self.schedule.agv_jobs(m1)
+        r1 = self.schedule.charge[jobs]
+        # ricariche degli altri AGV nell'ordine (m2, r2)
+        m2, r2 = np.nonzero(self.schedule.q.T)
+        r2, m2 = r2[m2 != m1], m2[m2 != m1]
+        self.profile.count("candidates.remove", jobs.shape[0] * m2.shape[0])
+        if jobs.shape[0] == 0 or m2.shape[0] == 0:
+            return (s_star, update)
+        e = self.e[jobs][:, None]
+        feasible = self.tracker.charge_left[r2, m2][None, :] >= e
+        m1_new = durations[m1] - self.d[jobs] + self._charge_without(m1, r1, self.e[jobs], slots)
+        m2_new = durations[m2][None, :] + self.d[jobs][:, None] + \
+            self._charge_with(m2[None, :], r2[None, :], e, slots)
+        s_r = np.maximum(0, self.cmax - np.maximum(np.maximum(m1_new[:, None], m2_new),
+                                                   self._others_max(cm, m1, m2)[None, :]))
+        s_r[~feasible] = 0
+        if self.forbidden is not None:
+            _admissible(s_r, self.forbidden[jobs][:, m2], self.aspiration)
+        best = np.unravel_index(s_r.argmax(), s_r.shape)
+        if s_r[best] > s_star:
+            s_star = s_r[best]
+            a, b = best
+            update = (m1, r1[a], jobs[a], m2[b], r2[b], jobs[a])
         return (s_star, update)
 
     def update_best(self, update: tuple) -> 'LocalSearch_VC':
-        m1, r1, j1, m2, r2, j2 = update
-
         # can use the same code to update either for add, remove and swap
-        self.x[j2, m1] = 1
-        self.x[j1, m1] = 0
-        self.x[j2, m2] = 0
-        self.x[j1, m2] = 1
-        self.y[r1, j2, m1] = 1
-        self.y[r1, j1, m1] = 0
-        self.y[r2, j2, m2] = 0
-        self.y[r2, j1, m2] = 1
-        self.q[r1, m1] = self.y[r1, :, m1].max()
-        self.q[r2, m2] = self.y[r2, :, m2].max()
-
-        self.cmax = self._compute_cm().max()
+        self.profile.count("accepted." + self.tracker.move_type(update))
+        self.tracker.apply(update)
+        self.cmax = self.tracker.cmax
+        return self
+
+    def restore(self, schedule: Schedule) -> 'LocalSearch_VC':
+        # riparte da una soluzione salvata: profiler, stop() e rng restano gli stessi
+        self.schedule = schedule
+        self.tracker = LoadTracker_VC(schedule, self.d, self.e, self.b, self.tau)
+        self.cmax = self.tracker.cmax
         return self
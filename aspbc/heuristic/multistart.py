@@ -0,0 +1,91 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .local_search_variable_charge import LocalSearch_VC
+from .schedule import Schedule
+
+# Multi-start: N copie della local search partono dalla soluzione del BGAP,
+# tutte tranne la prima perturbate con mosse casuali, ognuna con il proprio
+# seed (figli di un unico SeedSequence). Vince il cmax minore, a parità la
+# copia con indice minore, quindi il risultato dipende solo dal seed master.
+
+
+def perturb(local_search, moves: int, rng: np.random.Generator):
+    # sposta `moves` jobs casuali su un altro AGV, in una ricarica con
+    # abbastanza carica residua oppure in una nuova ricarica
+    schedule, tracker = local_search.schedule, local_search.tracker
+    if schedule.M < 2:
+        return local_search
+    for _ in range(moves):
+        assigned = np.flatnonzero(schedule.agv >= 0)
+        j = rng.choice(assigned)
+        m1, r1 = schedule.agv[j], schedule.charge[j]
+        m2 = rng.choice(np.delete(np.arange(schedule.M), m1))
+        charges = schedule.charges_of(m2)
+        fits = charges[tracker.charge_left[charges, m2] >= local_search.e[j]]
+        r2 = rng.choice(fits) if fits.shape[0] > 0 else tracker.last_charge(m2) + 1
+        tracker.apply((m1, r1, j, m2, r2, j))
+    local_search.cmax = tracker.cmax
+    return local_search
+
+
+def _charge_parameter(local_search) -> float:
+    # tempo di ricarica fisso (t) o per unità di energia (tau)
+    return local_search.tau if isinstance(local_search, LocalSearch_VC) else local_search.t
+
+
+def _run_start(cls, arrays: tuple, cmax: float, d, e, charge, b,
+               seed: np.random.SeedSequence, moves: int, deadline: float,
+               max_iterations: int, lower_bound: float) -> tuple:
+    agv, r, q = arrays
+    ls = cls(Schedule(agv.copy(), r.copy(), q.copy()), cmax, d, e, charge, b, seed)
+    if moves > 0:
+        perturb(ls, moves, ls.rng)
+    time_limit = None if deadline is None else max(0.0, deadline - time.time())
+    ls.solve(time_limit=time_limit, max_iterations=max_iterations, lower_bound=lower_bound)
+    return (ls.cmax, ls.schedule.agv, ls.schedule.charge, ls.schedule.q, ls.profile)
+
+
+def multi_start(local_search,
+                starts: int = 4,
+                seed=None,
+                strength: float = 0.05,
+                workers: int = 0,
+                time_limit: float | None = None,
+                max_iterations: int | None = None,
+                lower_bound: float | None = None):
+    # restituisce una local search (stessa classe) con la migliore soluzione;
+    # best.starts = cmax finale di ogni copia, best.profile = tempi e contatori
+    # sommati su tutte le copie
+    t0 = time.time()
+    cls = type(local_search)
+    schedule = local_search.schedule
+    seeds = np.random.SeedSequence(seed).spawn(starts)
+    moves = max(1, round(strength * schedule.J))
+    # wall clock: la scadenza vale anche nei processi worker
+    deadline = None if time_limit is None else t0 + time_limit
+    common = ((schedule.agv, schedule.charge, schedule.q), local_search.cmax,
+              local_search.d, local_search.e, _charge_parameter(local_search), local_search.b)
+    args = [(cls, *common, seeds[i], 0 if i == 0 else moves, deadline, max_iterations, lower_bound)
+            for i in range(starts)]
+
+    workers = workers if workers > 0 else min(starts, os.cpu_count() or 1)
+    if workers == 1:
+        results = [_run_start(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(_run_start, *zip(*args)))
+
+    i = min(range(starts), key=lambda k: (results[k][0], k))
+    cmax, agv, charge, q, _ = results[i]
+    best = cls(Schedule(agv, charge, q), cmax, local_search.d, local_search.e,
+               _charge_parameter(local_search), local_search.b, seeds[i])
+    best.starts = [r[0] for r in results]
+    for result in results:
+        best.profile.merge(result[-1])
+    best.profile.count("starts", starts)
+    best.time = time.time() - t0
+    return best
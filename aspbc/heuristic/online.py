@@ -0,0 +1,149 @@
+import time
+
+import numpy as np
+
+from aspbc.profiling import StageProfiler
+
+from .local_search import LocalSearch
+
+# Ripianificazione online sopra la soluzione della LocalSearch (x/y/q come Schedule):
+# - add_job inserisce il nuovo job con best fit (AGV che finisce prima, ricarica
+#   con meno carica residua che lo contiene, altrimenti una nuova ricarica)
+# - remove_job toglie un job cancellato o completato
+# - set_battery fissa la carica residua della ricarica in corso (ricarica 0)
+#   di un AGV; i jobs che non ci stanno più vengono reinseriti
+# dopo ogni modifica una local search limitata (repair_time, max_iterations)
+# ripara la soluzione partendo da quella corrente.
+#
+# planner = OnlinePlanner.from_model(ASPBC(...).solve_matheuristic(env))
+# j = planner.add_job(duration, energy)
+# planner.remove_job(j)
+#
+# gli indici dei jobs restano stabili: i jobs rimossi restano non assegnati (agv = -1)
+
+
+class OnlinePlanner:
+    def __init__(self,
+                 local_search: LocalSearch,
+                 repair_time: float = 0.01,
+                 max_iterations: int | None = None
+                 ) -> None:
+        self.local_search = local_search
+        self.repair_time = repair_time
+        self.max_iterations = max_iterations
+        # energia già consumata nella ricarica in corso di ogni AGV (E[0, m] la
+        # include, e conta come un job in n[0, m] finché è positiva)
+        self.consumed = np.zeros(local_search.schedule.M, dtype=np.float64)
+        self.profile = StageProfiler()
+        self.time = 0.0
+
+    @classmethod
+    def from_model(cls, model, seed=None, **kwargs) -> 'OnlinePlanner':
+        # model = ASPBC dopo solve_matheuristic (usa model.schedule)
+        # ricariche di ogni AGV rinumerate 0, 1, ...: la ricarica 0 è quella in corso
+        schedule = model.schedule.compacted()
+        local_search = LocalSearch(schedule, 0.0, model.d.copy(), model.e.copy(),
+                                   model.t, model.b, seed)
+        local_search.cmax = local_search.tracker.cmax
+        return cls(local_search, **kwargs)
+
+    @property
+    def schedule(self):
+        return self.local_search.schedule
+
+    @property
+    def cmax(self) -> float:
+        return self.local_search.cmax
+
+    def add_job(self, duration: int, energy: float, repair: bool = True) -> int:
+        # repair = False per applicare più modifiche e riparare una volta sola (repair())
+        ls = self.local_search
+        if energy > ls.b:
+            raise ValueError(f"Job energy {energy} exceeds the battery capacity {ls.b}")
+        t0 = time.perf_counter()
+        with self.profile.stage("insert"):
+            ls.d = ls.tracker.d = np.append(ls.d, duration)
+            ls.e = ls.tracker.e = np.append(ls.e, energy)
+            j = ls.schedule.J
+            ls.schedule.add_jobs(1)
+            self._insert(j)
+        self._updated(t0, repair)
+        return j
+
+    def remove_job(self, j: int, repair: bool = True) -> 'OnlinePlanner':
+        t0 = time.perf_counter()
+        with self.profile.stage("remove"):
+            if self.schedule.agv[j] < 0:
+                raise ValueError(f"Job {j} is not scheduled")
+            self.local_search.tracker.remove(j)
+        self._updated(t0, repair)
+        return self
+
+    def set_battery(self, m: int, level: float, repair: bool = True) -> 'OnlinePlanner':
+        # level = carica residua dell'AGV m prima dei jobs della ricarica in corso
+        ls = self.local_search
+        if not 0 <= level <= ls.b:
+            raise ValueError(f"Battery level {level} outside [0, {ls.b}]")
+        t0 = time.perf_counter()
+        with self.profile.stage("battery"):
+            tracker = ls.tracker
+            consumed = ls.b - level
+            tracker.E[0, m] += consumed - self.consumed[m]
+            # l'energia consumata occupa la ricarica in corso come un job: la
+            # ricarica 0 resta attiva anche senza jobs e le successive costano t
+            tracker.n[0, m] += int(consumed > 0) - int(self.consumed[m] > 0)
+            self.consumed[m] = consumed
+            if tracker.n[0, m] > 0 and not ls.schedule.q[0, m]:
+                ls.schedule.q[0, m] = True
+                tracker.charges[m] += 1
+                tracker.cm[m] = tracker._cm(m)
+                ls.cmax = tracker.cmax
+            # i jobs della ricarica in corso che non ci stanno più, dal più costoso
+            evicted = []
+            for j in sorted(ls.schedule.jobs(0, m), key=lambda j: -ls.e[j]):
+                if tracker.charge_left[0, m] >= 0:
+                    break
+                tracker.remove(j)
+                evicted.append(j)
+            for j in evicted:
+                self._insert(j)
+        self._updated(t0, repair)
+        return self
+
+    def repair(self) -> 'OnlinePlanner':
+        ls = self.local_search
+        ls.cmax = ls.tracker.cmax
+        with self.profile.stage("repair"):
+            ls.solve(time_limit=self.repair_time, max_iterations=self.max_iterations,
+                     lower_bound=self.lower_bound())
+        return self
+
+    def lower_bound(self) -> float:
+        # durata media per AGV e job più lungo fra quelli assegnati
+        d = self.local_search.d[self.schedule.agv >= 0]
+        if d.shape[0] == 0:
+            return 0.0
+        return max(d.sum() / self.schedule.M, d.max())
+
+    def _insert(self, j: int) -> None:
+        ls = self.local_search
+        tracker, q = ls.tracker, ls.schedule.q
+        M = q.shape[1]
+        left = tracker.charge_left
+        fits = q & (left >= ls.e[j])
+        # best fit: la ricarica che resta con meno carica
+        slot = np.where(fits, left - ls.e[j], np.inf).argmin(axis=0)
+        new = np.array([tracker.last_charge(m) + 1 for m in range(M)], dtype=np.int64)
+        # una ricarica in corso vuota si usa solo se la carica residua basta
+        new[(new == 0) & (left[0] < ls.e[j])] = 1
+        has_slot = fits.any(axis=0)
+        finish = tracker.cm + ls.d[j] + np.where(has_slot, 0.0, ls.t)
+        m = finish.argmin()
+        tracker.insert(j, m, slot[m] if has_slot[m] else new[m])
+        ls.cmax = tracker.cmax
+
+    def _updated(self, t0: float, repair: bool) -> None:
+        if repair:
+            self.repair()
+        # latenza dell'ultima modifica (s)
+        self.time = time.perf_counter() - t0
@@ -0,0 +1,98 @@
+from math import ceil, floor
+
+import numpy as np
+from numpy.typing import NDArray
+
+# Euristiche e lower bound combinatori per il Bin Packing Problem:
+# ogni ricarica è un bin di capacità b, ogni job un oggetto di peso e[j].
+
+# tolleranza sui confronti con la capacità (i costi sono decimali)
+EPS = 1e-9
+
+
+def first_fit_decreasing(job_costs: NDArray[np.float64], battery_capacity: float) -> NDArray[np.int64]:
+    # bin assegnato ad ogni job
+    return _fit_decreasing(job_costs, battery_capacity, best=False)
+
+
+def best_fit_decreasing(job_costs: NDArray[np.float64], battery_capacity: float) -> NDArray[np.int64]:
+    return _fit_decreasing(job_costs, battery_capacity, best=True)
+
+
+def _fit_decreasing(job_costs: NDArray[np.float64], battery_capacity: float, best: bool) -> NDArray[np.int64]:
+    J = job_costs.shape[0]
+    bins = np.zeros(J, dtype=np.int64)
+    residual = np.full(J, battery_capacity, dtype=np.float64)
+    opened = 0
+    # stable sort: jobs with the same cost keep their index order
+    for j in np.argsort(-job_costs, kind="stable"):
+        fits = np.flatnonzero(residual[:opened] >= job_costs[j] - EPS)
+        if fits.shape[0] == 0:
+            r = opened
+            opened += 1
+        elif best:
+            r = fits[residual[fits].argmin()]
+        else:
+            r = fits[0]
+        residual[r] -= job_costs[j]
+        bins[j] = r
+    return bins
+
+
+def lower_bound_l1(job_costs: NDArray[np.float64], battery_capacity: float) -> int:
+    return max(1, ceil(job_costs.sum() / battery_capacity - EPS)) if job_costs.shape[0] > 0 else 0
+
+
+def lower_bound_l2(job_costs: NDArray[np.float64], battery_capacity: float) -> int:
+    # Martello e Toth (1990): per ogni soglia alpha <= b/2
+    # J1 = jobs che non possono stare con nessun job >= alpha
+    # J2 = jobs grandi (> b/2) che lasciano spazio ad altri jobs
+    # J3 = jobs tra alpha e b/2 che possono andare solo nello spazio lasciato da J2
+    b = battery_capacity
+    bound = lower_bound_l1(job_costs, b)
+    alphas = np.unique(np.concatenate([[0.0], job_costs[job_costs <= b / 2 + EPS]]))
+    for alpha in alphas:
+        j1 = job_costs > b - alpha + EPS
+        j2 = (job_costs <= b - alpha + EPS) & (job_costs > b / 2 + EPS)
+        j3 = (job_costs <= b / 2 + EPS) & (job_costs >= alpha - EPS)
+        space = j2.sum() * b - job_costs[j2].sum()
+        extra = max(0, ceil((job_costs[j3].sum() - space) / b - EPS))
+        bound = max(bound, int(j1.sum() + j2.sum() + extra))
+    return bound
+
+
+def max_charges_per_agv(job_costs: NDArray[np.float64],
+                        battery_capacity: float,
+                        job_durations: NDArray[np.int64] = None,
+                        fleet_size: int = 0,
+                        charge_duration: float = 0.0
+                        ) -> int:
+    # numero di ricariche sufficiente ad ogni AGV in una soluzione ottima:
+    # - due ricariche dello stesso AGV che stanno in una batteria si possono
+    #   unire senza peggiorare la soluzione, quindi ogni coppia consecutiva
+    #   supera b e k <= 2 * ceil(E / b) - 1
+    # - con tempo di ricarica fisso (se sono date le durate) i jobs di un AGV
+    #   stanno in al più FFD bins e t * (k - 1) non supera il makespan di una
+    #   soluzione ammissibile
+    J = job_costs.shape[0]
+    bound = min(J, 2 * lower_bound_l1(job_costs, battery_capacity) - 1)
+    if job_durations is not None:
+        bins = first_fit_decreasing(job_costs, battery_capacity)
+        bound = min(bound, bins.max() + 1)
+        if fleet_size > 0 and charge_duration > 0:
+            ub = _lpt_makespan(bins, job_durations, fleet_size, charge_duration)
+            bound = min(bound, floor(ub / charge_duration) + 1)
+    return max(1, int(bound))
+
+
+def _lpt_makespan(bins: NDArray[np.int64],
+                  job_durations: NDArray[np.int64],
+                  fleet_size: int,
+                  charge_duration: float
+                  ) -> float:
+    # assegna le ricariche (durata dei jobs + t) all'AGV più scarico
+    D = np.bincount(bins, weights=job_durations) + charge_duration
+    load = np.zeros(fleet_size)
+    for r in np.argsort(-D, kind="stable"):
+        load[load.argmin()] += D[r]
+    return max(0.0, load.max() - charge_duration)
@@ -0,0 +1,158 @@
+from bisect import insort
+
+import numpy as np
+from numpy.typing import NDArray
+
+# Rappresentazione compatta di una soluzione, indicizzata per job:
+# agv[j] = AGV che esegue il job j (-1 se il job non è assegnato)
+# charge[j] = ricarica dopo cui l'AGV esegue il job j
+# slots[m][r] = jobs eseguiti dall'AGV m dopo la ricarica r (ordinati)
+# q[r, m] = ricarica r eseguita dall'AGV m
+#
+# la memoria cresce con O(J + R*M) invece di O(R*J*M) del tensore y
+
+
+class Schedule:
+    def __init__(self,
+                 agv: NDArray[np.int64],
+                 charge: NDArray[np.int64],
+                 q: NDArray[np.bool_]
+                 ) -> None:
+        self.agv = agv      # (J, )
+        self.charge = charge  # (J, )
+        self.q = q          # (R, M)
+        self.slots = [[[] for _ in range(self.R)] for _ in range(self.M)]
+        for j in np.flatnonzero(self.agv >= 0):
+            self.slots[self.agv[j]][self.charge[j]].append(j)
+
+    @property
+    def J(self) -> int:
+        return self.agv.shape[0]
+
+    @property
+    def R(self) -> int:
+        return self.q.shape[0]
+
+    @property
+    def M(self) -> int:
+        return self.q.shape[1]
+
+    @classmethod
+    def from_arrays(cls,
+                    x: NDArray[np.bool_],
+                    y: NDArray[np.bool_],
+                    q: NDArray[np.bool_]
+                    ) -> 'Schedule':
+        # x (J, M), y (R, J, M), q (R, M)
+        agv = np.where(x.any(axis=1), x.argmax(axis=1), -1)
+        charge = np.zeros(x.shape[0], dtype=np.int64)
+        r, j, _ = np.nonzero(y)
+        charge[j] = r
+        return cls(agv, charge, q.astype(bool))
+
+    @classmethod
+    def from_assignment(cls,
+                        x: NDArray[np.bool_],
+                        charging_operations_number: int
+                        ) -> 'Schedule':
+        # tutti i jobs dopo la prima ricarica (soluzione di BGAPConstrained)
+        J, M = x.shape
+        q = np.zeros((charging_operations_number, M), dtype=bool)
+        q[0, :] = 1
+        return cls(x.argmax(axis=1), np.zeros(J, dtype=np.int64), q)
+
+    @classmethod
+    def from_charge(cls,
+                    chi: NDArray[np.bool_],
+                    theta: NDArray[np.bool_],
+                    compact: bool = False
+                    ) -> 'Schedule':
+        # chi (R, J) = job j nella ricarica r, theta (R, M) = ricarica r all'AGV m
+        r_of_job = chi.argmax(axis=0)
+        agv = theta.argmax(axis=1)[r_of_job]
+        q = theta.astype(bool)
+        if not compact:
+            return cls(agv, r_of_job, q)
+        # rinumera le ricariche di ogni AGV come 0, 1, ..., k-1
+        position = np.zeros(theta.shape[0], dtype=np.int64)
+        q = np.zeros(theta.shape, dtype=bool)
+        for m in range(theta.shape[1]):
+            rs = np.flatnonzero(theta[:, m])
+            position[rs] = np.arange(rs.shape[0])
+            q[:rs.shape[0], m] = 1
+        return cls(agv, position[r_of_job], q)
+
+    def copy(self) -> 'Schedule':
+        return Schedule(self.agv.copy(), self.charge.copy(), self.q.copy())
+
+    def compacted(self) -> 'Schedule':
+        # ricariche usate di ogni AGV rinumerate come 0, 1, ..., k-1
+        # (la ricarica 0 resta attiva anche per gli AGV senza jobs)
+        position = np.zeros((self.R, self.M), dtype=np.int64)
+        q = np.zeros((self.R, self.M), dtype=bool)
+        q[0, :] = 1
+        for m in range(self.M):
+            used = np.array([r for r, jobs in enumerate(self.slots[m]) if jobs],
+                            dtype=np.int64)
+            position[used, m] = np.arange(used.shape[0])
+            q[:used.shape[0], m] = 1
+        assigned = np.flatnonzero(self.agv >= 0)
+        charge = self.charge.copy()
+        charge[assigned] = position[charge[assigned], self.agv[assigned]]
+        return Schedule(self.agv.copy(), charge, q)
+
+    def jobs(self, r: int, m: int) -> list[int]:
+        return self.slots[m][r]
+
+    def agv_jobs(self, m: int) -> NDArray[np.int64]:
+        return np.flatnonzero(self.agv == m)
+
+    def ordered_jobs(self) -> NDArray[np.int64]:
+        # jobs assegnati ordinati per (AGV, ricarica, job)
+        assigned = np.flatnonzero(self.agv >= 0)
+        order = np.lexsort((assigned, self.charge[assigned], self.agv[assigned]))
+        return assigned[order]
+
+    def charges_of(self, m: int) -> NDArray[np.int64]:
+        return np.flatnonzero(self.q[:, m])
+
+    def grow(self, R: int) -> 'Schedule':
+        # aggiunge ricariche (vuote) fino ad averne R
+        if R > self.R:
+            extra = np.zeros((R - self.R, self.M), dtype=bool)
+            self.q = np.concatenate([self.q, extra])
+            for slots in self.slots:
+                slots.extend([] for _ in range(R - len(slots)))
+        return self
+
+    def add_jobs(self, count: int) -> 'Schedule':
+        # nuovi jobs J, ..., J+count-1 non assegnati
+        self.agv = np.concatenate([self.agv, np.full(count, -1, dtype=np.int64)])
+        self.charge = np.concatenate([self.charge, np.zeros(count, dtype=np.int64)])
+        return self
+
+    def unassign(self, j: int) -> 'Schedule':
+        if self.agv[j] >= 0:
+            self.slots[self.agv[j]][self.charge[j]].remove(j)
+        self.agv[j] = -1
+        self.charge[j] = 0
+        return self
+
+    def move(self, j: int, m: int, r: int) -> 'Schedule':
+        if self.agv[j] >= 0:
+            self.slots[self.agv[j]][self.charge[j]].remove(j)
+        insort(self.slots[m][r], j)
+        self.agv[j] = m
+        self.charge[j] = r
+        return self
+
+    def to_arrays(self, charging_operations_number: int = 0) -> tuple[NDArray[np.bool_], NDArray[np.bool_], NDArray[np.bool_]]:
+        R = max(self.R, charging_operations_number)
+        assigned = np.flatnonzero(self.agv >= 0)
+        x = np.zeros((self.J, self.M), dtype=bool)
+        x[assigned, self.agv[assigned]] = 1
+        y = np.zeros((R, self.J, self.M), dtype=bool)
+        y[self.charge[assigned], assigned, self.agv[assigned]] = 1
+        q = np.zeros((R, self.M), dtype=bool)
+        q[:self.R] = self.q
+        return (x, y, q)
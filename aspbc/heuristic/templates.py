@@ -0,0 +1,61 @@
+from collections import OrderedDict
+
+import gurobipy as gp
+import numpy as np
+from numpy.typing import NDArray
+
+# Modelli BGAP riutilizzati fra istanze con la stessa forma (M, J o ricariche).
+# Nei batch la stessa forma ricorre per tutte le istanze di una famiglia V/J:
+# il modello gurobipy viene costruito una volta, poi per ogni istanza
+# - model.reset(1) scarta soluzione, Start e informazioni del solve precedente
+# - i parametri (TimeLimit, BestObjStop, ...) tornano ai valori della costruzione
+# - update(model) della classe BGAP scrive i coefficienti della nuova istanza
+#
+# templates = ModelTemplates()
+# BGAPConstrained(M, e, d, b).solve(env, templates=templates)
+
+# parametri impostati da solve() e da ripristinare fra un'istanza e l'altra
+RESET_PARAMS = ("TimeLimit", "BestObjStop")
+
+
+class ModelTemplates:
+    def __init__(self, size: int = 16) -> None:
+        # size = numero massimo di modelli tenuti in memoria (LRU)
+        self.size = size
+        self.models = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def model(self, key: tuple, env, build, update) -> tuple:
+        # key = classe e forma del modello; build() e update(model) restituiscono
+        # la stessa tupla (model, variabili...) di build() della classe BGAP
+        key = key + (id(env),)
+        model = self.models.get(key)
+        if model is None:
+            self.misses += 1
+            built = build()
+            model = built[0]
+            model._params = {name: model.getParamInfo(name)[2] for name in RESET_PARAMS}
+            self.models[key] = model
+            if len(self.models) > self.size:
+                self.models.popitem(last=False)[1].dispose()
+            return built
+        self.hits += 1
+        self.models.move_to_end(key)
+        model.reset(1)
+        for name, value in model._params.items():
+            model.setParam(name, value)
+        return update(model)
+
+    def dispose(self) -> None:
+        for model in self.models.values():
+            model.dispose()
+        self.models.clear()
+
+
+def _change_coeffs(model: gp.Model, constrs: list, variables: list,
+                   old: NDArray[np.float64], new: NDArray[np.float64]) -> None:
+    # coefficiente new[i, k] della variabile variables[i][k] nel vincolo constrs[k],
+    # riscritto solo dove cambia rispetto all'istanza precedente (old)
+    for i, k in zip(*np.nonzero(old != new)):
+        model.chgCoeff(constrs[k], variables[i][k], new[i, k])
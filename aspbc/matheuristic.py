@@ -0,0 +1,120 @@
+import time
+
+import numpy as np
+
+from .heuristic import (
+    BGAPConstrained,
+    BinPackingProblem,
+    IteratedLocalSearch,
+    multi_start,
+)
+from .heuristic.templates import ModelTemplates
+from .profiling import StageProfiler
+from .utility import _progress, _time_left
+
+# Matheuristica a tre stadi (BPP, BGAP, local search) comune ad ASPBC e ASPBC_VC:
+# i modelli passano solo ciò che cambia fra ricarica fissa e variabile
+# - bgap_charge = BGAP delle ricariche (BGAPChargeOperations o BGAPChargeOperations_VC)
+# - local_search_cls = LocalSearch o LocalSearch_VC
+# - charge = tempo di ricarica fisso (t) o per unità di energia (tau)
+# - lower_bound(bpp) = lower bound del makespan con cui fermare gli stadi
+# e il risultato è scritto nel modello (schedule, lb, ub, gap, time, profile)
+
+# quota del tempo rimanente data a BPP e BGAP con time_budget (la local search usa il resto)
+BUDGET_SHARES = (0.25, 0.75)
+# kicks dell'iterated local search senza time_budget
+ITERATED_KICKS = 100
+
+
+def solve_matheuristic(model, env, bgap_charge, local_search_cls, charge: float, lower_bound,
+                       time_budget: float | None = None, starts: int = 1, seed=None, workers: int = 0,
+                       iterated: bool = False, bpp_method: str = "assignment",
+                       backend: str = "gurobi", templates: ModelTemplates | None = None,
+                       callback=None):
+    # time_budget (s) = una sola scadenza per i tre stadi: ogni stadio riceve
+    # una quota del tempo rimanente, quello non usato passa ai successivi
+    # starts > 1 = multi-start della local search su `workers` processi
+    # iterated = iterated local search con memoria tabu fino alla scadenza
+    # (ITERATED_KICKS kicks senza time_budget)
+    # bpp_method = "assignment" o "arcflow" (BinPackingProblem.solve)
+    # backend = "gurobi" o "highs": solver dei MILP di ogni stadio (aspbc.backend);
+    # HiGHS non ha BestObjStop, quindi con "highs" BPP e BGAP non si fermano al
+    # lower bound (l'early stop vale solo per la local search)
+    # templates = modelli BGAP riutilizzati fra istanze della stessa forma
+    # callback(event) = progressi: {"stage": "bpp", "lb"}, poi {"stage": "bgap"/"ls"/"ils", "ub"}
+    # ad ogni nuova soluzione (non nel multi-start)
+    # model.profile = tempi wall/CPU di ogni stadio e contatori della local search
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    bpp_share, bgap_share = BUDGET_SHARES
+    model.profile = StageProfiler()
+    with model.profile.stage("bpp"):
+        bpp = BinPackingProblem(model.e, model.b)
+        bpp.solve(env, time_limit=_time_left(deadline, bpp_share), method=bpp_method,
+                  backend=backend)
+    model.profile.merge(bpp.profile, "bpp")
+    model.time = bpp.time
+    # ogni stadio si ferma appena la soluzione raggiunge il lower bound
+    model.lb = lower_bound(bpp)
+    if callback is not None:
+        callback({"stage": "bpp", "lb": float(model.lb)})
+
+    local_search = None
+    # se numero ricariche necessarie <= numero di AGV
+    with model.profile.stage("bgap"):
+        time_limit = _time_left(deadline, bgap_share)
+        if bpp.zeta <= model.M:
+            bgap = BGAPConstrained(model.M, model.e, model.d, model.b)
+            # with a deadline the BPP bins (at most M) are the starting assignment
+            start = None
+            if deadline is not None:
+                start = np.zeros((model.e.shape[0], model.M), dtype=bool)
+                start[np.arange(model.e.shape[0]), bpp.chi.argmax(axis=0)] = 1
+            bgap.solve(env, time_limit, start, best_obj_stop=model.lb, backend=backend,
+                       templates=templates)
+        else:
+            bgap = bgap_charge.from_bpp(bpp, model.M, model.d, charge)
+            bgap.solve(env, time_limit, best_obj_stop=model.lb, backend=backend,
+                       templates=templates)
+    model.profile.merge(bgap.profile, "bgap")
+    with model.profile.stage("ls.setup"):
+        if bpp.zeta <= model.M:
+            local_search = local_search_cls.from_constrained(bgap, charge, model.R, seed)
+        else:
+            local_search = local_search_cls.from_charge(bgap, model.e, model.b, seed)
+        # makespan della soluzione costruita, non l'obiettivo del BGAP
+        local_search.cmax = local_search.tracker.cmax
+    if callback is not None:
+        callback({"stage": "bgap", "ub": float(local_search.cmax)})
+
+    model.time += bgap.time
+
+    with model.profile.stage("ls"):
+        if local_search.cmax <= model.lb:
+            # la soluzione del BGAP è già ottima: niente local search
+            model.profile.count("early_stop")
+        elif starts > 1:
+            local_search = multi_start(local_search, starts, seed, workers=workers,
+                                       time_limit=_time_left(deadline, 0.5 if iterated else 1.0),
+                                       lower_bound=model.lb)
+            model.time += local_search.time
+        elif not iterated:
+            local_search.solve(time_limit=_time_left(deadline), lower_bound=model.lb,
+                               callback=_progress(callback, "ls"))
+            model.time += local_search.time
+    model.profile.merge(local_search.profile, "ls")
+    if iterated and local_search.cmax > model.lb:
+        # la prima discesa dell'ILS è la local search
+        with model.profile.stage("ils"):
+            ils = IteratedLocalSearch(local_search).solve(
+                time_limit=_time_left(deadline),
+                max_kicks=None if deadline is not None else ITERATED_KICKS,
+                lower_bound=model.lb, callback=_progress(callback, "ils"))
+        model.profile.merge(ils.profile, "ils")
+        model.time += ils.time
+        local_search = ils.local_search
+
+    model.schedule = local_search.schedule
+    model.ub = local_search.cmax
+    model.gap = (model.ub - model.lb)/model.lb
+
+    return model
@@ -1,9 +1,16 @@
+import sys
+import time
 import numpy as np
 from numpy.typing import NDArray
 import gurobipy as gb
-from gurobipy import GRB, quicksum
-from .heuristic import BinPackingProblem, BGAPConstrained, BGAPChargeOperations, LocalSearch
+from gurobipy import GRB
+from .heuristic import BinPackingProblem, BGAPChargeOperations, LocalSearch
+from .heuristic.packing import max_charges_per_agv, lower_bound_l2
 from .parser import parse_file
+from .profiling import StageProfiler
+from .backend import optimize
+from .decomposition import solve_decomposition
+from .matheuristic import solve_matheuristic
 from math import ceil
 
 class ASPBC:
@@ -20,87 +27,128 @@ class ASPBC:
         self.b = battery_capacity
         self.t = charge_duration
         self.e = energy_job_costs
-        self.R = energy_job_costs.shape[0] if charging_operations_number == 0 else charging_operations_number
+        # charges any single AGV can need in an optimal solution
+        self.R = max_charges_per_agv(energy_job_costs, battery_capacity, job_durations, fleet_size, charge_duration) \
+            if charging_operations_number == 0 else charging_operations_number
 
     @classmethod
     def create_from_file(cls, file_name: str) -> "ASPBC":
         return cls(*parse_file(file_name))
 
-    def solve(self, env=None) -> 'ASPBC':
+    @classmethod
+    def create_from_catalog(cls, catalog, file_name: str) -> "ASPBC":
+        # catalog = InstanceCatalog, file_name = nome (o percorso) del file di testo
+        return cls(*catalog.arrays(file_name))
+
+    def build(self, env=None) -> tuple[gb.Model, gb.MVar, gb.MVar, gb.MVar]:
+        t0 = time.perf_counter()
         J = self.e.shape[0]
         aspbc = gb.Model("ASP-BC", env=env)
 
-        x = aspbc.addVars(J, self.M, vtype=GRB.BINARY)
-        q = aspbc.addVars(self.R, self.M, vtype=GRB.BINARY)
-        y = aspbc.addVars(J, self.R, self.M, vtype=GRB.BINARY)
+        x = aspbc.addMVar((J, self.M), vtype=GRB.BINARY)
+        q = aspbc.addMVar((self.R, self.M), vtype=GRB.BINARY)
+        y = aspbc.addMVar((J, self.R, self.M), vtype=GRB.BINARY)
         cmax = aspbc.addVar()
 
         aspbc.setObjective(cmax, GRB.MINIMIZE)
 
-        aspbc.addConstrs(cmax >= quicksum(self.d[j] * x[j, m] for j in range(J)) + quicksum(self.t * q[r, m] for r in range(1, self.R))
-                         for m in range(self.M)
-                         )
-        aspbc.addConstrs(quicksum(x[j, m] for m in range(self.M)) == 1
-                         for j in range(J)
-                         )
-        aspbc.addConstrs(quicksum(y[j, r, m] for r in range(self.R)) == x[j, m]
-                         for j in range(J)
-                         for m in range(self.M)
-                         )
-        aspbc.addConstrs(2 * y[j, r, m] <= x[j, m] + q[r, m]
-                         for j in range(J)
-                         for r in range(self.R)
-                         for m in range(self.M)
-                         )
-        aspbc.addConstrs(quicksum(self.e[j] * y[j, r, m] for j in range(J)) <= self.b
-                         for r in range(self.R)
-                         for m in range(self.M)
-                         )
-        aspbc.addConstrs(q[r, m] <= q[r-1, m]
-                         for r in range(1, self.R)
-                         for m in range(self.M)
-                         )
-        aspbc.addConstrs(q[0, m] == 1
-                         for m in range(self.M)
-                         )
-        aspbc.optimize()
-
-        self.time = aspbc.Runtime
-        self.ub = aspbc.ObjBound
-        self.lb = aspbc.ObjVal
-        self.gap = aspbc.MIPGap
+        # the first charge is free
+        charges = self.t * q[1:].sum(axis=0) if self.R > 1 else 0
+        aspbc.addConstr(cmax >= self.d @ x + charges)
+        # uguale a m.addConstr(x.sum(axis=1) == 1)
+        aspbc.addConstr(x @ np.ones(self.M) == 1)
+        aspbc.addConstr(y.sum(axis=1) == x)
+        aspbc.addConstr(2 * y <= x[:, None, :] + q[None, :, :])
+        aspbc.addConstr((self.e[:, None, None] * y).sum(axis=0) <= self.b)
+        aspbc.addConstr(q[1:] <= q[:-1])
+        aspbc.addConstr(q[0] == 1)
+        aspbc.update()
 
-        return self
+        self.build_time = time.perf_counter() - t0
+        return (aspbc, x, q, y)
+
+    def solve(self, env=None, warm_start: bool = False, backend: str = "gurobi") -> 'ASPBC':
+        # backend = "gurobi" o "highs" (aspbc.backend), anche per la matheuristica
+        heuristic_time = 0.0
+        start = None
+        profile = StageProfiler()
+        if warm_start:
+            # the matheuristic gives the incumbent and the lower bound
+            with profile.stage("matheuristic"):
+                self.solve_matheuristic(env, backend=backend)
+            profile.merge(self.profile, "matheuristic")
+            heuristic_time = self.time
+            lower_bound = self.lb
+            schedule = self.schedule.compacted()
+            charges = schedule.q.sum(axis=0).max()
+            if charges <= self.R:
+                start = schedule.to_arrays(self.R)
+            else:
+                # il modello ha solo R ricariche per AGV: uno start troncato non è ammissibile
+                print(f"warm start skipped: the matheuristic uses {charges} charges "
+                      f"on one AGV, the model has R = {self.R}", file=sys.stderr)
 
-    def solve_matheuristic(self, env=None):
-        bpp = BinPackingProblem(self.e, self.b)
-        bpp.solve(env)
-        self.time = bpp.time
+        with profile.stage("build"):
+            aspbc, x, q, y = self.build(env)
 
-        local_search = None
-        # se numero ricariche necessarie <= numero di AGV
-        if bpp.zeta <= self.M:
-            bgap = BGAPConstrained(self.M, self.e, self.d, self.b)
-            bgap.solve(env)
-            local_search = LocalSearch.from_constrained(bgap, self.t, self.R)
-        else:
-            bgap = BGAPChargeOperations.from_bpp(bpp, self.M, self.d, self.t)
-            bgap.solve(env)
-            local_search = LocalSearch.from_charge(bgap, self.e, self.b)
+        if start is not None:
+            x_start, y_start, q_start = (a.astype(np.float64) for a in start)
+            x.Start = x_start
+            q.Start = q_start[:self.R]
+            # y in the model is indexed (J, R, M)
+            y.Start = np.ascontiguousarray(y_start[:self.R].transpose(1, 0, 2))
 
-        self.time += bgap.time
+        if warm_start:
+            # stop as soon as the incumbent matches the lower bound
+            aspbc.Params.BestObjStop = lower_bound
 
-        local_search.solve()
+        with profile.stage("optimize"):
+            result = optimize(aspbc, backend)
+        profile.count("optimize.nodes", result.NodeCount)
+        profile.count("optimize.simplex_iterations", result.IterCount)
 
-        self.ub = local_search.cmax
-        self.time += local_search.time
-        self.lb = self.get_bpp_lower_bound(bpp)
-        self.gap = (self.ub - self.lb)/self.lb
+        with profile.stage("extract"):
+            # build time is reported separately in self.build_time
+            self.time = heuristic_time + result.Runtime
+            self.ub = result.ObjBound
+            self.lb = result.ObjVal
+            self.gap = result.MIPGap
+            if not np.isfinite(self.ub):
+                # HiGHS stopped by the TimeLimit without a dual bound
+                self.ub = self.get_lower_bound()
+                self.gap = (self.lb - self.ub) / self.lb
+            if warm_start and lower_bound > self.ub:
+                # the BPP bound is stronger than the one proved by Gurobi
+                self.ub = lower_bound
+                self.gap = (self.lb - self.ub) / self.lb
+        self.profile = profile
 
         return self
 
+    def solve_matheuristic(self, env=None, **options):
+        # stadi e opzioni (time_budget, starts, iterated, backend, ...) in
+        # aspbc.matheuristic.solve_matheuristic
+        return solve_matheuristic(self, env, BGAPChargeOperations, LocalSearch, self.t,
+                                  self.get_bpp_lower_bound, **options)
+
+    def solve_decomposition(self, env=None, cluster_size: int = 100, workers: int = 1,
+                            time_budget: float | None = None, seed=None, backend: str = "gurobi",
+                            local_search_iterations: int | None = None):
+        # per migliaia di jobs: cluster di circa cluster_size jobs risolti con la
+        # matheuristica (su `workers` processi), uniti e rifiniti da una local search
+        # globale (aspbc.decomposition)
+        return solve_decomposition(self, env, cluster_size, workers, time_budget, seed,
+                                   backend, local_search_iterations)
+
     def get_bpp_lower_bound(self, bpp: BinPackingProblem) -> float:
-        first = ceil((max(0, bpp.zeta - self.M) *
+        # lower_bound = zeta se il BPP è risolto all'ottimo
+        return self.get_lower_bound(bpp.lower_bound)
+
+    def get_lower_bound(self, charges: int | None = None) -> float:
+        # charges = lower bound del numero di ricariche (L2 di Martello e Toth se None)
+        if charges is None:
+            charges = lower_bound_l2(self.e, self.b)
+        first = ceil((max(0, charges - self.M) *
                      self.t + self.d.sum()) / self.M)
-        second = ceil(max(0, bpp.zeta - self.M) / self.M) * self.t
+        second = ceil(max(0, charges - self.M) / self.M) * self.t
         return max(first, second)
@@ -1,10 +1,15 @@
+import sys
+import time
 from gurobipy import GRB
 import numpy as np
 import gurobipy as gb
 from numpy.typing import NDArray
 from aspbc.parser import parse_file
-from math import ceil
-from .heuristic import BinPackingProblem, BGAPConstrained, BGAPChargeOperations_VC, LocalSearch_VC
+from aspbc.profiling import StageProfiler
+from aspbc.backend import optimize
+from .matheuristic import solve_matheuristic
+from .heuristic import BGAPChargeOperations_VC, LocalSearch_VC
+from .heuristic.packing import max_charges_per_agv
 
 class ASPBC_VC:
     def __init__(self, agv_number: int, 
@@ -19,14 +24,22 @@ class ASPBC_VC:
         self.d = job_durations
         self.b = battery_capacity
         self.e = energy_requirements
-        self.R = energy_requirements.shape[0] if charging_operations_number == 0 else charging_operations_number
+        # charges any single AGV can need in an optimal solution
+        self.R = max_charges_per_agv(energy_requirements, battery_capacity) \
+            if charging_operations_number == 0 else charging_operations_number
         self.tau = tau
 
     @classmethod
     def create_from_file(cls, file_name: str) -> "ASPBC_VC":
         return cls(*parse_file(file_name))
 
-    def solve(self, env=None):
+    @classmethod
+    def create_from_catalog(cls, catalog, file_name: str) -> "ASPBC_VC":
+        # catalog = InstanceCatalog, file_name = nome (o percorso) del file di testo
+        return cls(*catalog.arrays(file_name))
+
+    def build(self, env=None) -> tuple[gb.Model, gb.MVar, gb.MVar, gb.MVar, gb.MVar]:
+        t0 = time.perf_counter()
         J = self.e.shape[0]
 
         model = gb.Model("ASPBC-VC", env=env)
@@ -42,50 +55,81 @@ class ASPBC_VC:
         model.addConstr(w <= q[None, 1:, :])
         model.addConstr(w >= y[:, :-1] + q[None, 1:, :]-1)
         job_part = self.d @ x
-        wsum = w.sum(axis=1)
-        energy_part = gb.quicksum(self.e[i] * wsum[i] for i in range(J))
+        energy_part = self.e @ w.sum(axis=1)
         model.addConstr(cmax >= job_part + energy_part * self.tau)
         model.addConstr(x @ np.ones(self.M) == 1)
         model.addConstr(y.sum(axis=1) == x)
         model.addConstr(2 * y <= x[:, None, :] + q[None, :, :])
-        model.addConstr((self.e[None, :, None] * y).sum(axis=0) <= self.b)
+        model.addConstr((self.e[:, None, None] * y).sum(axis=0) <= self.b)
         model.addConstr(q[1:] <= q[:-1])
         model.addConstr(q[0] == 1)
-        model.optimize()
+        model.update()
 
-        self.ub = model.ObjBound
-        self.time = model.Runtime
-        self.lb = self.get_lower_bound()
-        self.gap = model.MIPGap
+        self.build_time = time.perf_counter() - t0
+        return (model, x, q, y, w)
 
-        return self
-    
-    def solve_matheuristic(self, env=None):
-        bpp = BinPackingProblem(self.e, self.b)
-        bpp.solve(env)
-        self.time = bpp.time
-
-        local_search = None
-        # se numero ricariche necessarie <= numero di AGV
-        if bpp.zeta <= self.M:
-            bgap = BGAPConstrained(self.M, self.e, self.d, self.b)
-            bgap.solve(env)
-            local_search = LocalSearch_VC.from_constrained(bgap, self.tau, self.R)
-        else:
-            bgap = BGAPChargeOperations_VC.from_bpp(bpp, self.M, self.d, self.tau)
-            bgap.solve(env)
-            local_search = LocalSearch_VC.from_charge(bgap, self.e, self.b)
-
-        self.time += bgap.time
-
-        local_search.solve()
-
-        self.ub = local_search.cmax
-        self.time += local_search.time
-        self.lb = self.get_lower_bound()
-        self.gap = (self.ub - self.lb)/self.lb
+    def solve(self, env=None, warm_start: bool = False, backend: str = "gurobi"):
+        # backend = "gurobi" o "highs" (aspbc.backend), anche per la matheuristica
+        heuristic_time = 0.0
+        start = None
+        profile = StageProfiler()
+        if warm_start:
+            # the matheuristic gives the incumbent
+            with profile.stage("matheuristic"):
+                self.solve_matheuristic(env, backend=backend)
+            profile.merge(self.profile, "matheuristic")
+            heuristic_time = self.time
+            schedule = self.schedule.compacted()
+            charges = schedule.q.sum(axis=0).max()
+            if charges <= self.R:
+                start = schedule.to_arrays(self.R)
+            else:
+                # il modello ha solo R ricariche per AGV: uno start troncato non è ammissibile
+                print(f"warm start skipped: the matheuristic uses {charges} charges "
+                      f"on one AGV, the model has R = {self.R}", file=sys.stderr)
+
+        with profile.stage("build"):
+            model, x, q, y, w = self.build(env)
+
+        if start is not None:
+            x_start, y_start, q_start = (a.astype(np.float64) for a in start)
+            q_start = q_start[:self.R]
+            # y in the model is indexed (J, R, M)
+            y_start = np.ascontiguousarray(y_start[:self.R].transpose(1, 0, 2))
+            x.Start = x_start
+            q.Start = q_start
+            y.Start = y_start
+            w.Start = y_start[:, :-1] * q_start[None, 1:, :]
+
+        if warm_start:
+            # stop as soon as the incumbent matches the lower bound
+            model.Params.BestObjStop = self.get_lower_bound()
+
+        with profile.stage("optimize"):
+            result = optimize(model, backend)
+        profile.count("optimize.nodes", result.NodeCount)
+        profile.count("optimize.simplex_iterations", result.IterCount)
+
+        with profile.stage("extract"):
+            # build time is reported separately in self.build_time
+            self.ub = result.ObjBound
+            self.time = heuristic_time + result.Runtime
+            self.lb = self.get_lower_bound()
+            self.gap = result.MIPGap
+            if not np.isfinite(self.ub):
+                # HiGHS stopped by the TimeLimit without a dual bound
+                self.ub = max(self.lb, 0.0)
+                self.gap = (result.ObjVal - self.ub) / result.ObjVal
+        self.profile = profile
 
         return self
     
-    def get_lower_bound(self) -> int:
-        return ceil(np.sum(self.d + self.tau * self.e) / self.M - self.tau * self.b)
\ No newline at end of file
+    def solve_matheuristic(self, env=None, **options):
+        # stadi e opzioni (time_budget, starts, iterated, backend, ...) in
+        # aspbc.matheuristic.solve_matheuristic, con tau per unità di energia
+        return solve_matheuristic(self, env, BGAPChargeOperations_VC, LocalSearch_VC, self.tau,
+                                  lambda bpp: self.get_lower_bound(), **options)
+
+    def get_lower_bound(self) -> float:
+        # i tempi di ricarica sono frazionari: il bound non si può arrotondare per eccesso
+        return np.sum(self.d + self.tau * self.e) / self.M - self.tau * self.b
\ No newline at end of file
@@ -1,3 +1,4 @@
+import os
 import re
 import numpy as np
 from numpy.typing import NDArray
@@ -25,3 +26,9 @@ def parse_file(filepath) -> tuple[int, NDArray[np.int64], float, float, NDArray[
     energy_requirements = np.array(W, dtype=np.float64)[:, 0]
 
     return (agv_number, job_durations, battery_capacity, charge_duration, energy_requirements)
+
+
+def parse_instance_name(file_name) -> dict[str, int]:
+    # Ins_V10_J100_T10_R60_B10_W1_S240_N0.txt -> {"V": 10, "J": 100, ...}
+    fields = re.findall(r"_([A-Z])(\d+)", os.path.basename(file_name))
+    return {key: int(value) for key, value in fields}
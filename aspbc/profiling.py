@@ -0,0 +1,78 @@
+import csv
+import json
+import time
+from contextlib import contextmanager
+
+# Tempi (wall e CPU) per stadio e contatori degli stadi della matheuristica.
+#
+# stages[name] = {"wall": s, "cpu": s, "calls": n}, i nomi annidati sono
+# separati da un punto (es. "bpp.optimize" dentro "bpp")
+# counters[name] = intero (es. "ls.iterations", "ls.accepted.swap")
+
+
+class StageProfiler:
+    def __init__(self) -> None:
+        self.stages = {}
+        self.counters = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield self
+        finally:
+            self.add_time(name, time.perf_counter() - wall, time.process_time() - cpu)
+
+    def add_time(self, name: str, wall: float, cpu: float) -> None:
+        stage = self.stages.setdefault(name, {"wall": 0.0, "cpu": 0.0, "calls": 0})
+        stage["wall"] += wall
+        stage["cpu"] += cpu
+        stage["calls"] += 1
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def merge(self, other: 'StageProfiler', prefix: str = "") -> 'StageProfiler':
+        # aggiunge tempi e contatori di un altro profiler sotto prefix
+        prefix = f"{prefix}." if prefix else ""
+        for name, stage in other.stages.items():
+            mine = self.stages.setdefault(prefix + name, {"wall": 0.0, "cpu": 0.0, "calls": 0})
+            for key in mine:
+                mine[key] += stage[key]
+        for name, value in other.counters.items():
+            self.count(prefix + name, value)
+        return self
+
+    def wall(self, name: str) -> float:
+        return self.stages.get(name, {"wall": 0.0})["wall"]
+
+    def to_dict(self) -> dict:
+        return {"stages": self.stages, "counters": self.counters}
+
+    def report(self) -> str:
+        lines = [f"{'stage':<24} {'wall (s)':>10} {'cpu (s)':>10} {'calls':>6}"]
+        for name, stage in self.stages.items():
+            lines.append(f"{name:<24} {stage['wall']:>10.4f} {stage['cpu']:>10.4f} {stage['calls']:>6}")
+        for name, value in self.counters.items():
+            lines.append(f"{name:<24} {value:>10}")
+        return "\n".join(lines)
+
+
+def export_profiles(profiles: dict, path: str) -> None:
+    # profiles = {istanza: StageProfiler o dict di to_dict()}
+    # .json -> un oggetto per istanza, altrimenti CSV con una riga per stadio/contatore
+    profiles = {name: p.to_dict() if isinstance(p, StageProfiler) else p
+                for name, p in profiles.items()}
+    if path.endswith(".json"):
+        with open(path, "w") as file:
+            json.dump(profiles, file, indent=1)
+        return
+    with open(path, "w", newline='') as file:
+        to_write = csv.writer(file)
+        to_write.writerow(["File name", "Kind", "Name", "Wall", "CPU", "Calls", "Value"])
+        for instance, profile in profiles.items():
+            for name, stage in profile["stages"].items():
+                to_write.writerow([instance, "stage", name, f"{stage['wall']:.6f}",
+                                   f"{stage['cpu']:.6f}", stage["calls"], ""])
+            for name, value in profile["counters"].items():
+                to_write.writerow([instance, "counter", name, "", "", "", value])
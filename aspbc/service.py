@@ -0,0 +1,279 @@
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Self
+
+import numpy as np
+from gurobipy import Env, GurobiError
+
+from .model import ASPBC
+from .model_variable_charge import ASPBC_VC
+
+# Servizio asyncio di pianificazione sopra solve_matheuristic:
+# - le richieste aspettano uno dei `workers` processi, ognuno con un Env di
+#   Gurobi creato una sola volta da _init_worker
+# - le istanze grandi (più di large_jobs jobs) usano al più workers - 1 processi,
+#   così le piccole hanno sempre un processo libero
+# - deadline (s) = tempo massimo dall'invio, coda compresa: il resto diventa il
+#   time_budget della matheuristica
+# - i progressi (callback di solve_matheuristic) arrivano dai worker su una coda
+#   condivisa e sono consegnati alla richiesta (PlanRequest.progress())
+# - cancel() toglie una richiesta dalla coda, o la ferma al progresso successivo:
+#   BPP e BGAP sono MILP senza progressi intermedi, quindi una richiesta
+#   cancellata durante questi stadi li porta a termine (entro la loro quota
+#   del time_budget, se c'è una deadline) e si ferma subito dopo
+# - un processo resta occupato finché il suo worker non termina, anche se il
+#   task della richiesta è stato cancellato
+#
+# async with PlanningService(workers=4) as service:
+#     request = await service.submit((M, d, b, t, e), deadline=10)
+#     async for event in request.progress(): ...
+#     result = await request.result()
+#
+# serve(host, port): POST /plan con {"M", "d", "b", "t", "e", "tau", "variable_charge",
+# "deadline"} risponde con una riga JSON per progresso e l'ultima con il risultato
+
+# jobs oltre cui un'istanza non può occupare tutti i processi
+LARGE_JOBS = 150
+
+# Env di Gurobi del processo worker, creato una sola volta da _init_worker
+_env = None
+
+
+def _init_worker(threads: int) -> None:
+    global _env
+    _env = Env(params={"OutputFlag": 0,  # disattiva output gurobi
+                       "Threads": threads})
+
+
+class Cancelled(Exception):
+    pass
+
+
+def _plan(request_id: int, instance: tuple, variable_charge: bool, time_budget: float,
+          options: dict, progress, cancel) -> dict:
+    # nel processo worker: progress = coda condivisa, cancel = Event condiviso
+    if cancel.is_set():
+        # cancellata mentre aspettava un processo libero nel pool
+        raise Cancelled(f"Request {request_id} cancelled")
+    model = (ASPBC_VC if variable_charge else ASPBC)(*instance)
+
+    def callback(event: dict) -> None:
+        if cancel.is_set():
+            raise Cancelled(f"Request {request_id} cancelled")
+        progress.put((request_id, event))
+
+    model.solve_matheuristic(_env, time_budget=time_budget, callback=callback, **options)
+    schedule = model.schedule.compacted()
+    # fine dei progressi della richiesta
+    progress.put((request_id, None))
+    return {"lb": float(model.lb),
+            "ub": float(model.ub),
+            "gap": float(model.gap),
+            "time": float(model.time),
+            "agv": schedule.agv.tolist(),
+            "charge": schedule.charge.tolist()}
+
+
+class PlanRequest:
+    def __init__(self, request_id: int, jobs: int, deadline: float, cancel) -> None:
+        self.id = request_id
+        self.jobs = jobs
+        # scadenza assoluta (time.perf_counter), None senza deadline
+        self.deadline = deadline
+        # "queued", "running" o "done"
+        self.status = "queued"
+        self.events = asyncio.Queue()
+        self._cancel = cancel
+        self.task = None
+
+    async def progress(self):
+        # progressi della richiesta fino alla sua fine
+        while True:
+            event = await self.events.get()
+            if event is None:
+                return
+            yield event
+
+    async def result(self) -> dict:
+        return await self.task
+
+    def cancel(self) -> None:
+        self._cancel.set()
+        if self.status == "queued":
+            self.task.cancel()
+
+
+class PlanningService:
+    def __init__(self, workers: int = 0, threads: int = 1,
+                 large_jobs: int = LARGE_JOBS, **options) -> None:
+        # workers = processi del pool (0: tutti i core / threads)
+        # options = argomenti di solve_matheuristic per ogni richiesta (backend, starts, ...)
+        self.workers = workers if workers > 0 else max(1, (os.cpu_count() or 1) // threads)
+        self.threads = threads
+        self.large_jobs = large_jobs
+        self.options = options
+        self._requests = {}
+        self._ids = itertools.count()
+
+    async def start(self) -> 'PlanningService':
+        self._manager = multiprocessing.Manager()
+        self._progress = self._manager.Queue()
+        self._pool = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                         initargs=(self.threads,))
+        self._slots = asyncio.Semaphore(self.workers)
+        self._large = asyncio.Semaphore(max(1, self.workers - 1))
+        self._dispatcher = asyncio.create_task(self._dispatch())
+        return self
+
+    async def close(self) -> None:
+        for request in list(self._requests.values()):
+            request.cancel()
+        self._progress.put(None)
+        await self._dispatcher
+        # le richieste in corso si fermano al loro prossimo progresso
+        await asyncio.get_running_loop().run_in_executor(
+            None, lambda: self._pool.shutdown(wait=True, cancel_futures=True))
+        self._manager.shutdown()
+
+    async def __aenter__(self) -> Self:
+        return await self.start()
+
+    async def __aexit__(self, *_) -> None:
+        await self.close()
+
+    async def submit(self, instance: tuple, variable_charge: bool = False,
+                     deadline: float | None = None) -> PlanRequest:
+        # instance = (M, d, b, t, e) come parse_file, con tau in fondo per ASPBC_VC
+        request_id = next(self._ids)
+        deadline = None if deadline is None else time.perf_counter() + deadline
+        request = PlanRequest(request_id, len(instance[1]), deadline, self._manager.Event())
+        self._requests[request_id] = request
+        request.task = asyncio.create_task(self._run(request, instance, variable_charge))
+        return request
+
+    async def plan(self, instance: tuple, variable_charge: bool = False,
+                   deadline: float | None = None) -> dict:
+        return await (await self.submit(instance, variable_charge, deadline)).result()
+
+    async def _run(self, request: PlanRequest, instance: tuple, variable_charge: bool) -> dict:
+        large = request.jobs > self.large_jobs
+        try:
+            if request.deadline is None:
+                await self._acquire(large)
+            else:
+                await asyncio.wait_for(self._acquire(large),
+                                       request.deadline - time.perf_counter())
+        except BaseException:
+            self._finish(request)
+            raise
+        time_budget = None
+        if request.deadline is not None:
+            time_budget = request.deadline - time.perf_counter()
+            if time_budget <= 0:
+                self._release(request, large)
+                self._finish(request)
+                raise TimeoutError(f"Request {request.id} expired in the queue")
+        request.status = "running"
+        future = asyncio.get_running_loop().run_in_executor(
+            self._pool, _plan, request.id, instance, variable_charge, time_budget,
+            self.options, self._progress, request._cancel)
+        # il processo si libera quando il worker termina, non quando termina il task
+        future.add_done_callback(lambda done: self._release(request, large, done))
+        try:
+            # la cancellazione arriva al worker tramite l'Event, non cancellando il task
+            return await asyncio.shield(future)
+        except BaseException:
+            self._finish(request)
+            raise
+
+    async def _acquire(self, large: bool) -> None:
+        if large:
+            await self._large.acquire()
+        try:
+            await self._slots.acquire()
+        except BaseException:
+            if large:
+                self._large.release()
+            raise
+
+    def _release(self, request: PlanRequest, large: bool, future=None) -> None:
+        request.status = "done"
+        self._slots.release()
+        if large:
+            self._large.release()
+        if future is not None and not future.cancelled():
+            # segna l'errore come letto: se il task è stato cancellato nessuno lo aspetta
+            future.exception()
+
+    def _finish(self, request: PlanRequest) -> None:
+        # fine dei progressi di una richiesta fallita, scaduta o cancellata
+        request.status = "done"
+        request.events.put_nowait(None)
+        self._requests.pop(request.id, None)
+
+    async def _dispatch(self) -> None:
+        # consegna i progressi dei worker alle richieste
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await loop.run_in_executor(None, self._progress.get)
+            if item is None:
+                return
+            request_id, event = item
+            request = self._requests.get(request_id)
+            if request is None:
+                continue
+            request.events.put_nowait(event)
+            if event is None:
+                self._requests.pop(request_id, None)
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765) -> asyncio.AbstractServer:
+        # endpoint HTTP locale, un piano per connessione
+        return await asyncio.start_server(self._handle, host, port)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            method, path, _ = (await reader.readline()).decode().split(" ", 2)
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                key, _, value = line.decode().partition(":")
+                headers[key.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            if method != "POST" or path != "/plan":
+                writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                return
+            try:
+                data = json.loads(body)
+                variable_charge = bool(data.get("variable_charge", False))
+                instance = (int(data["M"]), np.array(data["d"], dtype=np.int64), float(data["b"]),
+                            float(data["t"]), np.array(data["e"], dtype=np.float64))
+                if variable_charge:
+                    instance += (float(data.get("tau", 1.0)),)
+                deadline = data.get("deadline")
+                deadline = None if deadline is None else float(deadline)
+            except (ValueError, KeyError, TypeError, AttributeError):
+                writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                return
+            request = await self.submit(instance, variable_charge, deadline)
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                         b"Connection: close\r\n\r\n")
+            try:
+                async for event in request.progress():
+                    writer.write(json.dumps(event).encode() + b"\n")
+                    await writer.drain()
+                try:
+                    event = {"stage": "done", **await request.result()}
+                except (Cancelled, TimeoutError, GurobiError, RuntimeError, ValueError,
+                        OSError) as error:
+                    event = {"stage": "error", "error": str(error) or type(error).__name__}
+                writer.write(json.dumps(event).encode() + b"\n")
+                await writer.drain()
+            except ConnectionError:
+                # il client ha chiuso la connessione: il piano non serve più
+                request.cancel()
+        finally:
+            writer.close()
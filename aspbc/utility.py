@@ -1,7 +1,23 @@
+import time
 import gurobipy as gp
 import numpy as np
 from numpy.typing import NDArray
 
 # crea un array Numpy da una variabile MVar di Gurobi
-def _array_from_var(var: gp.MVar) -> NDArray[np.bool_]:
-    return np.array(var.X, dtype=bool)
+# result = risultato di aspbc.backend.optimize (None: il modello gurobipy già risolto)
+def _array_from_var(var: gp.MVar, result=None) -> NDArray[np.bool_]:
+    values = var.X if result is None else result.value(var)
+    return np.rint(values).astype(bool)
+
+# quota del tempo rimanente fino a deadline (time.perf_counter), None senza deadline
+def _time_left(deadline: float, share: float = 1.0) -> float:
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.perf_counter()) * share
+
+# adatta un callback(event) di solve_matheuristic al callback(cmax, iterazione)
+# della local search, None senza callback
+def _progress(callback, stage: str):
+    if callback is None:
+        return None
+    return lambda cmax, _: callback({"stage": stage, "ub": float(cmax)})
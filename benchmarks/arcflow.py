@@ -0,0 +1,54 @@
+# Tempo del BPP esatto con il modello di assegnamento e con l'arc-flow su
+# istanze generate con molti jobs (il numero di archi non dipende da J).
+# Uso: python -m benchmarks.arcflow [--jobs 1000 5000] [--backend highs]
+import argparse
+import time
+
+from gurobipy import Env, GurobiError
+
+from aspbc.generator import generate_instance
+from aspbc.heuristic import BinPackingProblem
+
+METHODS = ("assignment", "arcflow")
+COSTS = (1, 2, 4)
+
+
+def benchmark(jobs: list[int], methods: list[str], backend: str = "gurobi",
+              time_limit: float = 60.0, seed: int = 0):
+    # una riga (J, W, metodo, zeta, tempo, errore) per ogni solve, appena finisce
+    # anche con HiGHS i modelli sono costruiti con gurobipy
+    env = Env(params={"OutputFlag": 0})
+    for J in jobs:
+        for W in COSTS:
+            _, _, b, _, e = generate_instance(10, J, 10, W, seed)
+            for method in methods:
+                # senza i bound combinatori il solver viene sempre chiamato
+                bpp = BinPackingProblem(e, b)
+                t0 = time.perf_counter()
+                try:
+                    bpp.solve(env, use_bounds=False, time_limit=time_limit, method=method,
+                              backend=backend)
+                except GurobiError as error:
+                    # licenza con limiti di dimensione del modello
+                    yield (J, W, method, None, None, str(error))
+                    continue
+                yield (J, W, method, int(bpp.zeta), time.perf_counter() - t0, "")
+    env.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--methods", nargs="+", choices=METHODS, default=list(METHODS))
+    parser.add_argument("--backend", choices=("gurobi", "highs"), default="gurobi")
+    parser.add_argument("--time-limit", type=float, default=60.0,
+                        help="time limit of each solve (s)")
+    args = parser.parse_args()
+
+    print(f"{'J':>5} {'W':>2} {'method':>10} {'zeta':>5} {'time (s)':>9}")
+    rows = benchmark(args.jobs, args.methods, args.backend, args.time_limit)
+    for J, W, method, zeta, seconds, error in rows:
+        if error:
+            print(f"{J:>5} {W:>2} {method:>10} {'-':>5} {'-':>9}  {error}", flush=True)
+        else:
+            print(f"{J:>5} {W:>2} {method:>10} {zeta:>5} {seconds:>9.2f}", flush=True)
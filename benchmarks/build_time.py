@@ -0,0 +1,51 @@
+# Tempo di costruzione dei modelli esatti (senza ottimizzare) al crescere di J.
+# Uso: python -m benchmarks.build_time [--instances 3] [--vc]
+import argparse
+import os
+
+from gurobipy import Env
+
+from aspbc import ASPBC, ASPBC_VC
+
+FOLDER = "dataset/ASP-BC Instances"
+JOBS = (50, 100, 150, 200)
+
+
+def benchmark(instances: int = 3, variable_charge: bool = False) -> list[tuple]:
+    env = Env(params={"OutputFlag": 0})
+    cls = ASPBC_VC if variable_charge else ASPBC
+    files = sorted(os.listdir(FOLDER))
+    rows = []
+    for J in JOBS:
+        for V in (2, 5, 10):
+            family = [f for f in files if f.startswith(f"Ins_V{V}_J{J}_")]
+            for file in family[:instances]:
+                model = cls.create_from_file(os.path.join(FOLDER, file))
+                gurobi_model = model.build(env)[0]
+                rows.append((file, V, J, model.R, gurobi_model.NumVars,
+                             gurobi_model.NumConstrs, model.build_time))
+                gurobi_model.dispose()
+    env.dispose()
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--instances", type=int, default=3,
+                        help="instances per V/J family")
+    parser.add_argument("--vc", action="store_true",
+                        help="build ASPBC_VC instead of ASPBC")
+    args = parser.parse_args()
+
+    rows = benchmark(args.instances, args.vc)
+    print(f"{'V':>3} {'J':>4} {'R':>4} {'vars':>9} {'constrs':>9} {'build (s)':>10}")
+    for J in JOBS:
+        for V in (2, 5, 10):
+            family = [r for r in rows if r[1] == V and r[2] == J]
+            if not family:
+                continue
+            n = len(family)
+            print(f"{V:>3} {J:>4} {sum(r[3] for r in family) / n:>4.0f} "
+                  f"{sum(r[4] for r in family) / n:>9.0f} "
+                  f"{sum(r[5] for r in family) / n:>9.0f} "
+                  f"{sum(r[6] for r in family) / n:>10.3f}")
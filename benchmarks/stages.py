@@ -0,0 +1,210 @@
+# Tempo e qualità di ogni stadio della matheuristica su un sottoinsieme fisso
+# di istanze, confrontati con benchmarks/baseline.json e con results/3S-MHA.csv.
+# Uso: python -m benchmarks.stages [--vc] [--update-baseline] [--time-tolerance 0.5]
+#      python -m benchmarks.stages --backend gurobi highs  (confronto fra i solver)
+#
+# baseline.json è il riferimento del commit corrente: ogni modifica che cambia
+# tempi o obiettivi di uno stadio (budget di tempo, early stop, nuovi modelli o
+# solver) rigenera il baseline con --update-baseline (e --vc) nello stesso commit.
+# Le istanze che non si possono risolvere (ad esempio per i limiti della licenza
+# Gurobi) vengono tolte dal baseline invece di tenere un riferimento vecchio.
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from gurobipy import Env, GurobiError
+
+from aspbc import ASPBC, ASPBC_VC
+from aspbc.backend import BACKENDS
+from aspbc.batch import select_instances
+from aspbc.heuristic import (
+    BGAPChargeOperations,
+    BGAPChargeOperations_VC,
+    BGAPConstrained,
+    BinPackingProblem,
+    LocalSearch,
+    LocalSearch_VC,
+)
+from aspbc.parser import parse_file
+
+FOLDER = "dataset/ASP-BC Instances"
+PUBLISHED = "results/3S-MHA.csv"
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# una istanza (N0) per ogni (V, J), alternando durate (T) e consumi (W)
+SUBSET = [(2, 50, 10, 1), (5, 50, 20, 2), (10, 50, 30, 4),
+          (2, 100, 20, 4), (5, 100, 30, 1), (10, 100, 10, 2),
+          (2, 150, 30, 2), (5, 150, 10, 4), (10, 150, 20, 1),
+          (2, 200, 10, 4), (5, 200, 20, 1), (10, 200, 30, 2)]
+
+
+def representative_instances(folder: str = FOLDER) -> list[str]:
+    files = []
+    for V, J, T, W in SUBSET:
+        files += select_instances(folder, V=[V], J=[J], T=[T], W=[W], N=[0])
+    return [os.path.basename(f) for f in files]
+
+
+def _timed(stage: str, rows: list, call, objective) -> object:
+    t0 = time.perf_counter()
+    result = call()
+    rows.append({"stage": stage,
+                 "time": round(time.perf_counter() - t0, 4),
+                 "objective": float(objective(result)) if objective else None})
+    return result
+
+
+def run_instance(file: str, env, variable_charge: bool = False, backend: str = "gurobi") -> list[dict]:
+    # stessi passi di solve_matheuristic, cronometrati uno per uno
+    rows = []
+    M, d, b, t, e = _timed("parse", rows, lambda: parse_file(os.path.join(FOLDER, file)), None)
+    bpp = _timed("bpp", rows, lambda: BinPackingProblem(e, b).solve(env, backend=backend),
+                 lambda p: p.zeta)
+
+    # lower bound usato da solve_matheuristic per fermare gli stadi
+    if variable_charge:
+        model = ASPBC_VC(M, d, b, t, e)
+        # tempo per unità di energia del modello, come in solve_matheuristic
+        bgap_charge, local_search, charge = BGAPChargeOperations_VC, LocalSearch_VC, model.tau
+        lb = model.get_lower_bound()
+    else:
+        model = ASPBC(M, d, b, t, e)
+        bgap_charge, local_search, charge = BGAPChargeOperations, LocalSearch, t
+        lb = model.get_bpp_lower_bound(bpp)
+    if bpp.zeta <= M:
+        bgap = _timed("bgap_c", rows, lambda: BGAPConstrained(M, e, d, b).solve(env, best_obj_stop=lb, backend=backend),
+                      lambda p: p.z)
+        # ricariche per AGV del modello (VC: dimensionate senza tempo di ricarica fisso)
+        ls = local_search.from_constrained(bgap, charge, model.R)
+    else:
+        bgap = _timed("bgap_r", rows, lambda: bgap_charge.from_bpp(bpp, M, d, charge).solve(env, best_obj_stop=lb, backend=backend),
+                      lambda p: p.z)
+        ls = local_search.from_charge(bgap, e, b)
+    ls.cmax = ls.tracker.cmax
+    _timed("ls", rows, lambda: ls.solve(lower_bound=lb), lambda p: p.cmax)
+
+    if variable_charge:
+        for row in rows:
+            row["stage"] += "_vc"
+    return rows
+
+
+def published_results(path: str = PUBLISHED) -> dict[str, dict]:
+    with open(path, newline='') as file:
+        return {row["File name"]: row for row in csv.DictReader(file)}
+
+
+def compare_backends(results: dict, backends: list[str]) -> None:
+    # tempo e obiettivo di ogni stadio con ogni solver, sulle stesse istanze
+    # (un solver può mancare, ad esempio per i limiti della licenza Gurobi)
+    print(f"{'instance':<44} {'stage':<10}" + "".join(f" {b + ' (s)':>12} {b:>10}" for b in backends))
+    suffixes = tuple(f":{b}" for b in backends[1:])
+    keys = dict.fromkeys(key.rsplit(":", 1)[0] if key.endswith(suffixes) else key for key in results)
+    for key in keys:
+        tables = [{row["stage"]: row for row in results.get(key if i == 0 else f"{key}:{b}", [])}
+                  for i, b in enumerate(backends)]
+        for stage in dict.fromkeys(stage for table in tables for stage in table):
+            line = f"{key:<44} {stage:<10}"
+            for table in tables:
+                row = table.get(stage)
+                if row is None:
+                    line += f" {'-':>12} {'-':>10}"
+                else:
+                    objective = "" if row["objective"] is None else f"{row['objective']:g}"
+                    line += f" {row['time']:>12.3f} {objective:>10}"
+            print(line)
+
+
+def compare(results: dict, baseline: dict, time_tolerance: float, min_time: float) -> list[str]:
+    # regressione = stadio più lento oltre la tolleranza (e di almeno min_time
+    # secondi) o obiettivo peggiore del baseline
+    regressions = []
+    for key, rows in results.items():
+        reference = {row["stage"]: row for row in baseline.get(key, [])}
+        for row in rows:
+            old = reference.get(row["stage"])
+            if old is None:
+                continue
+            slower = row["time"] - old["time"]
+            if slower > min_time and row["time"] > old["time"] * (1 + time_tolerance):
+                regressions.append(f"{key} {row['stage']}: time {old['time']:.3f} -> {row['time']:.3f} s")
+            if row["objective"] is not None and row["objective"] > old["objective"] + 1e-6:
+                regressions.append(f"{key} {row['stage']}: objective "
+                                   f"{old['objective']:g} -> {row['objective']:g}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vc", action="store_true",
+                        help="also run the variable charge stages")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help=f"overwrite {BASELINE} with this run")
+    parser.add_argument("--time-tolerance", type=float, default=0.5,
+                        help="relative slowdown reported as a regression")
+    parser.add_argument("--min-time", type=float, default=0.05,
+                        help="slowdowns below this many seconds are ignored")
+    parser.add_argument("--backend", nargs="+", choices=BACKENDS, default=["gurobi"],
+                        help="MILP solvers to run; the first one is compared with the baseline")
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--time-limit", type=float, default=60,
+                        help="Gurobi TimeLimit per stage")
+    args = parser.parse_args()
+
+    env = Env(params={"OutputFlag": 0, "Threads": args.threads, "TimeLimit": args.time_limit})
+    published = published_results()
+    results, failed = {}, []
+    print(f"{'instance':<40} {'stage':<10} {'time (s)':>9} {'objective':>10}")
+    for file in representative_instances():
+        for variable_charge in ((False, True) if args.vc else (False,)):
+            for i, backend in enumerate(args.backend):
+                # i risultati del primo solver hanno le chiavi del baseline
+                key = file + (":vc" if variable_charge else "") + (f":{backend}" if i > 0 else "")
+                try:
+                    rows = run_instance(file, env, variable_charge, backend)
+                except (GurobiError, RuntimeError) as error:
+                    print(f"{key}: {error}", file=sys.stderr)
+                    failed.append(key)
+                    continue
+                results[key] = rows
+                for row in rows:
+                    objective = "" if row["objective"] is None else f"{row['objective']:g}"
+                    print(f"{file:<40} {row['stage']:<10} {row['time']:>9.3f} {objective:>10}  {backend}")
+        # gap della local search rispetto al lower bound pubblicato
+        if file in published and file in results:
+            row = published[file]
+            lb, ub = float(row["Lower bound"]), results[file][-1]["objective"]
+            results[file][-1]["gap"] = round((ub - lb) / lb, 4)
+            print(f"{file:<40} {'published':<10} {float(row['Runtime']):>9.3f} "
+                  f"{float(row['Upper bound']):>10g}  gap {results[file][-1]['gap'] * 100:.2f}%")
+    env.dispose()
+    if len(args.backend) > 1:
+        compare_backends(results, args.backend)
+
+    if args.update_baseline:
+        if os.path.exists(BASELINE):
+            with open(BASELINE) as file:
+                baseline = json.load(file)
+        else:
+            baseline = {}
+        # solo il primo solver: gli altri sono un confronto
+        baseline.update({key: rows for key, rows in results.items()
+                         if not key.endswith(tuple(f":{b}" for b in args.backend[1:]))})
+        for key in failed:
+            baseline.pop(key, None)
+        with open(BASELINE, "w") as file:
+            json.dump(baseline, file, indent=1)
+        print(f"baseline written to {BASELINE}")
+    elif os.path.exists(BASELINE):
+        with open(BASELINE) as file:
+            regressions = compare(results, json.load(file), args.time_tolerance, args.min_time)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        if regressions:
+            sys.exit(1)
+        print("no regressions against the baseline")
+    else:
+        print(f"no baseline at {BASELINE}: run with --update-baseline")
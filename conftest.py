@@ -0,0 +1,11 @@
+# pytest dalla radice del repository: aspbc importabile senza installarlo
+import pytest
+
+
+@pytest.fixture(scope="session")
+def env():
+    # Env di Gurobi senza output condiviso dai test che risolvono modelli
+    gurobipy = pytest.importorskip("gurobipy")
+    env = gurobipy.Env(params={"OutputFlag": 0, "Threads": 1})
+    yield env
+    env.dispose()
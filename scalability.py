@@ -1,51 +1,52 @@
-import os
-import csv
-from aspbc import ASPBC
-from gurobipy import Env
+import argparse
+from aspbc.batch import run_batch, select_instances
+from aspbc.backend import BACKENDS
 
 FOLDER = "dataset/ASP-BC Instances"
-        
-def compute_outcomes(euristic = False):
-    env = Env()
-    env.setParam("OutputFlag", 0) # disattiva output gurobi
-    env.setParam("ConcurrentMIP", 3)
 
+
+def compute_outcomes(euristic=False, workers=0, threads=1, time_limit=None, catalog=None, profile=False,
+                     backend="gurobi", **fields):
     FILE_NAME = 'MILP.csv' if not euristic else '3S-MHA.csv'
-    files = os.listdir(FOLDER)
 
     if not euristic:
-        files = [f for f in files if "J200" not in f]
-        env.setParam("TimeLimit", 600)
+        # the exact model does not scale to 200 jobs
+        if not fields.get("J"):
+            fields["J"] = [50, 100, 150]
+        time_limit = time_limit or 600
     else:
-        env.setParam("TimeLimit", 240)
-
-    with open(FILE_NAME, 'wt') as file:
-        to_write = csv.writer(file)
-        to_write.writerow(['File name', 
-                        'Fleet size', 
-                        'Number of jobs', 
-                        'Average job duration', 
-                        'Average energy job costs', 
-                        'Lower bound', 
-                        'Upper bound', 
-                        'GAP (%)', 
-                        'Runtime'])
-        for file in files:
-            path = os.path.join(FOLDER, file)
-            model = ASPBC.create_from_file(path)
-            if euristic: 
-                model.solve_matheuristic(env)
-            else:
-                model.solve(env)
-            to_write.writerow([file, 
-                                f"{model.M}", 
-                                f"{model.e.shape[0]}", 
-                                f"{int(model.d.mean())}", 
-                                f"{int(model.e.mean())}", 
-                                f"{int(model.lb)}", 
-                                f"{int(model.ub)}",
-                                f"{model.gap * 100:.2f}",
-                                f"{model.time:.2f}"])
-
-compute_outcomes(euristic=True)   
-compute_outcomes()
\ No newline at end of file
+        time_limit = time_limit or 240
+
+    files = select_instances(FOLDER, **fields)
+    profile_path = FILE_NAME.replace('.csv', '.profile.jsonl') if profile else None
+    run_batch(files, FILE_NAME, euristic, workers, threads, time_limit, catalog, profile_path, backend)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Solve the ASP-BC instances in parallel, resuming from the existing CSV")
+    parser.add_argument("--method", choices=["both", "heuristic", "exact"], default="both")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="worker processes (default: cores / threads)")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="Gurobi threads per worker")
+    parser.add_argument("--time-limit", type=float, default=None,
+                        help="time budget of the whole matheuristic / TimeLimit of the exact model (default: 240 s heuristic, 600 s exact)")
+    parser.add_argument("--catalog", default=None,
+                        help="binary catalog built with `python -m aspbc.catalog` (falls back to the text files)")
+    parser.add_argument("--profile", action="store_true",
+                        help="also write per-stage timings and counters to <csv>.profile.jsonl")
+    parser.add_argument("--backend", choices=BACKENDS, default="gurobi",
+                        help="MILP solver (highs does not need a Gurobi licence)")
+    for field in "VJTW":
+        parser.add_argument(f"--{field}", type=int, nargs="+", default=[],
+                            help=f"only instances with these {field} values")
+    args = parser.parse_args()
+
+    fields = {field: getattr(args, field) for field in "VJTW"}
+    if args.method in ("both", "heuristic"):
+        compute_outcomes(True, args.workers, args.threads, args.time_limit, args.catalog, args.profile,
+                         args.backend, **dict(fields))
+    if args.method in ("both", "exact"):
+        compute_outcomes(False, args.workers, args.threads, args.time_limit, args.catalog, args.profile,
+                         args.backend, **dict(fields))
@@ -0,0 +1,51 @@
+import os
+
+import numpy as np
+import pytest
+
+from aspbc import ASPBC, ASPBC_VC
+from aspbc.backend import optimize
+from aspbc.generator import generate_instance
+from aspbc.heuristic import BinPackingProblem
+from aspbc.heuristic.packing import first_fit_decreasing, lower_bound_l2
+from aspbc.parser import parse_file
+
+pytest.importorskip("scipy")
+
+FOLDER = os.path.join(os.path.dirname(__file__), "..", "dataset", "ASP-BC Instances")
+# istanze piccole: i modelli esatti stanno nei limiti della licenza gratuita di Gurobi
+SMALL = [(2, 8, 10, 3, 0), (3, 10, 10, 3, 2)]
+# FFD usa un bin in più del lower bound L2
+GAP = "Ins_V2_J50_T20_R60_B10_W2_S100_N0.txt"
+
+
+@pytest.mark.parametrize("cls", [ASPBC, ASPBC_VC])
+@pytest.mark.parametrize("instance", SMALL)
+def test_highs_matches_gurobi(cls, instance, env):
+    gurobi = cls(*generate_instance(*instance)).solve(env)
+    highs = cls(*generate_instance(*instance)).solve(env, backend="highs")
+    assert highs.lb == pytest.approx(gurobi.lb, rel=1e-3)
+    assert highs.ub == pytest.approx(gurobi.ub, rel=1e-3)
+    assert np.isfinite(highs.ub)
+
+
+def test_highs_without_solution_keeps_the_start(env):
+    path = os.path.join(FOLDER, GAP)
+    if not os.path.exists(path):
+        pytest.skip(f"{GAP} not in the dataset")
+    _, _, b, _, e = parse_file(path)
+    # nessuna soluzione entro il TimeLimit: resta il packing FFD e, senza
+    # bound duale (-inf), il lower bound L2
+    bpp = BinPackingProblem(e, b).solve(env, use_bounds=False, time_limit=1e-6, backend="highs")
+    assert bpp.zeta == first_fit_decreasing(e, b).max() + 1
+    assert bpp.lower_bound == lower_bound_l2(e, b)
+
+
+def test_highs_without_solution_or_start_raises(env):
+    model = ASPBC(*generate_instance(*SMALL[1]))
+    m = model.build(env)[0]
+    m.Params.TimeLimit = 1e-6
+    with pytest.raises(RuntimeError, match="HiGHS found no solution"):
+        optimize(m, "highs")
+    with pytest.raises(ValueError, match="unknown backend"):
+        optimize(m, "cplex")
@@ -0,0 +1,83 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from aspbc.heuristic import (
+    BGAPChargeOperations,
+    BGAPChargeOperations_VC,
+    BGAPConstrained,
+    LocalSearch_VC,
+    ModelTemplates,
+)
+
+# (M, ricariche, tau): l'enumerazione delle M^R assegnazioni resta piccola
+CASES = [(2, 5, 1.0), (3, 5, 0.5), (3, 6, 2.0)]
+
+
+def _charges(R: int, rng: np.random.Generator) -> tuple:
+    # due jobs per ricarica, costi multipli di 0.1
+    J = 2 * R
+    d = rng.integers(1, 30, J)
+    e = np.round(rng.uniform(0.1, 4.9, J), 1)
+    chi = np.zeros((R + 2, J), dtype=bool)
+    chi[np.arange(J) // 2, np.arange(J)] = 1
+    gamma = np.zeros(R + 2, dtype=bool)
+    gamma[:R] = 1
+    return (d, e, gamma, chi)
+
+
+def _brute_force(D, E, M: int, tau: float) -> float:
+    # modello quadratico: ogni AGV ricarica tutto tranne la ricarica con più energia
+    best = np.inf
+    for agv in itertools.product(range(M), repeat=D.shape[0]):
+        agv = np.array(agv)
+        cm = [(D[agv == m] + tau * E[agv == m]).sum() - tau * E[agv == m].max(initial=0.0)
+              for m in range(M)]
+        best = min(best, max(cm))
+    return best
+
+
+@pytest.mark.parametrize("M, R, tau", CASES)
+def test_vc_milp_matches_quadratic_model(M, R, tau, env):
+    rng = np.random.default_rng(R * M)
+    d, e, gamma, chi = _charges(R, rng)
+    bgap = BGAPChargeOperations_VC(M, d, e, gamma, chi, tau).solve(env)
+    D, E = (chi @ d)[:R], (chi @ e)[:R]
+    assert bgap.z == pytest.approx(_brute_force(D, E, M, tau))
+    # ogni ricarica usata su un solo AGV, e la local search parte da z
+    assert np.array_equal(bgap.theta[:R].sum(axis=1), np.ones(R))
+    ls = LocalSearch_VC.from_charge(bgap, e, 10.0)
+    assert ls.tracker.cmax == pytest.approx(bgap.z)
+
+
+def _stages(seed: int) -> list:
+    # le tre classi BGAP su istanze della stessa forma per ogni seed
+    d, e, gamma, chi = _charges(5, np.random.default_rng(seed))
+    return [lambda: BGAPConstrained(3, e, d, 30.0),
+            lambda: BGAPChargeOperations(2, d, gamma, chi, 10.0),
+            lambda: BGAPChargeOperations_VC(2, d, e, gamma, chi, 1.0)]
+
+
+def test_templates_match_fresh_models(env):
+    templates = ModelTemplates()
+    for seed in range(3):
+        for bgap in _stages(seed):
+            assert bgap().solve(env, templates=templates).z == \
+                pytest.approx(bgap().solve(env).z)
+    # un modello per classe, poi solo aggiornamenti dei coefficienti
+    assert (templates.misses, templates.hits) == (3, 6)
+    templates.dispose()
+
+
+def test_templates_reset_the_parameters(env):
+    templates = ModelTemplates()
+    for bgap in _stages(0):
+        # BestObjStop altissimo: si ferma alla prima soluzione
+        bgap().solve(env, time_limit=5.0, best_obj_stop=1e9, templates=templates)
+        reused = bgap().solve(env, templates=templates)
+        assert reused.z == pytest.approx(bgap().solve(env).z)
+    for model in templates.models.values():
+        assert model.Params.TimeLimit == np.inf
+        assert model.Params.BestObjStop == -np.inf
+    templates.dispose()
@@ -0,0 +1,63 @@
+import os
+
+import numpy as np
+import pytest
+
+from aspbc.heuristic import BinPackingProblem
+from aspbc.heuristic.packing import (
+    EPS,
+    best_fit_decreasing,
+    first_fit_decreasing,
+    lower_bound_l2,
+)
+from aspbc.parser import parse_file
+
+FOLDER = os.path.join(os.path.dirname(__file__), "..", "dataset", "ASP-BC Instances")
+# FFD o BFD raggiungono il lower bound L2
+# (istanze da 50 jobs: il modello sta nei limiti della licenza gratuita di Gurobi)
+BOUNDED = ["Ins_V10_J50_T30_R60_B10_W2_S170_N0.txt",
+           "Ins_V5_J50_T10_R60_B10_W1_S120_N0.txt",
+           "Ins_V2_J50_T10_R60_B10_W4_S90_N0.txt"]
+
+
+def _costs(name: str) -> tuple:
+    path = os.path.join(FOLDER, name)
+    if not os.path.exists(path):
+        pytest.skip(f"{name} not in the dataset")
+    _, _, b, _, e = parse_file(path)
+    return (e, b)
+
+
+def _assert_packing(bpp: BinPackingProblem) -> None:
+    # ogni job in un solo bin attivo, nessun bin oltre la capacità
+    assert np.array_equal(bpp.chi.sum(axis=0), np.ones(bpp.e.shape[0]))
+    assert not bpp.chi[~bpp.gamma].any()
+    assert np.all(bpp.chi @ bpp.e <= bpp.b + EPS)
+    assert bpp.gamma.sum() == bpp.zeta
+
+
+@pytest.mark.parametrize("name", BOUNDED)
+def test_combinatorial_packing_matches_milp(name, env):
+    e, b = _costs(name)
+    heuristic = min(first_fit_decreasing(e, b).max(), best_fit_decreasing(e, b).max()) + 1
+    if heuristic > lower_bound_l2(e, b):
+        pytest.skip("FFD and BFD do not reach L2")
+    combinatorial = BinPackingProblem(e, b).solve(env)
+    # senza modello: nessuno stadio optimize nel profilo
+    assert "optimize" not in combinatorial.profile.stages
+    milp = BinPackingProblem(e, b).solve(env, use_bounds=False)
+    assert combinatorial.zeta == milp.zeta == lower_bound_l2(e, b)
+    _assert_packing(combinatorial)
+    _assert_packing(milp)
+
+
+# FFD usa un bin in più del lower bound L2: il solver deve chiudere il gap
+@pytest.mark.parametrize("name", [*BOUNDED, "Ins_V2_J50_T20_R60_B10_W2_S100_N0.txt"])
+def test_arc_flow_matches_assignment(name, env):
+    e, b = _costs(name)
+    arcflow = BinPackingProblem(e, b).solve(env, use_bounds=False, method="arcflow")
+    assignment = BinPackingProblem(e, b).solve(env, use_bounds=False)
+    assert isinstance(arcflow.zeta, int)
+    assert arcflow.zeta == assignment.zeta
+    assert lower_bound_l2(e, b) <= arcflow.zeta <= first_fit_decreasing(e, b).max() + 1
+    _assert_packing(arcflow)
@@ -0,0 +1,60 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from aspbc import ASPBC
+from aspbc.catalog import InstanceCatalog, build_catalog, load_instance
+from aspbc.parser import parse_file
+
+FOLDER = os.path.join(os.path.dirname(__file__), "..", "dataset", "ASP-BC Instances")
+
+
+@pytest.fixture(scope="module")
+def folder(tmp_path_factory):
+    # un'istanza per ogni (V, J): tutte le dimensioni del dataset
+    if not os.path.isdir(FOLDER):
+        pytest.skip("dataset not available")
+    folder = tmp_path_factory.mktemp("instances")
+    for file in sorted(os.listdir(FOLDER)):
+        if "_T10_" in file and "_W2_" in file and file.endswith("_N0.txt"):
+            shutil.copy(os.path.join(FOLDER, file), folder)
+    return folder
+
+
+def test_catalog_matches_parser(folder, tmp_path):
+    catalog = build_catalog(str(folder), str(tmp_path / "instances.cat"))
+    files = sorted(os.listdir(folder))
+    assert list(catalog) == files
+    # riaperto dal file: solo header e memmap
+    catalog = InstanceCatalog(str(tmp_path / "instances.cat"))
+    for i, file in enumerate(files):
+        parsed = parse_file(os.path.join(folder, file))
+        for key in (file, i):
+            M, d, b, t, e = catalog.arrays(key)
+            assert (M, b, t) == (parsed[0], parsed[2], parsed[3])
+            assert np.array_equal(d, parsed[1]) and d.dtype == parsed[1].dtype
+            assert np.array_equal(e, parsed[4]) and e.dtype == parsed[4].dtype
+
+
+def test_load_instance_falls_back_to_text(folder, tmp_path):
+    files = sorted(os.listdir(folder))
+    catalog = build_catalog(str(folder), str(tmp_path / "instances.cat"))
+    extra = tmp_path / "extra"
+    extra.mkdir()
+    shutil.copy(os.path.join(FOLDER, "Ins_V2_J50_T20_R60_B10_W1_S100_N0.txt"), extra)
+    path = str(extra / "Ins_V2_J50_T20_R60_B10_W1_S100_N0.txt")
+    assert path not in catalog and os.path.join("any", files[0]) in catalog
+    for name in (os.path.join(folder, files[0]), path):
+        model = load_instance(ASPBC, name, catalog)
+        expected = ASPBC.create_from_file(name)
+        assert np.array_equal(model.d, expected.d) and np.array_equal(model.e, expected.e)
+        assert (model.M, model.b, model.t, model.R) == (expected.M, expected.b, expected.t, expected.R)
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "not_a_catalog.cat"
+    path.write_bytes(b"N_MACHINES:2")
+    with pytest.raises(ValueError):
+        InstanceCatalog(str(path))
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from aspbc.generator import generate_instance
+from aspbc.heuristic.packing import EPS, _lpt_makespan, first_fit_decreasing
+
+# i modelli sono costruiti con gurobipy e risolti con HiGHS (senza licenza)
+pytest.importorskip("gurobipy")
+pytest.importorskip("scipy")
+from aspbc.model import ASPBC
+
+
+def test_decomposition_beats_greedy():
+    # istanza grande generata: FFD + LPT è il riferimento senza solver
+    M, d, b, t, e = generate_instance(20, 600, 20, 2, 0)
+    greedy = _lpt_makespan(first_fit_decreasing(e, b), d, M, t)
+    model = ASPBC(M, d, b, t, e).solve_decomposition(cluster_size=100, time_budget=120,
+                                                     seed=0, backend="highs")
+    schedule = model.schedule.compacted()
+    assert (schedule.agv >= 0).all()
+    # ogni ricarica sta nella batteria
+    energy = np.zeros((schedule.R, M))
+    np.add.at(energy, (schedule.charge, schedule.agv), e)
+    assert (energy <= b + EPS).all()
+    cm = np.bincount(schedule.agv, weights=d, minlength=M) + t * (schedule.q.sum(axis=0) - 1)
+    assert model.ub == pytest.approx(cm.max())
+    assert model.ub < greedy
@@ -0,0 +1,38 @@
+import os
+
+import numpy as np
+
+from aspbc.generator import generate_dataset, generate_instance
+from aspbc.parser import parse_file, parse_instance_name
+
+
+def _dataset(folder) -> list[str]:
+    return generate_dataset(str(folder), V=[2, 5], J=[20], T=[10], W=[1, 2], seed=240, count=3)
+
+
+def test_dataset_is_deterministic(tmp_path):
+    first, second = _dataset(tmp_path / "a"), _dataset(tmp_path / "b")
+    assert [os.path.basename(f) for f in first] == [os.path.basename(f) for f in second]
+    for a, b in zip(first, second):
+        with open(a, "rb") as fa, open(b, "rb") as fb:
+            assert fa.read() == fb.read()
+
+
+def test_names_follow_the_dataset(tmp_path):
+    files = _dataset(tmp_path)
+    names = [os.path.basename(f) for f in files]
+    assert names[:3] == ["Ins_V2_J20_T10_R60_B10_W1_S240_N0.txt",
+                         "Ins_V2_J20_T10_R60_B10_W1_S241_N1.txt",
+                         "Ins_V2_J20_T10_R60_B10_W1_S242_N2.txt"]
+    fields = [parse_instance_name(name) for name in names]
+    # S cresce con N dentro un gruppo e i gruppi non condividono seed
+    assert len({f["S"] for f in fields}) == len(files)
+    for i, f in enumerate(fields):
+        assert f["S"] == 240 + 3 * (i // 3) + f["N"]
+    # ogni file si rigenera da (S, N) del nome
+    for path, f in zip(files, fields):
+        M, d, b, t, e = parse_file(path)
+        V, d_, B, R, e_ = generate_instance(f["V"], f["J"], f["T"], f["W"], f["S"], f["N"])
+        assert (M, b, t) == (V, B, R)
+        assert np.array_equal(d, d_)
+        assert np.allclose(e, e_)
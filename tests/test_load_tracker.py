@@ -0,0 +1,96 @@
+import os
+
+import numpy as np
+import pytest
+
+from aspbc.heuristic.load_tracker import LoadTracker
+from aspbc.heuristic.schedule import Schedule
+from aspbc.parser import parse_file
+
+FOLDER = os.path.join(os.path.dirname(__file__), "..", "dataset", "ASP-BC Instances")
+INSTANCES = ["Ins_V10_J50_T30_R60_B10_W2_S170_N0.txt",
+             "Ins_V5_J50_T10_R60_B10_W4_S120_N0.txt",
+             "Ins_V10_J100_T10_R60_B10_W1_S240_N0.txt"]
+
+
+def _instance(name: str) -> tuple:
+    path = os.path.join(FOLDER, name)
+    if not os.path.exists(path):
+        pytest.skip(f"{name} not in the dataset")
+    return parse_file(path)
+
+
+def _recomputed(schedule: Schedule, d, e, b, t) -> LoadTracker:
+    # stato ricalcolato da zero sulla soluzione corrente
+    return LoadTracker(schedule.copy(), d, e, b, t)
+
+
+def _random_move(schedule: Schedule, rng: np.random.Generator) -> tuple:
+    j1 = rng.integers(schedule.J)
+    m1, r1 = schedule.agv[j1], schedule.charge[j1]
+    kind = rng.integers(3)
+    if kind == 0:
+        # swap con un job di un altro AGV
+        others = np.flatnonzero(schedule.agv != m1)
+        j2 = rng.choice(others)
+        return (m1, r1, j1, schedule.agv[j2], schedule.charge[j2], j2)
+    m2 = rng.choice(np.delete(np.arange(schedule.M), m1))
+    if kind == 1:
+        # remove: in una ricarica già usata (o nella prima)
+        used = np.flatnonzero(schedule.q[:, m2])
+        r2 = rng.choice(used) if used.shape[0] > 0 else 0
+    else:
+        # add: in una nuova ricarica
+        r2 = max(r for r in range(schedule.R) if schedule.slots[m2][r] or r == 0) + 1
+    return (m1, r1, j1, m2, r2, j1)
+
+
+@pytest.mark.parametrize("name", INSTANCES)
+def test_tracker_matches_full_recompute(name):
+    M, d, b, t, e = _instance(name)
+    rng = np.random.default_rng(0)
+    schedule = Schedule.from_assignment(np.eye(M, dtype=bool)[rng.integers(M, size=d.shape[0])], 2)
+    tracker = LoadTracker(schedule, d, e, b, t)
+    for _ in range(500):
+        tracker.apply(_random_move(schedule, rng))
+        full = _recomputed(schedule, d, e, b, t)
+        R = full.E.shape[0]
+        assert np.allclose(tracker.E[:R], full.E, atol=1e-9)
+        assert np.all(tracker.E[R:] == 0)
+        assert np.array_equal(tracker.n[:R], full.n)
+        assert np.array_equal(tracker.durations, full.durations)
+        assert np.array_equal(tracker.charges, full.charges)
+        assert np.array_equal(tracker.cm, full.cm)
+
+
+@pytest.mark.parametrize("name", INSTANCES)
+def test_exactly_full_battery_stays_feasible(name):
+    # dopo molte mosse la carica residua incrementale non deve rifiutare un job
+    # che riempie esattamente la batteria secondo il ricalcolo
+    M, d, b, t, e = _instance(name)
+    rng = np.random.default_rng(1)
+    schedule = Schedule.from_assignment(np.eye(M, dtype=bool)[rng.integers(M, size=d.shape[0])], 2)
+    tracker = LoadTracker(schedule, d, e, b, t)
+    for _ in range(500):
+        tracker.apply(_random_move(schedule, rng))
+        full = _recomputed(schedule, d, e, b, t)
+        R = full.E.shape[0]
+        exact = np.round(full.b - full.E, 1)
+        assert np.all(tracker.charge_left[:R] >= exact)
+
+
+@pytest.mark.parametrize("name", INSTANCES)
+def test_schedule_round_trips_through_arrays(name):
+    M, d, b, t, e = _instance(name)
+    rng = np.random.default_rng(2)
+    schedule = Schedule.from_assignment(np.eye(M, dtype=bool)[rng.integers(M, size=d.shape[0])], 2)
+    tracker = LoadTracker(schedule, d, e, b, t)
+    for _ in range(200):
+        tracker.apply(_random_move(schedule, rng))
+    x, y, q = schedule.to_arrays()
+    assert np.array_equal(x.sum(axis=1), np.ones(schedule.J))
+    assert np.array_equal(y.sum(axis=0), x)
+    copy = Schedule.from_arrays(x, y, q)
+    assert np.array_equal(copy.agv, schedule.agv)
+    assert np.array_equal(copy.charge, schedule.charge)
+    assert copy.slots == schedule.slots
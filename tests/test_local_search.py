@@ -0,0 +1,282 @@
+import copy
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+from numpy.typing import NDArray
+
+from aspbc.heuristic import (
+    IteratedLocalSearch,
+    LocalSearch,
+    LocalSearch_VC,
+    Schedule,
+    multi_start,
+)
+from aspbc.heuristic.packing import EPS, first_fit_decreasing
+from aspbc.parser import parse_file
+
+FOLDER = os.path.join(os.path.dirname(__file__), "..", "dataset", "ASP-BC Instances")
+INSTANCES = ["Ins_V10_J50_T30_R60_B10_W2_S170_N0.txt",
+             "Ins_V5_J50_T10_R60_B10_W4_S120_N0.txt",
+             "Ins_V10_J50_T20_R60_B10_W4_S160_N0.txt"]
+
+
+def _local_search(name: str) -> LocalSearch:
+    # soluzione iniziale senza solver: bin FFD assegnati agli AGV con LPT
+    path = os.path.join(FOLDER, name)
+    if not os.path.exists(path):
+        pytest.skip(f"{name} not in the dataset")
+    M, d, b, t, e = parse_file(path)
+    bins = first_fit_decreasing(e, b)
+    chi = np.zeros((bins.max() + 1, d.shape[0]), dtype=bool)
+    chi[bins, np.arange(d.shape[0])] = 1
+    D = chi @ d + t
+    theta = np.zeros((chi.shape[0], M), dtype=bool)
+    load = np.zeros(M)
+    for r in np.argsort(-D, kind="stable"):
+        theta[r, load.argmin()] = 1
+        load[load.argmin()] += D[r]
+    ls = LocalSearch(Schedule.from_charge(chi, theta, compact=True), 0.0, d, e, t, b, seed=0)
+    ls.cmax = ls.tracker.cmax
+    return ls
+
+
+def _loop_swap(ls: LocalSearch, rng: np.random.Generator) -> tuple[float, tuple]:
+    # save_swap della versione originale, con i cicli su (m1, r1, j1, m2, r2, j2)
+    # e la carica residua ricalcolata da y
+    x, y, q = ls.schedule.to_arrays()
+    M = x.shape[1]
+    cm = (ls.d @ x + ls.t * q.sum(axis=0) - ls.t).astype(np.float64)
+    critical_machines = np.where(cm == cm.max())[0]
+    rng.shuffle(critical_machines)
+    charge_left = ls.b - np.einsum("j,rjm->rm", ls.e, y) + EPS
+    s_star, update = 0.0, ()
+    for m1 in critical_machines:
+        top1, top2 = ls._get_best_two(cm, m1)
+        for r1 in np.where(q[:, m1])[0]:
+            for j1 in np.where(y[r1, :, m1])[0]:
+                for m2 in range(M):
+                    if m2 == m1:
+                        continue
+                    for r2 in np.where(q[:, m2])[0]:
+                        for j2 in np.where(y[r2, :, m2])[0]:
+                            if charge_left[r1, m1] >= ls.e[j2] - ls.e[j1] and \
+                                    charge_left[r2, m2] >= ls.e[j1] - ls.e[j2]:
+                                m1_new = cm[m1] - ls.d[j1] + ls.d[j2]
+                                m2_new = cm[m2] + ls.d[j1] - ls.d[j2]
+                                if M <= 2 or critical_machines.shape[0] > 1:
+                                    cm_max = 0
+                                else:
+                                    cm_max = cm[top2] if m2 == top1 else cm[top1]
+                                s_s = max(0, ls.cmax - max(m1_new, m2_new, cm_max))
+                                if s_s > s_star:
+                                    s_star = s_s
+                                    update = (m1, r1, j1, m2, r2, j2)
+    return (s_star, update)
+
+
+@pytest.mark.parametrize("name", INSTANCES)
+def test_vectorized_swap_matches_loops(name):
+    ls = _local_search(name)
+    for _ in range(30):
+        # stesso ordine degli AGV critici: la copia del generatore mescola come ls.rng
+        expected = _loop_swap(ls, copy.deepcopy(ls.rng))
+        s_star, update = ls.save_swap(0.0, ())
+        assert s_star == expected[0]
+        assert tuple(int(v) for v in update) == tuple(int(v) for v in expected[1])
+        s_star, update = ls.best_move()
+        if s_star <= 0.0:
+            break
+        ls.update_best(update)
+
+
+@pytest.mark.parametrize("name", INSTANCES)
+def test_search_never_worsens_and_stays_feasible(name):
+    ls = _local_search(name)
+    start = ls.cmax
+    ls.solve(max_iterations=200)
+    assert ls.cmax <= start
+    x, y, _ = ls.schedule.to_arrays()
+    assert np.all(np.einsum("j,rjm->rm", ls.e, y) <= ls.b + EPS)
+    assert np.array_equal(x.sum(axis=1), np.ones(x.shape[0]))
+    assert ls.cmax == (ls.d @ x + ls.t * ls.schedule.q.sum(axis=0) - ls.t).max()
+
+
+def _is_forbidden(forbidden, update: tuple) -> bool:
+    m1, _, j1, m2, _, j2 = update
+    return bool(forbidden[j1, m2]) or (j1 != j2 and bool(forbidden[j2, m1]))
+
+
+@pytest.mark.parametrize("name", INSTANCES)
+def test_best_move_skips_tabu_moves(name):
+    ls = _local_search(name)
+    rng = copy.deepcopy(ls.rng)
+    s_star, update = ls.best_move()
+    if s_star <= 0.0:
+        pytest.skip("the start is already a local optimum")
+    ls.forbidden = np.zeros((ls.schedule.J, ls.schedule.M), dtype=bool)
+    ls.forbidden[update[2], update[3]] = True
+
+    # la migliore mossa ammessa, non la migliore in assoluto
+    ls.rng, ls.aspiration = copy.deepcopy(rng), np.inf
+    s_tabu, update_tabu = ls.best_move()
+    assert s_tabu <= s_star
+    assert update_tabu == () or not _is_forbidden(ls.forbidden, update_tabu)
+
+    # aspirazione: la mossa tabu torna ammessa se il risparmio la supera
+    ls.rng, ls.aspiration = copy.deepcopy(rng), 0.0
+    s_aspired, update_aspired = ls.best_move()
+    assert s_aspired == s_star
+    assert tuple(int(v) for v in update_aspired) == tuple(int(v) for v in update)
+
+
+@pytest.mark.parametrize("name", INSTANCES)
+def test_limits_and_callback_interrupt_the_search(name):
+    # ricerca completa, poi la stessa fermata una mossa prima
+    trace = []
+    full = _local_search(name).solve(callback=lambda cmax, i: trace.append(cmax))
+    assert full.status == "local_optimum"
+    if len(trace) < 2:
+        pytest.skip("the start is almost a local optimum")
+    ls = _local_search(name).solve(max_iterations=len(trace) - 1)
+    assert ls.status == "max_iterations"
+    assert ls.profile.counters["iterations"] == len(trace) - 1
+    assert ls.cmax == trace[-2]
+
+    ls = _local_search(name)
+    ls.solve(time_limit=0.0)
+    assert ls.status == "time_limit"
+    assert "iterations" not in ls.profile.counters
+
+    # stop() da un callback: la ricerca finisce dopo la mossa corrente
+    ls = _local_search(name)
+    start = ls.cmax
+    calls = []
+
+    def callback(cmax, iteration):
+        calls.append((cmax, iteration))
+        if iteration == 2:
+            ls.stop()
+
+    ls.solve(callback=callback)
+    if ls.status == "local_optimum":
+        pytest.skip("the search ended before the second move")
+    assert ls.status == "stopped"
+    assert [i for _, i in calls] == [1, 2]
+    assert calls[0][0] < start and calls[1][0] <= calls[0][0]
+    # stop() non resta attivo per la ricerca successiva
+    ls.solve(max_iterations=1)
+    assert ls.status in ("max_iterations", "local_optimum")
+
+
+@pytest.mark.parametrize("name", INSTANCES)
+def test_multi_start_keeps_the_search_profiles(name):
+    results = []
+    for workers in (1, 2):
+        ls = _local_search(name)
+        best = multi_start(ls, starts=3, seed=0, workers=workers)
+        assert best.cmax == min(best.starts) <= ls.cmax
+        # contatori di tutte le copie, non un profiler vuoto
+        assert best.profile.counters["starts"] == 3
+        assert best.profile.counters["iterations"] >= 3
+        assert best.profile.stages["search"]["calls"] == 3
+        results.append((best.cmax, best.starts, best.profile.counters["iterations"],
+                        best.schedule.agv.tolist(), best.schedule.charge.tolist()))
+    # stesso risultato con uno o più processi
+    assert results[0] == results[1]
+
+
+@pytest.mark.parametrize("name", INSTANCES)
+def test_iterated_search_restores_in_place(name):
+    ls = _local_search(name)
+    ils = IteratedLocalSearch(ls, seed=0)
+    # stop() da un altro thread anche dopo i ripristini della migliore soluzione
+    timer = threading.Timer(0.5, ils.stop)
+    timer.start()
+    t0 = time.perf_counter()
+    ils.solve(time_limit=30)
+    timer.cancel()
+    assert time.perf_counter() - t0 < 5
+    if "restores" not in ils.profile.counters:
+        pytest.skip("no restore in the search")
+    # stessa local search: profiler e contatori continuano dopo ogni ripristino
+    assert ils.local_search is ls
+    accepted = sum(v for k, v in ls.profile.counters.items() if k.startswith("accepted."))
+    assert accepted == ils.moves
+    assert ls.cmax == ls.tracker.cmax
+    x, y, _ = ls.schedule.to_arrays()
+    assert np.all(np.einsum("j,rjm->rm", ls.e, y) <= ls.b + EPS)
+    assert np.array_equal(x.sum(axis=1), np.ones(x.shape[0]))
+
+
+@pytest.mark.parametrize("name", INSTANCES)
+def test_search_stops_at_the_lower_bound(name):
+    full = _local_search(name).solve()
+    ls = _local_search(name)
+    # con il lower bound pari all'ottimo locale la ricerca si ferma appena lo raggiunge
+    ls.solve(lower_bound=full.cmax)
+    assert ls.status == "lower_bound"
+    assert ls.cmax == full.cmax
+    assert ls.profile.counters.get("iterations", 0) <= full.profile.counters.get("iterations", 0)
+
+
+def _local_search_vc(name: str, tau: float = 1.0) -> LocalSearch_VC:
+    ls = _local_search(name)
+    ls_vc = LocalSearch_VC(ls.schedule.copy(), 0.0, ls.d, ls.e, tau, ls.b, seed=0)
+    ls_vc.cmax = ls_vc.tracker.cmax
+    return ls_vc
+
+
+def _cm_vc(ls: LocalSearch_VC) -> NDArray[np.float64]:
+    # ricalcolato da y: ogni ricarica usata viene ripristinata tranne l'ultima
+    x, y, _ = ls.schedule.to_arrays()
+    E = np.einsum("j,rjm->rm", ls.e, y)
+    used = y.any(axis=1)
+    cm = ls.d @ x + ls.tau * E.sum(axis=0)
+    for m in np.flatnonzero(used.any(axis=0)):
+        cm[m] -= ls.tau * E[np.flatnonzero(used[:, m])[-1], m]
+    return cm
+
+
+@pytest.mark.parametrize("name", INSTANCES)
+def test_vc_move_deltas_match_full_recompute(name):
+    ls = _local_search_vc(name)
+    rng = np.random.default_rng(0)
+    schedule, tracker = ls.schedule, ls.tracker
+    for _ in range(200):
+        j = rng.integers(schedule.J)
+        m1, r1 = schedule.agv[j], schedule.charge[j]
+        m2 = rng.choice(np.delete(np.arange(schedule.M), m1))
+        # remove in una ricarica usata con abbastanza carica, altrimenti add
+        charges = schedule.charges_of(m2)
+        fits = charges[tracker.charge_left[charges, m2] >= ls.e[j]]
+        r2 = rng.choice(fits) if fits.shape[0] > 0 else tracker.last_charge(m2) + 1
+        slots = tracker.slot_energies()
+        e = ls.e[j:j + 1]
+        m1_new = tracker.durations[m1] - ls.d[j] + \
+            ls._charge_without(m1, np.array([r1]), e, slots)[0]
+        m2_new = tracker.durations[m2] + ls.d[j] + \
+            ls._charge_with(np.array([m2]), np.array([r2]), e, slots)[0]
+        ls.update_best((m1, r1, j, m2, r2, j))
+        cm = _cm_vc(ls)
+        assert m1_new == pytest.approx(cm[m1])
+        assert m2_new == pytest.approx(cm[m2])
+        assert np.allclose(tracker.durations + tracker.charge_time, cm)
+
+
+@pytest.mark.parametrize("name", INSTANCES)
+def test_vc_savings_match_full_recompute(name):
+    ls = _local_search_vc(name)
+    for _ in range(100):
+        start, unique = ls.cmax, np.sum(ls.tracker.cm == ls.cmax) == 1
+        s_star, update = ls.best_move()
+        if s_star <= 0.0:
+            break
+        ls.update_best(update)
+        cm = _cm_vc(ls)
+        assert np.allclose(ls.tracker.durations + ls.tracker.charge_time, cm)
+        # con un solo AGV critico il risparmio è esatto
+        if unique:
+            assert cm.max() == pytest.approx(start - s_star)
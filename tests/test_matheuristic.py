@@ -0,0 +1,62 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from aspbc import ASPBC, ASPBC_VC
+from aspbc.heuristic import bgap_r
+from aspbc.heuristic.packing import EPS
+from aspbc.matheuristic import BUDGET_SHARES
+
+FOLDER = os.path.join(os.path.dirname(__file__), "..", "dataset", "ASP-BC Instances")
+# senza time_budget il BPP di questa istanza richiede più di un minuto
+SLOW_BPP = "Ins_V5_J50_T10_R60_B10_W4_S120_N0.txt"
+# il BGAP delle ricariche di questa istanza raggiunge il lower bound del BPP
+EARLY_STOP = "Ins_V2_J50_T10_R60_B10_W2_S90_N0.txt"
+
+
+def _model(cls, name: str):
+    path = os.path.join(FOLDER, name)
+    if not os.path.exists(path):
+        pytest.skip(f"{name} not in the dataset")
+    return cls.create_from_file(path)
+
+
+def _assert_feasible(model) -> None:
+    schedule = model.schedule.compacted()
+    assert (schedule.agv >= 0).all()
+    energy = np.zeros((schedule.R, model.M))
+    np.add.at(energy, (schedule.charge, schedule.agv), model.e)
+    assert np.all(energy <= model.b + EPS)
+
+
+@pytest.mark.parametrize("cls", [ASPBC, ASPBC_VC])
+def test_time_budget_is_split_across_stages(cls, env):
+    budget = 2.0
+    # tolleranza per costruzione dei modelli e overhead di Gurobi
+    slack = 0.5
+    model = _model(cls, SLOW_BPP)
+    t0 = time.perf_counter()
+    model.solve_matheuristic(env, time_budget=budget)
+    assert time.perf_counter() - t0 <= budget + slack
+    assert model.profile.wall("bpp") <= BUDGET_SHARES[0] * budget + slack
+    assert model.ub >= model.lb
+    _assert_feasible(model)
+
+
+def test_stages_stop_at_the_lower_bound(env, monkeypatch):
+    solve, stops = bgap_r.optimize, []
+
+    def optimize(model, backend="gurobi"):
+        stops.append(model.Params.BestObjStop)
+        return solve(model, backend)
+    monkeypatch.setattr(bgap_r, "optimize", optimize)
+    model = _model(ASPBC, EARLY_STOP)
+    model.solve_matheuristic(env)
+    # il BGAP riceve il lower bound come BestObjStop, la local search non parte
+    assert stops == [model.lb]
+    assert model.profile.counters["early_stop"] == 1
+    assert "ls.iterations" not in model.profile.counters
+    assert model.ub == model.lb
+    _assert_feasible(model)
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from aspbc import ASPBC, ASPBC_VC
+from aspbc.generator import generate_instance
+from aspbc.heuristic import Schedule
+from aspbc.profiling import StageProfiler
+
+# istanze piccole: i modelli esatti stanno nei limiti della licenza gratuita di Gurobi
+SMALL = [(2, 10, 10, 2, 0), (3, 10, 10, 3, 2), (2, 8, 10, 3, 0)]
+
+
+def _one_job_per_charge(model):
+    # sostituisce la matheuristica: tutti i jobs sul primo AGV, uno per ricarica,
+    # ammissibile ma con più ricariche di quante ne abbia il modello
+    def solve_matheuristic(env=None, **options):
+        J = model.e.shape[0]
+        q = np.zeros((J, model.M), dtype=bool)
+        q[:, 0] = q[0, :] = 1
+        model.schedule = Schedule(np.zeros(J, dtype=np.int64), np.arange(J), q)
+        model.lb = model.get_lower_bound()
+        model.time = 0.0
+        model.profile = StageProfiler()
+        return model
+    return solve_matheuristic
+
+
+@pytest.mark.parametrize("cls", [ASPBC, ASPBC_VC])
+@pytest.mark.parametrize("instance", SMALL)
+def test_warm_start_with_too_many_charges_is_skipped(cls, instance, env, capsys):
+    exact = cls(*generate_instance(*instance)).solve(env)
+    model = cls(*generate_instance(*instance))
+    assert model.R < model.e.shape[0]
+    model.solve_matheuristic = _one_job_per_charge(model)
+    model.solve(env, warm_start=True)
+    assert "warm start skipped" in capsys.readouterr().err
+    # stesso ottimo (a meno del MIPGap) senza lo start
+    assert model.ub == pytest.approx(exact.ub, rel=1e-3)
@@ -0,0 +1,64 @@
+import gurobipy as gb
+import numpy as np
+import pytest
+from gurobipy import GRB, quicksum
+
+from aspbc import ASPBC
+from aspbc.generator import generate_instance
+
+INSTANCES = [(2, 10, 10, 2, 0), (3, 10, 10, 3, 2), (2, 8, 20, 4, 1)]
+
+
+def _loop_model(model: ASPBC, env) -> gb.Model:
+    # ASPBC.solve della versione originale, un vincolo alla volta con quicksum
+    J, M, R = model.e.shape[0], model.M, model.R
+    aspbc = gb.Model("ASP-BC", env=env)
+    x = aspbc.addVars(J, M, vtype=GRB.BINARY)
+    q = aspbc.addVars(R, M, vtype=GRB.BINARY)
+    y = aspbc.addVars(J, R, M, vtype=GRB.BINARY)
+    cmax = aspbc.addVar()
+    aspbc.setObjective(cmax, GRB.MINIMIZE)
+    aspbc.addConstrs(cmax >= quicksum(model.d[j] * x[j, m] for j in range(J)) +
+                     quicksum(model.t * q[r, m] for r in range(1, R)) for m in range(M))
+    aspbc.addConstrs(quicksum(x[j, m] for m in range(M)) == 1 for j in range(J))
+    aspbc.addConstrs(quicksum(y[j, r, m] for r in range(R)) == x[j, m]
+                     for j in range(J) for m in range(M))
+    aspbc.addConstrs(2 * y[j, r, m] <= x[j, m] + q[r, m]
+                     for j in range(J) for r in range(R) for m in range(M))
+    aspbc.addConstrs(quicksum(model.e[j] * y[j, r, m] for j in range(J)) <= model.b
+                     for r in range(R) for m in range(M))
+    aspbc.addConstrs(q[r, m] <= q[r - 1, m] for r in range(1, R) for m in range(M))
+    aspbc.addConstrs(q[0, m] == 1 for m in range(M))
+    aspbc.update()
+    return aspbc
+
+
+def _rows(model: gb.Model) -> list:
+    # vincoli come righe (colonne, coefficienti, rhs) con verso >= o =,
+    # indipendenti dall'ordine in cui sono stati aggiunti
+    A = model.getA().tocsr()
+    rows = []
+    for i, constr in enumerate(model.getConstrs()):
+        row = A.getrow(i)
+        order = np.argsort(row.indices)
+        cols, coefs, rhs = row.indices[order], row.data[order], constr.RHS
+        sense = constr.Sense
+        if sense == GRB.LESS_EQUAL or (sense == GRB.EQUAL and coefs[0] < 0):
+            coefs, rhs = -coefs, -rhs
+            sense = GRB.EQUAL if sense == GRB.EQUAL else GRB.GREATER_EQUAL
+        rows.append((tuple(cols), tuple(np.round(coefs, 9)), round(rhs, 9), sense))
+    return sorted(rows)
+
+
+@pytest.mark.parametrize("instance", INSTANCES)
+def test_matrix_model_matches_loop_model(instance, env):
+    model = ASPBC(*generate_instance(*instance))
+    matrix = model.build(env)[0]
+    loop = _loop_model(model, env)
+    # stesse variabili nello stesso ordine, stessi vincoli e stesso obiettivo
+    assert matrix.getAttr("VType", matrix.getVars()) == loop.getAttr("VType", loop.getVars())
+    assert matrix.getAttr("Obj", matrix.getVars()) == loop.getAttr("Obj", loop.getVars())
+    assert _rows(matrix) == _rows(loop)
+    matrix.optimize()
+    loop.optimize()
+    assert matrix.ObjVal == pytest.approx(loop.ObjVal)
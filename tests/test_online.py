@@ -0,0 +1,92 @@
+import os
+
+import numpy as np
+import pytest
+
+from aspbc import ASPBC
+from aspbc.heuristic import OnlinePlanner
+from aspbc.heuristic.packing import EPS
+
+FOLDER = os.path.join(os.path.dirname(__file__), "..", "dataset", "ASP-BC Instances")
+INSTANCE = "Ins_V5_J50_T10_R60_B10_W1_S120_N0.txt"
+
+
+@pytest.fixture
+def planner(env) -> OnlinePlanner:
+    path = os.path.join(FOLDER, INSTANCE)
+    if not os.path.exists(path):
+        pytest.skip(f"{INSTANCE} not in the dataset")
+    model = ASPBC.create_from_file(path).solve_matheuristic(env)
+    return OnlinePlanner.from_model(model, seed=0, max_iterations=50)
+
+
+def _assert_recomputed(planner: OnlinePlanner) -> None:
+    # stato del tracker ricalcolato da zero sui jobs assegnati e sulla carica consumata
+    ls, schedule = planner.local_search, planner.schedule
+    tracker = ls.tracker
+    assigned = np.flatnonzero(schedule.agv >= 0)
+    E = np.zeros(tracker.E.shape)
+    np.add.at(E, (schedule.charge[assigned], schedule.agv[assigned]), ls.e[assigned])
+    E[0] += planner.consumed
+    assert np.allclose(tracker.E, E)
+    assert np.all(E <= ls.b + EPS)
+    for m in range(schedule.M):
+        used = {r for r, jobs in enumerate(schedule.slots[m]) if jobs}
+        if planner.consumed[m] > 0:
+            # la ricarica in corso resta attiva anche senza jobs
+            used.add(0)
+        if not used:
+            continue
+        assert np.array_equal(np.flatnonzero(schedule.q[:, m]), sorted(used))
+        cm = ls.d[schedule.agv == m].sum() + ls.t * (len(used) - 1)
+        assert tracker.cm[m] == pytest.approx(cm)
+    assert ls.cmax == pytest.approx(tracker.cmax)
+
+
+def test_insert_keeps_the_schedule_feasible(planner):
+    rng = np.random.default_rng(0)
+    J = planner.schedule.J
+    for _ in range(10):
+        j = planner.add_job(int(rng.integers(1, 30)), float(np.round(rng.uniform(0.1, 9.9), 1)))
+        assert planner.schedule.agv[j] >= 0
+        _assert_recomputed(planner)
+    assert planner.schedule.J == J + 10
+    with pytest.raises(ValueError):
+        planner.add_job(10, planner.local_search.b + 1)
+
+
+def test_cancel_keeps_the_schedule_feasible(planner):
+    rng = np.random.default_rng(1)
+    for j in rng.choice(planner.schedule.J, 10, replace=False):
+        planner.remove_job(j)
+        assert planner.schedule.agv[j] == -1
+        _assert_recomputed(planner)
+    with pytest.raises(ValueError):
+        planner.remove_job(j)
+
+
+def test_battery_update_keeps_the_current_charge(planner):
+    schedule, ls = planner.schedule, planner.local_search
+    # l'AGV con più ricariche: dopo la ricarica in corso ne esegue altre
+    m = int(schedule.q.sum(axis=0).argmax())
+    if schedule.q[:, m].sum() < 2:
+        pytest.skip("no AGV with more than one charge")
+    planner.set_battery(m, ls.b - 0.1, repair=False)
+    _assert_recomputed(planner)
+    # la ricarica in corso perde tutti i jobs ma non la carica consumata:
+    # le ricariche successive costano ancora t
+    for j in list(schedule.jobs(0, m)):
+        planner.remove_job(j, repair=False)
+    assert schedule.q[0, m]
+    _assert_recomputed(planner)
+    planner.repair()
+    _assert_recomputed(planner)
+
+    # carica quasi esaurita: i jobs che non ci stanno vengono reinseriti
+    assigned = np.flatnonzero(schedule.agv >= 0)
+    for k in range(schedule.M):
+        planner.set_battery(k, 0.5)
+        _assert_recomputed(planner)
+    assert (schedule.agv[assigned] >= 0).all()
+    with pytest.raises(ValueError):
+        planner.set_battery(m, ls.b + 1)
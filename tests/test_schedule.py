@@ -0,0 +1,77 @@
+import numpy as np
+
+from aspbc.heuristic import Schedule
+
+
+def _random_schedule(rng: np.random.Generator, J: int = 40, R: int = 5, M: int = 4) -> Schedule:
+    # ricariche attive in ordine (q[r] <= q[r-1]) e jobs solo nelle ricariche attive
+    used = rng.integers(1, R + 1, size=M)
+    q = np.arange(R)[:, None] < used[None, :]
+    agv = rng.integers(M, size=J)
+    charge = rng.integers(used[agv])
+    return Schedule(agv, charge, q)
+
+
+def _slots(schedule: Schedule) -> list:
+    # slots ricalcolati da agv e charge
+    slots = [[[] for _ in range(schedule.R)] for _ in range(schedule.M)]
+    for j in np.flatnonzero(schedule.agv >= 0):
+        slots[schedule.agv[j]][schedule.charge[j]].append(j)
+    return slots
+
+
+def test_round_trip_through_arrays():
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        schedule = _random_schedule(rng)
+        x, y, q = schedule.to_arrays(schedule.R + 2)
+        assert y.shape == (schedule.R + 2, schedule.J, schedule.M)
+        assert np.array_equal(y.sum(axis=0), x)
+        copy = Schedule.from_arrays(x, y, q)
+        assert np.array_equal(copy.agv, schedule.agv)
+        assert np.array_equal(copy.charge, schedule.charge)
+        assert np.array_equal(copy.q[:schedule.R], schedule.q)
+        assert [slots[:schedule.R] for slots in copy.slots] == schedule.slots
+
+
+def test_from_charge_matches_chi_and_theta():
+    rng = np.random.default_rng(1)
+    J, R, M = 30, 8, 3
+    r_of_job = rng.integers(R, size=J)
+    chi = np.zeros((R, J), dtype=bool)
+    chi[r_of_job, np.arange(J)] = 1
+    theta = np.zeros((R, M), dtype=bool)
+    theta[np.arange(R), rng.integers(M, size=R)] = 1
+    for compact in (False, True):
+        schedule = Schedule.from_charge(chi, theta, compact=compact)
+        assert np.array_equal(schedule.agv, theta.argmax(axis=1)[r_of_job])
+        # jobs della stessa ricarica restano insieme
+        for r in range(R):
+            assert np.unique(schedule.charge[r_of_job == r]).shape[0] <= 1
+    assert np.array_equal(schedule.q.sum(axis=0), theta.sum(axis=0))
+
+
+def test_compacted_keeps_jobs_together():
+    rng = np.random.default_rng(2)
+    for _ in range(20):
+        schedule = _random_schedule(rng, J=10, R=6)
+        compacted = schedule.compacted()
+        assert np.array_equal(compacted.agv, schedule.agv)
+        for m in range(schedule.M):
+            used = [jobs for jobs in schedule.slots[m] if jobs]
+            # le ricariche usate diventano 0, 1, ..., k-1 nello stesso ordine
+            assert compacted.slots[m][:len(used)] == used
+            assert compacted.q[:, m].sum() == max(len(used), 1)
+
+
+def test_moves_keep_slots_consistent():
+    rng = np.random.default_rng(3)
+    schedule = _random_schedule(rng)
+    schedule.grow(schedule.R + 1).add_jobs(3)
+    for _ in range(200):
+        j = rng.integers(schedule.J)
+        if rng.random() < 0.2:
+            schedule.unassign(j)
+        else:
+            schedule.move(j, rng.integers(schedule.M), rng.integers(schedule.R))
+        assert schedule.slots == _slots(schedule)
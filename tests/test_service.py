@@ -0,0 +1,96 @@
+import asyncio
+import os
+
+import numpy as np
+import pytest
+
+from aspbc.heuristic.packing import EPS
+from aspbc.parser import parse_file
+from aspbc.service import Cancelled, PlanningService
+
+pytest.importorskip("gurobipy")
+
+FOLDER = os.path.join(os.path.dirname(__file__), "..", "dataset", "ASP-BC Instances")
+FAST = "Ins_V5_J50_T10_R60_B10_W1_S120_N0.txt"
+# senza time_budget il BPP di questa istanza richiede più di un minuto
+SLOW_BPP = "Ins_V5_J50_T10_R60_B10_W4_S120_N0.txt"
+
+
+def _instance(name: str) -> tuple:
+    path = os.path.join(FOLDER, name)
+    if not os.path.exists(path):
+        pytest.skip(f"{name} not in the dataset")
+    return parse_file(path)
+
+
+def test_plan_streams_progress_and_a_feasible_schedule():
+    M, _, b, _, e = instance = _instance(FAST)
+
+    async def main():
+        async with PlanningService(workers=1) as service:
+            request = await service.submit(instance, deadline=10)
+            events = [event async for event in request.progress()]
+            return events, await request.result()
+
+    events, result = asyncio.run(main())
+    assert [event["stage"] for event in events[:2]] == ["bpp", "bgap"]
+    assert result["lb"] <= result["ub"]
+    agv, charge = np.array(result["agv"]), np.array(result["charge"])
+    assert ((agv >= 0) & (agv < M)).all()
+    energy = np.zeros((charge.max() + 1, M))
+    np.add.at(energy, (charge, agv), e)
+    assert np.all(energy <= b + EPS)
+
+
+def test_cancel_stops_queued_and_running_requests():
+    instance = _instance(SLOW_BPP)
+
+    async def main():
+        async with PlanningService(workers=1) as service:
+            running = await service.submit(instance, deadline=4)
+            await asyncio.sleep(0.1)
+            queued = await service.submit(instance)
+            await asyncio.sleep(0.5)
+            assert (running.status, queued.status) == ("running", "queued")
+            queued.cancel()
+            # il worker si ferma al primo progresso dopo il BPP
+            running.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await queued.result()
+            with pytest.raises(Cancelled):
+                await running.result()
+            assert running.status == queued.status == "done"
+
+    asyncio.run(main())
+
+
+def test_cancelled_task_keeps_the_process_busy():
+    instance = _instance(SLOW_BPP)
+
+    async def main():
+        async with PlanningService(workers=1) as service:
+            first = await service.submit(instance, deadline=2)
+            await asyncio.sleep(0.5)
+            # il task smette di aspettare, il worker no: il processo resta occupato
+            first.task.cancel()
+            second = await service.submit(_instance(FAST))
+            await asyncio.sleep(0.5)
+            assert second.status == "queued"
+            return await second.result()
+
+    assert asyncio.run(main())["ub"] > 0
+
+
+def test_deadline_expires_in_the_queue():
+    instance = _instance(SLOW_BPP)
+
+    async def main():
+        async with PlanningService(workers=1) as service:
+            first = await service.submit(instance, deadline=2)
+            late = await service.submit(instance, deadline=0.5)
+            with pytest.raises(TimeoutError):
+                await late.result()
+            # la prima richiesta finisce entro la sua deadline
+            assert (await first.result())["ub"] > 0
+
+    asyncio.run(main())